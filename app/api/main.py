@@ -1,14 +1,23 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, model_validator
 from typing import Optional, List, Dict
 import asyncio
+import json
 import os
 from pathlib import Path
 
-from ..utils.text_processor import TextProcessor
+from ..utils.text_processor import TextProcessor, UnknownDocumentError
 from ..utils.ai_handler import AIHandler
+from ..utils.improvement import SectionImprover
+from ..utils.task_store import create_task_store
+from ..utils.content_store import create_content_store, UnknownContentError
+from ..utils.extraction import extract_upload, UploadTooLargeError, UnsupportedFormatError
+from ..utils.coalescing import SingleFlight, content_sha256, request_key
+from ..utils.job_queue import create_job_queue
+from ..utils.metrics import REGISTRY, CONTENT_TYPE, StageTimer, gauge_family, counter_family
+from ..utils.pipeline import ScriptPipeline, STAGE_SECONDS
 
 app = FastAPI(title="Script Generator API")
 
@@ -24,27 +33,112 @@ app.add_middleware(
 # Initialize our utilities
 text_processor = TextProcessor()
 ai_handler = AIHandler()
+section_improver = SectionImprover(ai_handler, text_processor, max_retries=ai_handler.scheduler.max_retries)
 
-# Store background tasks
-active_tasks = {}
+# Store background tasks (in memory, or in SQLite when TASK_STORE_PATH is set)
+task_store = create_task_store()
+
+# Uploaded source text, referenced by content id (UPLOAD_MAX_BYTES caps each upload)
+content_store = create_content_store()
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# With JOB_QUEUE_PATH set, generation jobs are queued for `python -m app.worker` processes;
+# otherwise they run here as background tasks
+job_queue = create_job_queue()
+pipeline = ScriptPipeline(text_processor, ai_handler, section_improver, content_store)
+# Identical requests in flight at the same time share one pipeline run (or one queued job)
+single_flight = SingleFlight()
+
+# In-process tasks; stage and task metrics are recorded by the pipeline, LLM call metrics by AIHandler
+TASKS_IN_PROGRESS = REGISTRY.gauge('script_tasks_in_progress', 'Script generation tasks not yet finished')
+REQUESTS_COALESCED = REGISTRY.counter(
+    'script_requests_coalesced', 'Generation requests that joined an identical request already in flight'
+)
+
+def _collect_component_metrics():
+    """Report config, cache, scheduler, executor and job queue stats at scrape time."""
+    config = text_processor.config.stats()
+    cache = ai_handler.cache.stats()
+    scheduler = ai_handler.scheduler.stats()
+    executors = text_processor.executor_stats()
+    families = [] if job_queue is None else _job_queue_metrics(job_queue.stats())
+    return families + [
+        gauge_family('config_version', 'Version of the config in effect, counting from 1 at startup', {
+            (): config['version']
+        }),
+        counter_family('config_reloads', 'Config reloads by result', {
+            (('result', 'success'),): config['reloads'], (('result', 'error'),): config['errors']
+        }),
+        gauge_family('script_requests_in_flight', 'Distinct generation requests running in this process', {
+            (): single_flight.stats()['in_flight']
+        }),
+        counter_family('llm_cache_lookups', 'Response cache lookups by result', {
+            (('result', 'hit'),): cache['hits'], (('result', 'miss'),): cache['misses']
+        }),
+        gauge_family('llm_cache_hit_ratio', 'Response cache hits per lookup', {(): cache['hit_rate']}),
+        gauge_family('llm_cache_entries', 'Responses held in the in-memory cache tier', {(): cache['memory_entries']}),
+        gauge_family('llm_scheduler_queued', 'LLM calls waiting for a scheduler slot', {(): scheduler['queued']}),
+        gauge_family('llm_scheduler_active', 'LLM calls in flight', {(): scheduler['active']}),
+        counter_family('llm_scheduler_retries', 'LLM calls retried after a transient failure', {(): scheduler['retries']}),
+        gauge_family('executor_queue_depth', 'Calls waiting for an executor worker', {
+            (('executor', name),): stats['queue_depth'] for name, stats in executors.items()
+        }),
+        gauge_family('executor_in_flight', 'Calls submitted to an executor and not finished', {
+            (('executor', name),): stats['in_flight'] for name, stats in executors.items()
+        }),
+        gauge_family('executor_wait_seconds_p99', 'Recent 99th percentile executor queue wait', {
+            (('executor', name),): stats['wait_seconds_p99'] for name, stats in executors.items()
+        })
+    ]
+
+def _job_queue_metrics(stats: Dict):
+    return [
+        gauge_family('job_queue_jobs', 'Generation jobs in the durable queue by status', {
+            (('status', status),): stats[status] for status in ('queued', 'processing', 'completed', 'failed')
+        }),
+        gauge_family('job_queue_ready', 'Queued jobs ready to be claimed', {(): stats['ready']}),
+        gauge_family('job_queue_following', 'Jobs waiting on an identical job instead of running', {(): stats['following']}),
+        gauge_family('job_queue_expired_leases', 'Claimed jobs whose worker lease has expired', {(): stats['expired_leases']}),
+        gauge_family('job_queue_oldest_ready_seconds', 'Age of the oldest job waiting for a worker', {
+            (): stats['oldest_ready_seconds']
+        })
+    ]
+
+REGISTRY.register_collector(_collect_component_metrics)
 
 class ScriptRequest(BaseModel):
-    content: str
+    content: Optional[str] = None
+    content_id: Optional[str] = None
     template_name: Optional[str] = None
     highlighted_concept: Optional[str] = None
     previous_topic: Optional[str] = None
 
+    @model_validator(mode='after')
+    def check_source(self) -> 'ScriptRequest':
+        if self.content is None and self.content_id is None:
+            raise ValueError("Either content or content_id is required")
+        if self.content is not None and self.content_id is not None:
+            raise ValueError("Provide either content or content_id, not both")
+        if self.content is not None and not self.content.strip():
+            raise ValueError("Content must not be empty")
+        return self
+
 class ScriptResponse(BaseModel):
     task_id: str
     status: str
     script: Optional[str] = None
     validation: Optional[Dict] = None
     error: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
+    attempts: Optional[int] = None
+    coalesced_with: Optional[str] = None
+    fidelity: Optional[Dict] = None
 
 @app.get("/api/templates")
 async def get_templates():
     """Get available script templates."""
     try:
+        text_processor.config.check()
         templates = text_processor.templates
         return JSONResponse({
             "status": "success",
@@ -56,60 +150,112 @@ async def get_templates():
             detail=f"Error fetching templates: {str(e)}"
         )
 
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    """Get hit/miss counters for the LLM response cache."""
+    return JSONResponse({
+        "status": "success",
+        "cache": ai_handler.cache.stats()
+    })
+
+@app.get("/api/usage")
+async def get_usage():
+    """Get prompt and completion token usage per LLM call kind, plus the most recent calls."""
+    return JSONResponse({
+        "status": "success",
+        "usage": ai_handler.usage.stats()
+    })
+
+@app.get("/api/executor-stats")
+async def get_executor_stats():
+    """Get queue depth and wait time metrics for the chunking and validation executors."""
+    return JSONResponse({
+        "status": "success",
+        "executors": text_processor.executor_stats()
+    })
+
+@app.get("/metrics")
+async def get_metrics():
+    """Stage timings, LLM latency and tokens, cache, scheduler and executor metrics for Prometheus."""
+    # Rendering reads the job queue's stats from SQLite
+    content = await text_processor.chunking_executor.run(REGISTRY.render)
+    return Response(content=content, media_type=CONTENT_TYPE)
+
+async def _resolve_content(request: ScriptRequest) -> str:
+    """Return the request's source text, loading uploaded content by id."""
+    if request.content_id is None:
+        return request.content
+    try:
+        content = await text_processor.chunking_executor.run(content_store.read, request.content_id)
+    except UnknownContentError:
+        raise HTTPException(status_code=404, detail="Content not found; upload the file again")
+    if not content.strip():
+        raise HTTPException(status_code=422, detail="Uploaded content is empty")
+    return content
+
+def _check_content_id(content_id: str) -> str:
+    """Fail fast on an unknown or empty upload without reading it; returns its sha256."""
+    try:
+        info = content_store.info(content_id)
+    except UnknownContentError:
+        raise HTTPException(status_code=404, detail="Content not found; upload the file again")
+    if not info["characters"]:
+        raise HTTPException(status_code=422, detail="Uploaded content is empty")
+    return info["sha256"]
+
+def _request_key(request: ScriptRequest, content_hash: str) -> str:
+    return request_key(content_hash, request.template_name, request.highlighted_concept, request.previous_topic)
+
 @app.post("/api/generate-script", response_model=ScriptResponse)
 async def generate_script(request: ScriptRequest, background_tasks: BackgroundTasks):
-    """Generate a script from the provided content using optional template."""
-    task_id = str(len(active_tasks))
+    """Generate a script from the provided content (or uploaded content_id) using optional template.
+
+    With a job queue the request is queued for a worker, which reads uploaded content
+    itself; otherwise it runs as a background task of this process. A request identical
+    to one still in flight (same content, template, concept and previous topic) gets its
+    own task id but shares that request's run and result.
+    """
+    if job_queue is not None:
+        if request.content_id is not None:
+            content_hash = _check_content_id(request.content_id)
+        else:
+            content_hash = await text_processor.chunking_executor.run(content_sha256, request.content)
+        task_id = await text_processor.chunking_executor.run(
+            job_queue.enqueue, request.model_dump(), dedup_key=_request_key(request, content_hash)
+        )
+        task = await text_processor.chunking_executor.run(job_queue.get, task_id)
+        if task.get("coalesced_with"):
+            REQUESTS_COALESCED.inc()
+        return ScriptResponse(task_id=task_id, status=task["status"], coalesced_with=task.get("coalesced_with"))
+
+    content = await _resolve_content(request)
+    # SQLiteTaskStore calls can wait on file locks; keep them off the event loop
+    task_id = await text_processor.chunking_executor.run(task_store.create, status="processing")
+    TASKS_IN_PROGRESS.inc()
     
     async def process_script():
         try:
-            # Process the text in chunks
-            chunks = text_processor.chunk_text(request.content)
-            
-            # Process chunks in parallel
-            processed_chunks = await text_processor.process_chunks(chunks)
-            
-            # Generate the full script
-            script = await ai_handler.generate_script(
-                content=request.content,
-                template_name=request.template_name,
-                highlighted_concept=request.highlighted_concept,
-                previous_topic=request.previous_topic
-            )
-            
-            # Validate the script
-            validation_results = text_processor.validate_script(
-                script,
-                template_name=request.template_name
+            key = _request_key(request, await text_processor.chunking_executor.run(content_sha256, content))
+            if single_flight.leader_of(key) is not None:
+                await text_processor.chunking_executor.run(
+                    task_store.update, task_id, coalesced_with=single_flight.leader_of(key)
+                )
+            fields, leader = await single_flight.do(
+                key,
+                lambda: pipeline.process(dict(request.model_dump(), content=content, content_id=None)),
+                owner=task_id
             )
-            
-            # If validation fails, try to improve the script
-            if validation_results.get('template_compliance'):
-                template_issues = [
-                    section for section, details in validation_results['template_compliance'].items()
-                    if not details['length_in_range']
-                ]
-                if template_issues:
-                    script = await ai_handler.improve_script(script, validation_results)
-                    validation_results = text_processor.validate_script(
-                        script,
-                        template_name=request.template_name
-                    )
-            
-            active_tasks[task_id] = {
-                "status": "completed",
-                "script": script,
-                "validation": validation_results
-            }
-            
+            if leader is not None:
+                REQUESTS_COALESCED.inc()
+                fields = dict(fields, coalesced_with=leader)
+            await text_processor.chunking_executor.run(task_store.update, task_id, **fields)
         except Exception as e:
-            active_tasks[task_id] = {
-                "status": "failed",
-                "error": str(e)
-            }
+            # A cancelled leader surfaces here for its followers
+            await text_processor.chunking_executor.run(task_store.update, task_id, status="failed", error=str(e))
+        finally:
+            TASKS_IN_PROGRESS.dec()
     
     # Start the background task
-    active_tasks[task_id] = {"status": "processing"}
     background_tasks.add_task(process_script)
     
     return ScriptResponse(
@@ -117,45 +263,147 @@ async def generate_script(request: ScriptRequest, background_tasks: BackgroundTa
         status="processing"
     )
 
+def _sse(event: str, data: Dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/generate-script/stream")
+async def generate_script_stream(request: ScriptRequest):
+    """Generate a script and stream it as Server-Sent Events.
+
+    Emits ``token`` events as the model produces text, then a ``validation`` event
+    with the full script, its validation results and source fidelity, then ``done``.
+    """
+    content = await _resolve_content(request)
+
+    async def events():
+        timer = StageTimer(STAGE_SECONDS)
+        try:
+            with timer.stage("chunking"):
+                chunks = await text_processor.chunk_text_async(content)
+                processed_chunks = await text_processor.process_chunks(chunks)
+
+            parts = []
+            with timer.stage("generation"):
+                async for token in ai_handler.stream_script(
+                    processed_chunks,
+                    template_name=request.template_name,
+                    template_sections=text_processor.get_template_sections(request.template_name),
+                    highlighted_concept=request.highlighted_concept,
+                    previous_topic=request.previous_topic
+                ):
+                    parts.append(token)
+                    yield _sse("token", {"text": token})
+
+            script = "".join(parts).strip()
+            with timer.stage("validation"):
+                validation_results = await text_processor.validate_script_async(
+                    script,
+                    template_name=request.template_name
+                )
+            with timer.stage("fidelity"):
+                fidelity = await text_processor.check_fidelity_async(script, content, chunks)
+            yield _sse("validation", {
+                "script": script, "validation": validation_results, "fidelity": fidelity,
+                "timings": timer.timings()
+            })
+
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+
+        yield _sse("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/script-status/{task_id}", response_model=ScriptResponse)
 async def get_script_status(task_id: str):
-    """Get the status of a script generation task."""
-    if task_id not in active_tasks:
+    """Get the status of a script generation task, from the job queue when there is one."""
+    if job_queue is not None:
+        task = await text_processor.chunking_executor.run(job_queue.get, task_id)
+    else:
+        task = await text_processor.chunking_executor.run(task_store.get, task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = active_tasks[task_id]
-    
     return ScriptResponse(
         task_id=task_id,
         status=task["status"],
         script=task.get("script"),
         validation=task.get("validation"),
-        error=task.get("error")
+        error=task.get("error"),
+        timings=task.get("timings"),
+        attempts=task.get("attempts"),
+        coalesced_with=task.get("coalesced_with"),
+        fidelity=task.get("fidelity")
     )
 
 @app.post("/api/upload-file")
 async def upload_file(file: UploadFile = File(...)):
-    """Upload a file and extract its content."""
+    """Upload a text, Markdown, HTML or .docx file and store its extracted text.
+
+    The file is decoded block by block into the content store; the response carries a
+    ``content_id`` to pass to generate-script plus a short preview, not the full text.
+    """
+    if file.size is not None and file.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {UPLOAD_MAX_BYTES} byte upload limit")
     try:
-        content = await file.read()
-        text_content = content.decode("utf-8")
-        
+        info = await text_processor.chunking_executor.run(
+            extract_upload, file.file, file.filename, file.content_type, content_store, UPLOAD_MAX_BYTES
+        )
         return JSONResponse({
             "status": "success",
-            "content": text_content
+            "content_id": info["content_id"],
+            "filename": info["filename"],
+            "format": info["format"],
+            "encoding": info["encoding"],
+            "characters": info["characters"],
+            "preview": info["preview"]
         })
-        
+
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=415, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=400,
             detail=f"Error processing file: {str(e)}"
         )
 
+class ValidationRequest(BaseModel):
+    script: str
+    template_name: Optional[str] = None
+
+class FidelityRequest(ScriptRequest):
+    script: str
+
+class TextEdit(BaseModel):
+    start: int
+    end: int
+    text: str
+
+class BatchValidationRequest(BaseModel):
+    scripts: List[str]
+    template_name: Optional[str] = None
+    chunk_size: Optional[int] = None
+
+class IncrementalValidationRequest(BaseModel):
+    document_id: Optional[str] = None
+    script: Optional[str] = None
+    edits: Optional[List[TextEdit]] = None
+    template_name: Optional[str] = None
+    coherence: bool = False
+    pacing: bool = False
+
 @app.post("/api/validate-script")
-async def validate_script(script: str, template_name: Optional[str] = None):
+async def validate_script(request: ValidationRequest):
     """Validate a script against quality criteria and optional template."""
     try:
-        validation_results = text_processor.validate_script(script, template_name)
+        validation_results = await text_processor.validate_script_async(request.script, request.template_name)
         return JSONResponse({
             "status": "success",
             "validation": validation_results
@@ -167,28 +415,145 @@ async def validate_script(script: str, template_name: Optional[str] = None):
             detail=f"Error validating script: {str(e)}"
         )
 
+@app.post("/api/pacing")
+async def script_pacing(request: ValidationRequest):
+    """Narration timeline of a script: when each sentence and template section is spoken."""
+    try:
+        pacing = await text_processor.pacing_timeline_async(request.script, request.template_name)
+        return JSONResponse({
+            "status": "success",
+            "pacing": pacing
+        })
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error computing pacing: {str(e)}"
+        )
+
+@app.post("/api/fidelity")
+async def script_fidelity(request: FidelityRequest):
+    """Map each script paragraph to the source chunks it draws on, with coverage and novelty."""
+    content = await _resolve_content(request)
+    try:
+        fidelity = await text_processor.check_fidelity_async(request.script, content)
+        return JSONResponse({
+            "status": "success",
+            "fidelity": fidelity
+        })
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error checking fidelity: {str(e)}"
+        )
+
+@app.post("/api/validate-script/incremental")
+async def validate_script_incremental(request: IncrementalValidationRequest):
+    """Re-validate a script from a full copy or from edits to its last validated version.
+
+    Only paragraphs that changed since they were last seen are re-analyzed.
+    """
+    edits = None
+    if request.edits is not None:
+        edits = [(edit.start, edit.end, edit.text) for edit in request.edits]
+    try:
+        document_id, validation_results, changed = await text_processor.validate_incremental_async(
+            document_id=request.document_id,
+            script=request.script,
+            edits=edits,
+            template_name=request.template_name,
+            coherence=request.coherence,
+            pacing=request.pacing
+        )
+    except UnknownDocumentError:
+        raise HTTPException(
+            status_code=409,
+            detail="Unknown document; resend the full script"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error validating script: {str(e)}"
+        )
+
+    return JSONResponse({
+        "status": "success",
+        "document_id": document_id,
+        "reanalyzed_paragraphs": changed,
+        "validation": validation_results
+    })
+
+@app.post("/api/validate-batch")
+async def validate_batch(request: BatchValidationRequest):
+    """Validate many scripts on the validation process pool, streaming NDJSON results.
+
+    Each line is ``{"index": i, "validation": {...}}`` or ``{"index": i, "error": "..."}``;
+    lines arrive as batches finish, not necessarily in request order.
+    """
+    if request.chunk_size is not None and request.chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be at least 1")
+
+    async def lines():
+        try:
+            async for result in text_processor.validate_many_stream(
+                request.scripts,
+                template_name=request.template_name,
+                chunksize=request.chunk_size
+            ):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Error validating batch: {str(e)}"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    """Stop the chunking threads and validation worker processes with the server."""
+    text_processor.close()
+
+@app.on_event("shutdown")
+async def shutdown_backend():
+    """Close the LLM backend's pooled connections."""
+    await ai_handler.aclose()
+
+@app.on_event("shutdown")
+def shutdown_job_queue():
+    """Close the job queue database, if one is in use."""
+    if job_queue is not None:
+        job_queue.close()
+
+class ExportRequest(BaseModel):
+    script: str
+    format: str = 'txt'
+    # With a template, its section headers become headings in the export
+    template_name: Optional[str] = None
+    title: Optional[str] = None
+
 @app.post("/api/export-script")
-async def export_script(script: str, format: str = 'txt'):
-    """Export the script in various formats."""
+async def export_script(request: ExportRequest):
+    """Export the script in various formats, streamed in chunks."""
+    exporter = text_processor.exporter
     try:
-        content, content_type = text_processor.format_script_for_export(script, format)
-        
-        headers = {
-            'Content-Disposition': f'attachment; filename="script.{format}"',
-            'Content-Type': content_type
-        }
-        
-        return Response(
-            content=content,
-            headers=headers
+        chunks = exporter.stream(
+            request.script,
+            request.format,
+            template=text_processor.compiled_templates.get(request.template_name),
+            title=request.title
         )
-        
     except Exception as e:
         raise HTTPException(
             status_code=400,
             detail=f"Error exporting script: {str(e)}"
         )
 
+    headers = {
+        'Content-Disposition': f'attachment; filename="{exporter.filename(request.format)}"',
+        'Content-Type': exporter.media_type(request.format)
+    }
+    # Starlette iterates the synchronous renderer on its thread pool, off the event loop
+    return StreamingResponse(chunks, headers=headers)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
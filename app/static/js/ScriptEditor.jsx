@@ -25,6 +25,7 @@ import {
 
 const ScriptEditor = () => {
   const [content, setContent] = useState('');
+  const [upload, setUpload] = useState(null);
   const [highlightedConcept, setHighlightedConcept] = useState('');
   const [previousTopic, setPreviousTopic] = useState('');
   const [script, setScript] = useState('');
@@ -34,7 +35,8 @@ const ScriptEditor = () => {
   const [templates, setTemplates] = useState([]);
   const [selectedTemplate, setSelectedTemplate] = useState('');
   const [exportAnchorEl, setExportAnchorEl] = useState(null);
-  const pollInterval = useRef(null);
+  const streamController = useRef(null);
+  const documentId = useRef(null);
 
   useEffect(() => {
     // Fetch available templates
@@ -64,10 +66,12 @@ const ScriptEditor = () => {
       });
 
       const data = await response.json();
-      if (data.status === 'success') {
-        setContent(data.content);
+      if (response.ok && data.status === 'success') {
+        // The server keeps the text; generation refers to it by content id
+        setUpload(data);
+        setContent('');
       } else {
-        setError('Error uploading file');
+        setError('Error uploading file: ' + (data.detail || response.statusText));
       }
     } catch (err) {
       setError('Error uploading file: ' + err.message);
@@ -77,67 +81,89 @@ const ScriptEditor = () => {
   const generateScript = async () => {
     setLoading(true);
     setError(null);
+    setScript('');
+    setValidation(null);
+
+    const controller = new AbortController();
+    streamController.current = controller;
 
     try {
-      const response = await fetch('/api/generate-script', {
+      const response = await fetch('/api/generate-script/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-          content,
+          ...(upload && !content ? { content_id: upload.content_id } : { content }),
           template_name: selectedTemplate,
           highlighted_concept: highlightedConcept,
           previous_topic: previousTopic,
         }),
+        signal: controller.signal,
       });
 
-      const data = await response.json();
-      if (data.task_id) {
-        pollInterval.current = setInterval(
-          () => checkScriptStatus(data.task_id),
-          2000
-        );
-      } else {
+      if (!response.ok || !response.body) {
         setError('Error generating script');
         setLoading(false);
+        return;
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      // Server-Sent Events are separated by a blank line
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary !== -1) {
+          handleStreamEvent(buffer.slice(0, boundary));
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf('\n\n');
+        }
       }
     } catch (err) {
-      setError('Error generating script: ' + err.message);
+      if (err.name !== 'AbortError') {
+        setError('Error generating script: ' + err.message);
+      }
+    } finally {
+      streamController.current = null;
       setLoading(false);
     }
   };
 
-  const checkScriptStatus = async (taskId) => {
-    try {
-      const response = await fetch(`/api/script-status/${taskId}`);
-      const data = await response.json();
-
-      if (data.status === 'completed') {
-        clearInterval(pollInterval.current);
-        setScript(data.script);
-        setValidation(data.validation);
-        setLoading(false);
-      } else if (data.status === 'failed') {
-        clearInterval(pollInterval.current);
-        setError(data.error);
-        setLoading(false);
-      }
-    } catch (err) {
-      clearInterval(pollInterval.current);
-      setError('Error checking script status: ' + err.message);
-      setLoading(false);
+  const handleStreamEvent = (block) => {
+    let event = 'message';
+    let data = '';
+    block.split('\n').forEach((line) => {
+      if (line.startsWith('event: ')) event = line.slice(7);
+      else if (line.startsWith('data: ')) data += line.slice(6);
+    });
+    const payload = data ? JSON.parse(data) : {};
+
+    if (event === 'token') {
+      setScript((previous) => previous + payload.text);
+    } else if (event === 'validation') {
+      setScript(payload.script);
+      setValidation(payload.validation);
+    } else if (event === 'error') {
+      setError(payload.error);
     }
   };
 
   const validateScript = async () => {
     try {
-      const response = await fetch('/api/validate-script', {
+      // The server only re-analyzes paragraphs that changed since the last call
+      const response = await fetch('/api/validate-script/incremental', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
+          document_id: documentId.current,
           script,
           template_name: selectedTemplate,
         }),
@@ -145,6 +171,7 @@ const ScriptEditor = () => {
 
       const data = await response.json();
       if (data.status === 'success') {
+        documentId.current = data.document_id;
         setValidation(data.validation);
       }
     } catch (err) {
@@ -170,15 +197,18 @@ const ScriptEditor = () => {
         body: JSON.stringify({
           script,
           format,
+          template_name: selectedTemplate || null,
         }),
       });
 
       if (response.ok) {
+        const disposition = response.headers.get('Content-Disposition') || '';
+        const match = disposition.match(/filename="([^"]+)"/);
         const blob = await response.blob();
         const url = window.URL.createObjectURL(blob);
         const a = document.createElement('a');
         a.href = url;
-        a.download = `script.${format}`;
+        a.download = match ? match[1] : `script.${format}`;
         document.body.appendChild(a);
         a.click();
         window.URL.revokeObjectURL(url);
@@ -194,8 +224,8 @@ const ScriptEditor = () => {
 
   useEffect(() => {
     return () => {
-      if (pollInterval.current) {
-        clearInterval(pollInterval.current);
+      if (streamController.current) {
+        streamController.current.abort();
       }
     };
   }, []);
@@ -258,8 +288,16 @@ const ScriptEditor = () => {
                 multiline
                 rows={10}
                 value={content}
-                onChange={(e) => setContent(e.target.value)}
-                placeholder="Enter your content here..."
+                onChange={(e) => {
+                  setContent(e.target.value);
+                  setUpload(null);
+                }}
+                placeholder={upload ? upload.preview : 'Enter your content here...'}
+                helperText={
+                  upload
+                    ? `Using ${upload.filename} (${upload.characters.toLocaleString()} characters); type to replace it`
+                    : undefined
+                }
                 sx={{ mb: 2 }}
               />
 
@@ -282,7 +320,7 @@ const ScriptEditor = () => {
               <Button
                 variant="contained"
                 onClick={generateScript}
-                disabled={loading || !content}
+                disabled={loading || (!content && !upload)}
                 fullWidth
               >
                 Generate Script
@@ -313,6 +351,21 @@ const ScriptEditor = () => {
                       <MenuItem onClick={() => handleExport('md')}>
                         Export as Markdown
                       </MenuItem>
+                      <MenuItem onClick={() => handleExport('teleprompter')}>
+                        Export for Teleprompter
+                      </MenuItem>
+                      <MenuItem onClick={() => handleExport('srt')}>
+                        Export Captions (SRT)
+                      </MenuItem>
+                      <MenuItem onClick={() => handleExport('vtt')}>
+                        Export Captions (WebVTT)
+                      </MenuItem>
+                      <MenuItem onClick={() => handleExport('docx')}>
+                        Export as Word (DOCX)
+                      </MenuItem>
+                      <MenuItem onClick={() => handleExport('pdf')}>
+                        Export as PDF
+                      </MenuItem>
                     </Menu>
                   </Box>
                 )}
@@ -240,6 +240,23 @@ const ScriptEditor = () => {
               <br />
               Transition Words: {validation.engagement.transition_words}
             </Typography>
+
+            {validation.coherence && (
+              <>
+                <Typography variant="subtitle1" sx={{ mt: 2 }}>
+                  Coherence
+                </Typography>
+                <Typography>
+                  Callbacks: {validation.coherence.callbacks.count} (expected {validation.coherence.callbacks.expected})
+                  <br />
+                  Proper Nouns Mentioned Once: {validation.coherence.underused_proper_nouns.length}
+                  <br />
+                  Disconnected Paragraphs: {validation.coherence.disconnected_paragraphs.length}
+                  <br />
+                  Long Sentences: {validation.coherence.long_sentences.length}
+                </Typography>
+              </>
+            )}
           </Paper>
         )}
       </Box>
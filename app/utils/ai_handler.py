@@ -1,16 +1,268 @@
 import os
-from typing import Optional, Dict
-import openai
+import asyncio
+import time
+from typing import Optional, Dict, List, Tuple, AsyncIterator
 from dotenv import load_dotenv
 
+from .cache import ResponseCache
+from .config import AppConfig, ConfigRegistry, get_config_registry
+from .llm_backends import LLMBackend, create_backend
+from .metrics import REGISTRY
+from .prompts import PromptBuilder, UsageLog, estimate_prompt_tokens
+from .scheduler import LLMScheduler
+from .tokenizer import count_tokens
+
 # Load environment variables
 load_dotenv()
 
+# Scheduler priorities: lower values are dispatched first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Completion allowances for chunk drafts, summary merges and the final script
+DRAFT_MAX_TOKENS = 1000
+MERGE_MAX_TOKENS = 1000
+SCRIPT_MAX_TOKENS = 2000
+# Reserved for the instructions wrapped around drafts in merge and combine prompts
+PROMPT_OVERHEAD_TOKENS = 400
+# Completion allowance per target word when rewriting a single section
+SECTION_TOKENS_PER_WORD = 2
+
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    'llm_request_duration_seconds', 'Provider call latency per attempt, to the last streamed token', ['kind']
+)
+LLM_REQUESTS = REGISTRY.counter(
+    'llm_requests', 'LLM calls by kind and outcome (ok, error, cached)', ['kind', 'outcome']
+)
+LLM_TOKENS = REGISTRY.counter(
+    'llm_tokens', 'Tokens sent to and received from the provider by kind and type', ['kind', 'type']
+)
+
 class AIHandler:
-    def __init__(self):
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        self.model = "gpt-4"
-    
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[LLMScheduler] = None,
+        context_tokens: Optional[int] = None,
+        backend: Optional[LLMBackend] = None,
+        config: Optional[ConfigRegistry] = None
+    ):
+        """Initialize the handler; max_concurrency caps parallel chunk drafts.
+
+        context_tokens (default: ``parameters.context_tokens`` in llm.yaml) bounds the
+        prompt plus completion of every call; drafts that do not fit one combine call
+        are merged hierarchically first.
+
+        Responses are cached by model, parameters and messages. Without an explicit cache
+        one is built from LLM_CACHE_SIZE, LLM_CACHE_TTL and LLM_CACHE_PATH (disk tier).
+        API calls go through a shared LLMScheduler configured from llm.yaml and
+        quality_control.yaml unless one is passed in, and are made by the backend
+        selected by LLM_BACKEND or ``backend.provider`` in llm.yaml (``openai`` or ``fake``).
+
+        Prompts are rendered from prompts.yaml behind the ``system_prompts.scriptwriter``
+        preamble, and every call's token usage is recorded in ``self.usage``. Model,
+        sampling parameters and prompts follow config reloads; the backend and rate
+        limits are fixed at construction.
+        """
+        self.config = config or get_config_registry()
+        current = self.config.current
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self.max_concurrency = max(1, max_concurrency)
+        if cache is None:
+            cache = ResponseCache(
+                max_entries=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+                ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+                disk_path=os.getenv("LLM_CACHE_PATH") or None
+            )
+        self.cache = cache
+        if scheduler is None:
+            scheduler = LLMScheduler.from_config(
+                {'rate_limits': current.llm.rate_limits, 'models': {'fallback': current.llm.fallback_model}},
+                {'error_handling': current.quality.error_handling}
+            )
+        self.scheduler = scheduler
+        self.backend = backend or create_backend(current.llm.backend)
+        self.usage = UsageLog()
+        self._context_tokens = context_tokens
+        self._apply_config(current)
+        self.config.subscribe(self._apply_config)
+
+    def _apply_config(self, config: AppConfig) -> None:
+        """Swap in the model, sampling parameters and prompts of a config snapshot."""
+        self.model = config.llm.model
+        self.params = {"temperature": config.llm.temperature}
+        if config.llm.top_p is not None:
+            self.params["top_p"] = config.llm.top_p
+        self.context_tokens = self._context_tokens or config.llm.context_tokens
+        self.prompts = PromptBuilder(
+            config.prompts,
+            preamble=config.llm.system_prompts.get('scriptwriter', ''),
+            thresholds=config.quality.validation
+        )
+        self._prefix_tokens: Dict[str, int] = {}
+
+    def _prefix_token_count(self, kind: str) -> int:
+        """Tokens in a kind's system message, counted on first use so startup skips the tokenizer."""
+        if kind not in self.prompts.kinds:
+            return 0
+        if kind not in self._prefix_tokens:
+            self._prefix_tokens[kind] = count_tokens(self.prompts.system_message(kind), self.model)
+        return self._prefix_tokens[kind]
+
+    async def aclose(self) -> None:
+        """Close the backend's pooled connections."""
+        await self.backend.aclose()
+
+    def _prepare(self, system_message: str, user_message: str, max_tokens: int) -> Tuple[List[Dict], Dict, str]:
+        """Build the message list, call parameters and cache key for a completion."""
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ]
+        self.config.check()
+        params = dict(self.params, max_tokens=max_tokens)
+        return messages, params, ResponseCache.make_key(self.model, params, messages)
+
+    def _input_budget(self, completion_tokens: int) -> int:
+        """Tokens left for drafts in a prompt that must also fit a completion of the given size."""
+        return self.context_tokens - completion_tokens - PROMPT_OVERHEAD_TOKENS
+
+    def _estimate_tokens(self, messages: List[Dict], max_tokens: int) -> int:
+        """Prompt tokens plus the completion allowance, charged against the TPM budget."""
+        return sum(count_tokens(message["content"], self.model) for message in messages) + max_tokens
+
+    async def _complete(
+        self,
+        system_message: str,
+        user_message: str,
+        max_tokens: int = SCRIPT_MAX_TOKENS,
+        priority: int = PRIORITY_INTERACTIVE,
+        kind: str = 'script'
+    ) -> str:
+        """Run a single chat completion and return the stripped reply text.
+
+        Identical requests are answered from the response cache without calling the API.
+        Token usage is recorded under ``kind``.
+        """
+        messages, params, key = self._prepare(system_message, user_message, max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._record_usage(kind, system_message, user_message, cached, response_cached=True)
+            return cached
+
+        async def call(model: str):
+            with LLM_REQUEST_SECONDS.time(kind=kind):
+                return await self.backend.complete(model=model, messages=messages, **params)
+
+        try:
+            completion = await self.scheduler.submit(
+                call, self.model, self._estimate_tokens(messages, max_tokens), priority
+            )
+        except Exception:
+            LLM_REQUESTS.inc(kind=kind, outcome='error')
+            raise
+
+        result = completion.text.strip()
+        self.cache.set(key, result)
+        self._record_usage(kind, system_message, user_message, result, reported=completion.usage)
+        return result
+
+    async def _stream(
+        self,
+        system_message: str,
+        user_message: str,
+        max_tokens: int = SCRIPT_MAX_TOKENS,
+        priority: int = PRIORITY_INTERACTIVE,
+        kind: str = 'script'
+    ) -> AsyncIterator[str]:
+        """Run a streaming chat completion, yielding content deltas as they arrive.
+
+        A cached response is yielded in one piece; a fully streamed one is cached.
+        Opening the stream is scheduled and retried like any other call.
+        """
+        messages, params, key = self._prepare(system_message, user_message, max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._record_usage(kind, system_message, user_message, cached, response_cached=True)
+            yield cached
+            return
+
+        opened = time.perf_counter()
+
+        async def call(model: str):
+            nonlocal opened
+            opened = time.perf_counter()
+            return await self.backend.open_stream(model=model, messages=messages, **params)
+
+        parts = []
+        try:
+            stream = await self.scheduler.submit(
+                call, self.model, self._estimate_tokens(messages, max_tokens), priority
+            )
+            async for token in stream:
+                parts.append(token)
+                yield token
+        except Exception:
+            LLM_REQUESTS.inc(kind=kind, outcome='error')
+            raise
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - opened, kind=kind)
+
+        result = "".join(parts).strip()
+        self.cache.set(key, result)
+        # Streamed responses carry no usage block, so the counts are estimated
+        self._record_usage(kind, system_message, user_message, result)
+
+    def _record_usage(
+        self,
+        kind: str,
+        system_message: str,
+        user_message: str,
+        completion: str,
+        reported: Optional[Tuple[int, int, int]] = None,
+        response_cached: bool = False
+    ) -> Dict:
+        """Record one call's token usage, preferring the counts reported by the provider."""
+        if reported is not None:
+            prompt_tokens, completion_tokens, cached_prompt_tokens = reported
+        else:
+            prompt_tokens = estimate_prompt_tokens(system_message, user_message, self.model)
+            completion_tokens = count_tokens(completion, self.model)
+            cached_prompt_tokens = 0
+        LLM_REQUESTS.inc(kind=kind, outcome='cached' if response_cached else 'ok')
+        if not response_cached:
+            LLM_TOKENS.inc(prompt_tokens, kind=kind, type='prompt')
+            LLM_TOKENS.inc(completion_tokens, kind=kind, type='completion')
+            LLM_TOKENS.inc(cached_prompt_tokens, kind=kind, type='cached_prompt')
+        return self.usage.record(
+            kind,
+            self.model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_prompt_tokens=cached_prompt_tokens,
+            prefix_tokens=self._prefix_token_count(kind),
+            estimated=reported is None,
+            response_cached=response_cached
+        )
+
+    def _generate_prompt(
+        self,
+        content: str,
+        template_name: Optional[str] = None,
+        highlighted_concept: Optional[str] = None,
+        previous_topic: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """Build the system and user messages for single-pass generation."""
+        return self.prompts.build(
+            'script',
+            content=content,
+            template_name=template_name,
+            highlighted_concept=highlighted_concept,
+            previous_topic=previous_topic
+        )
+
     async def generate_script(
         self,
         content: str,
@@ -20,70 +272,281 @@ class AIHandler:
     ) -> str:
         """Generate a script from the provided content using optional template and context."""
         try:
-            # Build the system message
-            system_message = """You are an expert script writer for YouTube documentaries.
-            Your task is to transform the provided content into an engaging, well-structured script
-            that maintains accuracy while being accessible and entertaining."""
-            
-            # Build the user message
-            user_message = f"Content to transform:\n\n{content}\n\n"
-            
-            if template_name:
-                user_message += f"\nPlease follow the {template_name} style template structure."
-            
-            if highlighted_concept:
-                user_message += f"\nEmphasize this key concept: {highlighted_concept}"
-            
-            if previous_topic:
-                user_message += f"\nThis follows a previous video about: {previous_topic}"
-            
-            # Call the OpenAI API
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=0.7,
-                max_tokens=2000
+            system_message, user_message = self._generate_prompt(
+                content, template_name, highlighted_concept, previous_topic
             )
-            
-            return response.choices[0].message.content.strip()
-            
+
+            return await self._complete(system_message, user_message, kind='script')
+
         except Exception as e:
             raise Exception(f"Error generating script: {str(e)}")
-    
+
+    async def generate_script_from_chunks(
+        self,
+        chunks: List[str],
+        template_name: Optional[str] = None,
+        template_sections: Optional[List[str]] = None,
+        highlighted_concept: Optional[str] = None,
+        previous_topic: Optional[str] = None,
+        max_concurrency: Optional[int] = None
+    ) -> str:
+        """Map-reduce generation: draft every chunk concurrently, then stitch the drafts.
+
+        Drafts too large for one combine call are first merged level by level (see summarize_tree).
+        """
+        if len(chunks) <= 1:
+            return await self.generate_script(
+                content=chunks[0] if chunks else "",
+                template_name=template_name,
+                highlighted_concept=highlighted_concept,
+                previous_topic=previous_topic
+            )
+
+        drafts = (await self.summarize_tree(chunks, highlighted_concept, max_concurrency))[-1]
+
+        return await self.combine_drafts(
+            drafts,
+            template_name=template_name,
+            template_sections=template_sections,
+            highlighted_concept=highlighted_concept,
+            previous_topic=previous_topic
+        )
+
+    async def stream_script(
+        self,
+        chunks: List[str],
+        template_name: Optional[str] = None,
+        template_sections: Optional[List[str]] = None,
+        highlighted_concept: Optional[str] = None,
+        previous_topic: Optional[str] = None,
+        max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Like generate_script_from_chunks, but yield the final pass token by token.
+
+        For multi-chunk input the map step (and any summary merging) still runs to
+        completion first; only the reduce call is streamed.
+        """
+        try:
+            if len(chunks) <= 1:
+                system_message, user_message = self._generate_prompt(
+                    chunks[0] if chunks else "", template_name, highlighted_concept, previous_topic
+                )
+            else:
+                drafts = (await self.summarize_tree(chunks, highlighted_concept, max_concurrency))[-1]
+                system_message, user_message = self._combine_prompt(
+                    drafts, template_name, template_sections, highlighted_concept, previous_topic
+                )
+
+            kind = 'script' if len(chunks) <= 1 else 'combine'
+            async for token in self._stream(system_message, user_message, kind=kind):
+                yield token
+
+        except Exception as e:
+            raise Exception(f"Error streaming script: {str(e)}")
+
+    async def _draft_all(
+        self,
+        chunks: List[str],
+        highlighted_concept: Optional[str] = None,
+        max_concurrency: Optional[int] = None
+    ) -> List[str]:
+        """Map step over every chunk, at most max_concurrency drafts in flight."""
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def draft(index: int, chunk: str) -> str:
+            async with semaphore:
+                return await self.draft_chunk(chunk, index, len(chunks), highlighted_concept)
+
+        return list(await asyncio.gather(*(draft(i, chunk) for i, chunk in enumerate(chunks))))
+
+    async def summarize_tree(
+        self,
+        chunks: List[str],
+        highlighted_concept: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        budget: Optional[int] = None,
+        merge_budget: Optional[int] = None
+    ) -> List[List[str]]:
+        """Draft every chunk, then merge consecutive drafts level by level until they fit budget.
+
+        Returns every level, leaves first; the last level is what the combine step sees.
+        ``budget`` defaults to the combine prompt's share of the context window and
+        ``merge_budget`` to a merge prompt's. Nodes at every level are independent of the
+        template, and each is cached under the hash of its prompt (its children's content),
+        so re-running with a different template only repeats the final combine.
+        """
+        budget = budget or self._input_budget(SCRIPT_MAX_TOKENS)
+        merge_budget = merge_budget or self._input_budget(MERGE_MAX_TOKENS)
+        levels = [await self._draft_all(chunks, highlighted_concept, max_concurrency)]
+
+        while len(levels[-1]) > 1 and self._count_tokens(levels[-1]) > budget:
+            groups = self._group_by_budget(levels[-1], merge_budget)
+            if len(groups) == len(levels[-1]):
+                raise Exception("Error summarizing: drafts are too large to merge within the context budget")
+            levels.append(await self._merge_all(groups, len(levels), highlighted_concept, max_concurrency))
+
+        return levels
+
+    def _count_tokens(self, texts: List[str]) -> int:
+        return sum(count_tokens(text, self.model) for text in texts)
+
+    def _group_by_budget(self, texts: List[str], budget: int) -> List[List[str]]:
+        """Greedily group consecutive texts so each group's tokens stay within budget."""
+        groups: List[List[str]] = []
+        used = 0
+        for text in texts:
+            tokens = count_tokens(text, self.model)
+            if groups and used + tokens <= budget:
+                groups[-1].append(text)
+                used += tokens
+            else:
+                groups.append([text])
+                used = tokens
+        return groups
+
+    async def _merge_all(
+        self,
+        groups: List[List[str]],
+        level: int,
+        highlighted_concept: Optional[str] = None,
+        max_concurrency: Optional[int] = None
+    ) -> List[str]:
+        """Merge every group concurrently; single-draft groups pass through unchanged."""
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def merge(index: int, group: List[str]) -> str:
+            if len(group) == 1:
+                return group[0]
+            async with semaphore:
+                return await self.merge_summaries(group, level, index, highlighted_concept)
+
+        return list(await asyncio.gather(*(merge(i, group) for i, group in enumerate(groups))))
+
+    async def merge_summaries(
+        self,
+        segments: List[str],
+        level: int,
+        index: int,
+        highlighted_concept: Optional[str] = None
+    ) -> str:
+        """Condense consecutive draft segments into one shorter segment."""
+        try:
+            system_message, user_message = self.prompts.build(
+                'merge', segments=segments, highlighted_concept=highlighted_concept
+            )
+
+            return await self._complete(
+                system_message, user_message, max_tokens=MERGE_MAX_TOKENS,
+                priority=PRIORITY_BACKGROUND, kind='merge'
+            )
+
+        except Exception as e:
+            raise Exception(f"Error merging segments (level {level}, group {index + 1}): {str(e)}")
+
+    async def draft_chunk(
+        self,
+        chunk: str,
+        index: int,
+        total: int,
+        highlighted_concept: Optional[str] = None
+    ) -> str:
+        """Map step: turn one source chunk into a draft narration segment."""
+        try:
+            system_message, user_message = self.prompts.build(
+                'draft', chunk=chunk, index=index, total=total, highlighted_concept=highlighted_concept
+            )
+
+            return await self._complete(
+                system_message, user_message, max_tokens=DRAFT_MAX_TOKENS,
+                priority=PRIORITY_BACKGROUND, kind='draft'
+            )
+
+        except Exception as e:
+            raise Exception(f"Error drafting chunk {index + 1}: {str(e)}")
+
+    def _combine_prompt(
+        self,
+        drafts: List[str],
+        template_name: Optional[str] = None,
+        template_sections: Optional[List[str]] = None,
+        highlighted_concept: Optional[str] = None,
+        previous_topic: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """Build the system and user messages for the reduce step."""
+        return self.prompts.build(
+            'combine',
+            drafts=drafts,
+            template_name=template_name,
+            template_sections=template_sections,
+            highlighted_concept=highlighted_concept,
+            previous_topic=previous_topic
+        )
+
+    async def combine_drafts(
+        self,
+        drafts: List[str],
+        template_name: Optional[str] = None,
+        template_sections: Optional[List[str]] = None,
+        highlighted_concept: Optional[str] = None,
+        previous_topic: Optional[str] = None
+    ) -> str:
+        """Reduce step: stitch the chunk drafts into one script following the template sections."""
+        try:
+            system_message, user_message = self._combine_prompt(
+                drafts, template_name, template_sections, highlighted_concept, previous_topic
+            )
+
+            return await self._complete(system_message, user_message, kind='combine')
+
+        except Exception as e:
+            raise Exception(f"Error combining drafts: {str(e)}")
+
     async def improve_script(self, script: str, validation_results: Dict) -> str:
-        """Improve the script based on validation results."""
+        """Improve the script based on compact feedback derived from its validation results."""
         try:
-            # Build the improvement prompt
-            system_message = """You are an expert script editor.
-            Your task is to improve the script based on the validation results while
-            maintaining its core message and style."""
-            
-            user_message = f"""Please improve this script based on the following validation results:
-
-            Script:
-            {script}
-
-            Validation Results:
-            {validation_results}
-
-            Please address all issues while maintaining the script's core message and engagement level.
-            Return only the improved script without any explanations."""
-            
-            # Call the OpenAI API
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=0.7,
-                max_tokens=2000
+            system_message, user_message = self.prompts.build(
+                'improve', script=script, feedback=self.prompts.feedback(validation_results)
             )
-            
-            return response.choices[0].message.content.strip()
-            
+
+            return await self._complete(system_message, user_message, kind='improve')
+
         except Exception as e:
             raise Exception(f"Error improving script: {str(e)}")
+
+    async def improve_section(
+        self,
+        section: str,
+        body: str,
+        expected_range: Tuple[int, int],
+        actual_length: int = 0,
+        before: str = "",
+        after: str = "",
+        highlighted_concept: Optional[str] = None
+    ) -> str:
+        """Rewrite (or, with an empty body, write) one section to fit its word range.
+
+        Only the section and a little surrounding text are sent, so the cost scales
+        with the section rather than the whole script.
+        """
+        try:
+            low, high = expected_range
+            system_message, user_message = self.prompts.build(
+                'section',
+                section=section,
+                body=body.strip(),
+                low=low,
+                high=high,
+                target=(low + high) // 2,
+                actual=actual_length,
+                before=before.strip(),
+                after=after.strip(),
+                highlighted_concept=highlighted_concept
+            )
+
+            return await self._complete(
+                system_message, user_message,
+                max_tokens=high * SECTION_TOKENS_PER_WORD + 50, kind='section'
+            )
+
+        except Exception as e:
+            raise Exception(f"Error improving section {section}: {str(e)}")
@@ -0,0 +1,75 @@
+import asyncio
+import hashlib
+import json
+from typing import Optional, Dict, Callable, Awaitable, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+def content_sha256(content: str) -> str:
+    """Hex digest of the UTF-8 text, the same digest the content store records for uploads."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def request_key(
+    content_hash: str,
+    template_name: Optional[str] = None,
+    highlighted_concept: Optional[str] = None,
+    previous_topic: Optional[str] = None
+) -> str:
+    """Key under which identical generation requests are coalesced.
+
+    Pasted and uploaded copies of the same text share a key.
+    """
+    payload = json.dumps(
+        [content_hash, template_name, highlighted_concept, previous_topic],
+        separators=(',', ':'),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers with the key share its outcome.
+
+    Only in-flight calls are shared: once a call finishes, the next caller with the
+    same key starts a new one. A follower that is cancelled does not cancel the call.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Tuple[asyncio.Future, Optional[str]]] = {}
+        self._stats = {'leaders': 0, 'followers': 0}
+
+    def leader_of(self, key: str) -> Optional[str]:
+        """The owner label of the call in flight for key, if any."""
+        call = self._calls.get(key)
+        return call[1] if call else None
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]], owner: Optional[str] = None) -> Tuple[T, Optional[str]]:
+        """Return fn()'s result and, for followers, the owner label of the call they joined."""
+        call = self._calls.get(key)
+        if call is not None:
+            self._stats['followers'] += 1
+            future, leader = call
+            return await asyncio.shield(future), leader
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = (future, owner)
+        self._stats['leaders'] += 1
+        try:
+            result = await fn()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                e = RuntimeError("The request this one was coalesced with was cancelled")
+            future.set_exception(e)
+            # Mark the exception retrieved so an unfollowed failure is not logged
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, None
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> Dict:
+        return dict(self._stats, in_flight=len(self._calls))
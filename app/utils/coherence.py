@@ -0,0 +1,458 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+from typing import List, Dict, Tuple, Optional, Iterable, Callable, FrozenSet, Set, NamedTuple
+
+from .compliance import SectionSpan
+from .text_analysis import PhraseMatcher, TextAnalysis
+
+# Words that start with a letter; apostrophes and hyphens stay inside ("Franco-Prussian")
+_WORD_RE = re.compile(r"[^\W\d_][\w'’-]*")
+_POSSESSIVE_RE = re.compile(r"['’]s?$|-+$")
+# Openers that may sit between a sentence end and the next word
+_OPENERS = ' \t\r"\'([“‘'
+_SENTENCE_ENDS = ('.', '!', '?', ':', '…')
+
+# Capitalized only because they start a sentence, and too common to be key terms
+STOPWORDS = frozenset("""
+a about above after again against all also although am an and another any are around as at
+be because been before being below between both but by can could did do does doing down during
+each either even ever every few for from further had has have having he her here hers herself him
+himself his how however i if in into is it its itself just least less let like many may me might
+more most much must my myself neither never no nor not now of off often on once only or other our
+ours ourselves out over own perhaps rather same she should since so some still such than that the
+their theirs them themselves then there these they this those though through thus to today too
+under until up upon very was we were what whatever when where whether which while who whom whose
+why will with within without would yet you your yours yourself
+first second third next later finally meanwhile instead indeed imagine consider suddenly
+""".split())
+
+# Lowercase words shorter than this are not tracked as key terms
+MIN_TERM_LENGTH = 5
+MAX_KEY_TERMS = 20
+
+
+class ParagraphTerms(NamedTuple):
+    """Candidate terms of one paragraph; word indexes and offsets are relative to it."""
+    word_count: int
+    # (name, word index, offset, ambiguous): a lone capitalized word opening a sentence is
+    # ambiguous until the same name turns up mid-sentence somewhere in the script
+    names: Tuple[Tuple[str, int, int, bool], ...]
+    words: Tuple[Tuple[str, int, int], ...]
+
+
+@lru_cache(maxsize=8192)
+def scan_paragraph(text: str) -> ParagraphTerms:
+    """Split a paragraph into runs of capitalized words and lowercase content words.
+
+    Memoised by paragraph text, so re-validating an edited script only rescans the
+    paragraphs that changed.
+    """
+    names = []
+    words = []
+    run: List[Tuple[str, int, int]] = []
+    run_initial = False
+    previous_end = 0
+    count = 0
+
+    def flush():
+        tokens = run
+        initial = run_initial
+        if initial and tokens[0][0].lower() in STOPWORDS:
+            tokens = tokens[1:]
+            initial = False
+        if len(tokens) == 1 and tokens[0][0].lower() in STOPWORDS:
+            return
+        if tokens:
+            name = ' '.join(token for token, _, _ in tokens)
+            names.append((name, tokens[0][1], tokens[0][2], initial and len(tokens) == 1))
+
+    for count, match in enumerate(_WORD_RE.finditer(text), 1):
+        start = match.start()
+        token = _POSSESSIVE_RE.sub('', match.group())
+        gap = text[previous_end:start]
+        previous_end = match.end()
+        initial = count == 1 or '\n' in gap or gap.rstrip(_OPENERS).endswith(_SENTENCE_ENDS)
+        if token[:1].isupper():
+            if run and not initial and gap.isspace():
+                run.append((token, count - 1, start))
+                continue
+            if run:
+                flush()
+            run = [(token, count - 1, start)]
+            run_initial = initial
+            continue
+        if run:
+            flush()
+            run = []
+        lower = token.lower()
+        if len(lower) >= MIN_TERM_LENGTH and lower not in STOPWORDS:
+            words.append((lower, count - 1, start))
+    if run:
+        flush()
+
+    return ParagraphTerms(count, tuple(names), tuple(words))
+
+
+class Mention(NamedTuple):
+    word: int       # index of the term's first word in the script
+    paragraph: int
+    start: int      # character offset
+
+
+class ParagraphMentions(NamedTuple):
+    """One paragraph's share of the term index; word indexes and offsets are relative to it."""
+    word_count: int
+    # Term -> (word index, offset) of its first mention in the paragraph
+    names: Dict[str, Tuple[int, int]]
+    ambiguous: Dict[str, Tuple[int, int]]
+    words: Dict[str, Tuple[int, int]]
+    # Every mention, repeats included, so counting stays one C-level pass
+    name_mentions: Tuple[str, ...]
+    ambiguous_mentions: Tuple[str, ...]
+    word_mentions: Tuple[str, ...]
+    # Lowercase name parts and content words, for context distance
+    context: FrozenSet[str]
+
+
+def _paragraph_mentions(terms: ParagraphTerms, skip: Optional[Callable[[int], bool]] = None) -> ParagraphMentions:
+    names: Dict[str, Tuple[int, int]] = {}
+    ambiguous: Dict[str, Tuple[int, int]] = {}
+    words: Dict[str, Tuple[int, int]] = {}
+    name_mentions = []
+    ambiguous_mentions = []
+    word_mentions = []
+    context = set()
+    for name, word, start, unsure in terms.names:
+        if skip is not None and skip(start):
+            continue
+        if unsure:
+            ambiguous.setdefault(name, (word, start))
+            ambiguous_mentions.append(name)
+        else:
+            names.setdefault(name, (word, start))
+            name_mentions.append(name)
+        context.update(part.lower() for part in name.split())
+    for term, word, start in terms.words:
+        if skip is not None and skip(start):
+            continue
+        words.setdefault(term, (word, start))
+        word_mentions.append(term)
+    context.update(words)
+    return ParagraphMentions(
+        terms.word_count, names, ambiguous, words,
+        tuple(name_mentions), tuple(ambiguous_mentions), tuple(word_mentions), frozenset(context)
+    )
+
+
+@lru_cache(maxsize=8192)
+def paragraph_mentions(text: str) -> ParagraphMentions:
+    """Mentions of one paragraph without section headers, memoised by paragraph text.
+
+    Re-indexing an edited script only rescans the paragraphs that changed; the rest of
+    the index is assembled from these with set operations per paragraph.
+    """
+    return _paragraph_mentions(scan_paragraph(text))
+
+
+class TermIndex(NamedTuple):
+    """Proper nouns and key terms of a script and the paragraphs mentioning each."""
+    paragraphs: List[ParagraphMentions]
+    paragraph_offsets: List[int]
+    # Index of each paragraph's first word in the script
+    word_offsets: List[int]
+    # Names and sentence-initial words -> the proper noun or key term candidate they count towards
+    aliases: Dict[str, Optional[str]]
+    proper_nouns: Dict[str, int]    # mentions of each name, in order of first mention
+    key_terms: Dict[str, int]
+    # Proper nouns and key terms mentioned in each paragraph, and the first paragraph of each
+    tracked_terms: List[FrozenSet[str]]
+    first_paragraphs: Dict[str, int]
+    word_count: int
+
+    @property
+    def paragraph_terms(self) -> List[FrozenSet[str]]:
+        """Lowercase name parts and content words of each paragraph, for context distance."""
+        return [paragraph.context for paragraph in self.paragraphs]
+
+    def mention(self, term: str, paragraph: int) -> Mention:
+        """First mention of a tracked term in a paragraph that mentions it."""
+        mentions = self.paragraphs[paragraph]
+        aliases = self.aliases
+        if term in self.proper_nouns:
+            positions = [position for name, position in mentions.names.items() if aliases[name] == term]
+        else:
+            positions = [mentions.words[term]] if term in mentions.words else []
+        if mentions.ambiguous:
+            positions.extend(position for name, position in mentions.ambiguous.items() if aliases[name] == term)
+        word, start = min(positions)
+        return Mention(self.word_offsets[paragraph] + word, paragraph, self.paragraph_offsets[paragraph] + start)
+
+    def mentions(self, term: str) -> List[Mention]:
+        """First mention of a tracked term in every paragraph that mentions it, in script order."""
+        return [self.mention(term, paragraph) for paragraph, terms in enumerate(self.tracked_terms) if term in terms]
+
+
+def _aliases(names: Iterable[str], ambiguous: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Map every name to the name it counts towards.
+
+    "Caesar" counts towards "Julius Caesar" when that is the only name ending in it.
+    A sentence-initial name matching no name is an ordinary word after all, and maps
+    to its lowercase form, or to None when that is too short or common to track.
+    """
+    names = set(names)
+    surnames: Dict[str, List[str]] = {}
+    for name in names:
+        parts = name.split()
+        if len(parts) > 1:
+            surnames.setdefault(parts[-1], []).append(name)
+
+    def target(name: str) -> Optional[str]:
+        full = surnames.get(name, ())
+        if len(full) == 1:
+            return full[0]
+        return name if name in names else None
+
+    aliases = {name: target(name) for name in names}
+    for name in ambiguous:
+        full = target(name)
+        if full is None:
+            term = name.lower()
+            full = term if len(term) >= MIN_TERM_LENGTH and term not in STOPWORDS else None
+        aliases[name] = full
+    return aliases
+
+
+def _overlaps(phrase: str, banned: str) -> bool:
+    """Whether a match of phrase can hide one of banned: it contains it or runs into it."""
+    if f" {banned} " in f" {phrase} ":
+        return True
+    words = phrase.split()
+    banned_words = banned.split()
+    return any(words[i:] == banned_words[:len(words) - i] for i in range(1, len(words)))
+
+
+class CoherenceAnalyzer:
+    """Checks the ``validation.coherence`` rules of quality_control.yaml without the LLM.
+
+    Proper nouns and the most repeated content words are indexed by paragraph. A mention
+    more than ``max_context_distance`` paragraphs after the previous one is a callback;
+    stretches of more than ``callback_frequency`` words without one are reported, as are
+    proper nouns mentioned fewer than ``min_proper_noun_repetition`` times, paragraphs
+    that neither call anything back nor share a name or content word with the
+    ``max_context_distance`` before them, sentences over ``max_sentence_length`` words
+    and every banned transition. Each paragraph's mentions are memoised; the rest is
+    set operations per paragraph, so checking an edited script costs little more than
+    rescanning the paragraphs that changed.
+    """
+
+    def __init__(
+        self,
+        config: Optional[Dict] = None,
+        max_sentence_length: int = 25,
+        banned_transitions: Iterable[str] = ()
+    ):
+        config = config or {}
+        self.max_context_distance = config.get('max_context_distance', 3)
+        self.min_proper_noun_repetition = config.get('min_proper_noun_repetition', 2)
+        self.callback_frequency = config.get('callback_frequency', 500)
+        self.max_key_terms = config.get('max_key_terms', MAX_KEY_TERMS)
+        self.max_sentence_length = max_sentence_length
+        self.banned = PhraseMatcher(banned_transitions)
+        self._hiding_phrases: Tuple[Optional[PhraseMatcher], Optional[FrozenSet[str]]] = (None, None)
+
+    def index(self, analysis: TextAnalysis, spans: Optional[List[SectionSpan]] = None) -> TermIndex:
+        """Index every proper noun and key term; section headers are not counted as mentions."""
+        text = analysis.text
+        spans = spans or []
+        header_starts = [span.header_start for span in spans]
+
+        def in_header(start: int) -> bool:
+            i = bisect_right(header_starts, start) - 1
+            return i >= 0 and start < spans[i].start
+
+        paragraphs: List[ParagraphMentions] = []
+        word_offsets: List[int] = []
+        base = 0
+        for offset, end in analysis.paragraph_offsets:
+            if in_header(offset) or bisect_left(header_starts, end) > bisect_left(header_starts, offset):
+                # Few paragraphs hold a header; theirs are rescanned without it
+                mentions = _paragraph_mentions(
+                    scan_paragraph(text[offset:end]), lambda start, offset=offset: in_header(offset + start)
+                )
+            else:
+                mentions = paragraph_mentions(text[offset:end])
+            paragraphs.append(mentions)
+            word_offsets.append(base)
+            base += mentions.word_count
+
+        name_counts = Counter(chain.from_iterable(mentions.name_mentions for mentions in paragraphs))
+        ambiguous_counts = Counter(chain.from_iterable(mentions.ambiguous_mentions for mentions in paragraphs))
+        word_counts = Counter(chain.from_iterable(mentions.word_mentions for mentions in paragraphs))
+        aliases = _aliases(name_counts, ambiguous_counts)
+
+        # Full names keep the place of their own first mention
+        proper_nouns = {name: 0 for name in name_counts if aliases[name] == name}
+        for name, count in chain(name_counts.items(), ambiguous_counts.items()):
+            term = aliases[name]
+            if term in proper_nouns:
+                proper_nouns[term] += count
+            elif term is not None:
+                word_counts[term] += count
+
+        name_parts = {part.lower() for name in proper_nouns for part in name.split()}
+        repeated = {
+            term for term, count in word_counts.items()
+            if count >= self.min_proper_noun_repetition and term not in name_parts
+        }
+        demoted = {name for name in ambiguous_counts if aliases[name] in repeated}
+        # Ties go to the term mentioned first
+        first: Dict[str, Tuple[int, int]] = {}
+        for paragraph, mentions in enumerate(paragraphs):
+            if len(first) == len(repeated):
+                break
+            for term in repeated.intersection(mentions.words).difference(first):
+                first[term] = (paragraph, mentions.words[term][0])
+            for name in demoted.intersection(mentions.ambiguous):
+                term = aliases[name]
+                position = (paragraph, mentions.ambiguous[name][0])
+                if position < first.get(term, (len(paragraphs), 0)):
+                    first[term] = position
+        ranked = sorted(
+            repeated, key=lambda term: (word_counts[term], -first[term][0], -first[term][1]), reverse=True
+        )
+        key_terms = {term: word_counts[term] for term in ranked[:self.max_key_terms]}
+
+        tracked = set(proper_nouns).union(key_terms)
+        tracked_terms = []
+        first_paragraphs: Dict[str, int] = {}
+        for paragraph, mentions in enumerate(paragraphs):
+            terms = tracked.intersection(mentions.words)
+            if mentions.names or mentions.ambiguous:
+                terms.update(aliases[name] for name in chain(mentions.names, mentions.ambiguous))
+                terms.intersection_update(tracked)
+            tracked_terms.append(frozenset(terms))
+            first_paragraphs.update(dict.fromkeys(terms.difference(first_paragraphs), paragraph))
+
+        return TermIndex(
+            paragraphs, [offset for offset, _ in analysis.paragraph_offsets], word_offsets,
+            aliases, proper_nouns, key_terms, tracked_terms, first_paragraphs, base
+        )
+
+    def _callbacks(self, index: TermIndex) -> List[Tuple[Mention, str]]:
+        """Mentions of a term more than max_context_distance paragraphs after the previous one."""
+        distance = self.max_context_distance
+        tracked_terms = index.tracked_terms
+        seen: Set[str] = set()
+        callbacks = []
+        for paragraph, terms in enumerate(tracked_terms):
+            if not terms:
+                continue
+            recalled = seen.intersection(terms)
+            if recalled:
+                recalled.difference_update(*tracked_terms[max(0, paragraph - distance):paragraph])
+                callbacks.extend((index.mention(term, paragraph), term) for term in recalled)
+            seen.update(terms)
+        callbacks.sort()
+        return callbacks
+
+    def _disconnected(self, index: TermIndex, analysis: TextAnalysis, callbacks: Set[int]) -> List[Dict]:
+        """Paragraphs sharing no word with the few before them and calling nothing back."""
+        distance = self.max_context_distance
+        paragraph_terms = index.paragraph_terms
+        disconnected = []
+        started = False
+        for paragraph, terms in enumerate(paragraph_terms):
+            if not terms:
+                # Headings and very short paragraphs carry nothing to compare
+                continue
+            if started and paragraph not in callbacks and all(
+                terms.isdisjoint(previous) for previous in paragraph_terms[max(0, paragraph - distance):paragraph]
+            ):
+                start, end = analysis.paragraph_offsets[paragraph]
+                disconnected.append({'paragraph': paragraph, 'start': start, 'end': end})
+            started = True
+        return disconnected
+
+    def _hiding(self, matcher: Optional[PhraseMatcher]) -> Optional[FrozenSet[str]]:
+        """Phrases of an analysis' matcher whose matches may hold or overlap a banned transition.
+
+        None when the matcher does not count every banned transition.
+        """
+        cached, phrases = self._hiding_phrases
+        if matcher is cached and matcher is not None:
+            return phrases
+        phrases = None
+        if matcher is not None and set(self.banned.phrases) <= set(matcher.phrases):
+            phrases = frozenset(
+                phrase for phrase in matcher.phrases
+                if any(_overlaps(phrase, banned) for banned in self.banned.phrases)
+            )
+        self._hiding_phrases = (matcher, phrases)
+        return phrases
+
+    def _banned_transitions(self, analysis: TextAnalysis) -> List[Dict]:
+        """Banned transitions, searched for only in paragraphs whose phrase counts may hold one."""
+        text = analysis.text
+        hiding = self._hiding(analysis.matcher)
+        if hiding is None:
+            ranges = [(0, len(text))]
+        elif hiding.isdisjoint(analysis.phrase_counts):
+            return []
+        else:
+            ranges = [
+                offsets for offsets, paragraph in zip(analysis.paragraph_offsets, analysis.paragraphs)
+                if not hiding.isdisjoint(paragraph.phrase_counts)
+            ]
+        return [
+            {'phrase': phrase, 'start': start, 'end': end}
+            for pos, endpos in ranges
+            for phrase, start, end in self.banned.finditer(text, pos, endpos)
+        ]
+
+    def summarize(self, index: TermIndex, analysis: TextAnalysis) -> Dict:
+        """Repetition counts, callback spacing and the location of every flagged span."""
+        text = analysis.text
+        callbacks = self._callbacks(index)
+        # Gaps run from the start of the script, between callbacks, and to its end
+        marks = [(0, 0)] + [(mention.word, mention.start) for mention, _ in callbacks]
+        marks.append((index.word_count, len(text)))
+        gaps = [
+            {'start': start, 'end': end, 'words': words - previous}
+            for (previous, start), (words, end) in zip(marks, marks[1:])
+        ]
+        underused = [name for name, count in index.proper_nouns.items() if count < self.min_proper_noun_repetition]
+
+        return {
+            'proper_nouns': dict(index.proper_nouns),
+            'key_terms': dict(index.key_terms),
+            'underused_proper_nouns': [
+                {'name': name, 'count': index.proper_nouns[name], 'start': index.mention(name, index.first_paragraphs[name]).start}
+                for name in underused
+            ],
+            'callbacks': {
+                'count': len(callbacks),
+                'expected': index.word_count // self.callback_frequency,
+                'max_gap_words': max(gap['words'] for gap in gaps),
+                'long_gaps': [gap for gap in gaps if gap['words'] > self.callback_frequency],
+                'mentions': [
+                    {'term': term, 'start': mention.start, 'paragraph': mention.paragraph}
+                    for mention, term in callbacks
+                ]
+            },
+            'disconnected_paragraphs': self._disconnected(
+                index, analysis, {mention.paragraph for mention, _ in callbacks}
+            ),
+            'long_sentences': [
+                {'start': start, 'end': end, 'words': words}
+                for start, end, words, _ in analysis.sentences()
+                if words > self.max_sentence_length
+            ],
+            'banned_transitions': self._banned_transitions(analysis)
+        }
+
+    def check(self, analysis: TextAnalysis, spans: Optional[List[SectionSpan]] = None) -> Dict:
+        """Index the script and summarize it."""
+        return self.summarize(self.index(analysis, spans), analysis)
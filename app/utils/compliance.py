@@ -0,0 +1,88 @@
+import re
+from typing import List, Dict, Tuple, Optional, NamedTuple
+
+# A whitespace-delimited token containing at least one word character
+_WORD_RE = re.compile(r"[^\s\w]*\w\S*")
+
+
+class SectionSpan(NamedTuple):
+    """One occurrence of a section in a script; start/end delimit its body after the header."""
+    name: str
+    header_start: int
+    start: int
+    end: int
+    word_count: int
+
+
+class CompiledTemplate:
+    """A template from templates.yaml compiled once into a single header matcher.
+
+    A header is a line that starts with a section name, optionally as a Markdown heading
+    or in bold, and either ends there or continues after a colon, e.g. ``## Introduction``,
+    ``**Main Content**`` or ``Conclusion: ...``.
+    """
+
+    def __init__(self, name: str, template: Dict):
+        self.name = name
+        self.display_name = template.get('name', name)
+        # Narrated length the whole script should land in, as [min, max] seconds
+        target = template.get('target_duration')
+        self.target_duration: Optional[Tuple[float, float]] = tuple(target) if target else None
+        self.sections: List[Tuple[str, Tuple[int, int]]] = [
+            (section['section'], tuple(section['length_range']))
+            for section in template.get('structure', [])
+        ]
+        # Longest names first so "Summary of Results" wins over "Summary"
+        order = sorted(range(len(self.sections)), key=lambda i: len(self.sections[i][0]), reverse=True)
+        gap = r'[ \t]+'
+        alternatives = '|'.join(
+            f"(?P<s{i}>{gap.join(map(re.escape, self.sections[i][0].split()))})" for i in order
+        )
+        self._header = re.compile(
+            rf"^[ \t]*(?:#{{1,6}}[ \t]*)?(?:\*\*|__)?[ \t]*(?:{alternatives})[ \t]*(?:\*\*|__)?[ \t]*(?::|$)",
+            re.IGNORECASE | re.MULTILINE
+        ) if self.sections else None
+
+    def segment(self, text: str) -> List[SectionSpan]:
+        """Split text into section spans in one pass over the headers, in document order."""
+        if self._header is None:
+            return []
+        headers = [
+            (match.start(), match.end(), self.sections[int(match.lastgroup[1:])][0])
+            for match in self._header.finditer(text)
+        ]
+        spans = []
+        for i, (header_start, body_start, name) in enumerate(headers):
+            end = headers[i + 1][0] if i + 1 < len(headers) else len(text)
+            word_count = len(_WORD_RE.findall(text, body_start, end))
+            spans.append(SectionSpan(name, header_start, body_start, end, word_count))
+        return spans
+
+    def check(self, text: str, spans: Optional[List[SectionSpan]] = None) -> Dict:
+        """Report presence, word count, offsets and range compliance for every template section.
+
+        A section that appears more than once is measured across all its occurrences.
+        """
+        if spans is None:
+            spans = self.segment(text)
+        found: Dict[str, List[SectionSpan]] = {}
+        for span in spans:
+            found.setdefault(span.name, []).append(span)
+
+        compliance = {}
+        for name, expected_range in self.sections:
+            occurrences = found.get(name, [])
+            word_count = sum(span.word_count for span in occurrences)
+            compliance[name] = {
+                'present': bool(occurrences),
+                'length_in_range': bool(occurrences) and expected_range[0] <= word_count <= expected_range[1],
+                'actual_length': word_count,
+                'expected_range': list(expected_range),
+                'offsets': [[span.start, span.end] for span in occurrences]
+            }
+        return compliance
+
+
+def compile_templates(templates: Dict) -> Dict[str, CompiledTemplate]:
+    """Compile every template in a templates.yaml mapping."""
+    return {name: CompiledTemplate(name, template) for name, template in templates.items()}
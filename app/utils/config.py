@@ -0,0 +1,365 @@
+import logging
+import os
+import threading
+import time
+from typing import List, Dict, Tuple, Optional, NamedTuple, Callable, Any
+import yaml
+
+from .compliance import compile_templates
+from .text_analysis import PhraseMatcher
+
+logger = logging.getLogger(__name__)
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config")
+
+CONFIG_FILES = {
+    'templates': "templates.yaml",
+    'llm': "llm.yaml",
+    'quality': "quality_control.yaml",
+    'prompts': "prompts.yaml",
+    'export': "export.yaml",
+}
+
+# Counted by engagement checks alongside the banned transitions from quality_control.yaml
+TRANSITION_WORDS = ('however', 'therefore', 'furthermore', 'moreover', 'meanwhile')
+
+
+class ConfigError(ValueError):
+    """Raised when a config file does not parse or fails validation."""
+
+
+class FrozenDict(dict):
+    """A dict that refuses mutation; still JSON-serializable and usable wherever a dict is read."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Config values are read-only; edit the YAML file instead")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def freeze(value: Any) -> Any:
+    """Recursively turn dicts into FrozenDicts and lists into tuples."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class LLMSettings(NamedTuple):
+    model: str
+    fallback_model: Optional[str]
+    temperature: float
+    top_p: Optional[float]
+    max_tokens: int
+    context_tokens: int
+    backend: FrozenDict
+    rate_limits: FrozenDict
+    system_prompts: FrozenDict
+
+
+class QualitySettings(NamedTuple):
+    validation: FrozenDict
+    banned_transitions: Tuple[str, ...]
+    pacing: FrozenDict
+    coherence: FrozenDict
+    fidelity: FrozenDict
+    error_handling: FrozenDict
+
+
+class AppConfig(NamedTuple):
+    """One validated snapshot of every config file, with the objects compiled from it."""
+    version: int
+    templates: FrozenDict
+    compiled_templates: FrozenDict  # name -> CompiledTemplate
+    phrase_matcher: PhraseMatcher
+    llm: LLMSettings
+    quality: QualitySettings
+    prompts: FrozenDict
+    export: FrozenDict
+
+
+def _read_yaml(path: str) -> Dict:
+    """Parse a YAML file; a missing file is an empty mapping."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        try:
+            data = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            raise ConfigError(f"{path}: {e}") from e
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: expected a mapping at the top level")
+    return data
+
+
+def _mapping(data: Dict, key: str, where: str) -> Dict:
+    value = data.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ConfigError(f"{where}.{key}: expected a mapping")
+    return value
+
+
+def _number(data: Dict, key: str, default, where: str, minimum: float = 0, maximum: Optional[float] = None):
+    """Validated number at data[key]; null is only allowed for settings whose default is None."""
+    value = data.get(key, default)
+    if value is None:
+        if default is not None:
+            raise ConfigError(f"{where}.{key}: expected a number, got null")
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ConfigError(f"{where}.{key}: expected a number, got {value!r}")
+    if value < minimum or (maximum is not None and value > maximum):
+        bounds = f"between {minimum} and {maximum}" if maximum is not None else f"at least {minimum}"
+        raise ConfigError(f"{where}.{key}: must be {bounds}, got {value!r}")
+    return value
+
+
+def _range(value: Any, where: str) -> Tuple[float, float]:
+    if (
+        not isinstance(value, (list, tuple)) or len(value) != 2
+        or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)
+        or value[0] > value[1]
+    ):
+        raise ConfigError(f"{where}: expected [min, max], got {value!r}")
+    return value[0], value[1]
+
+
+def _parse_templates(data: Dict, path: str) -> Dict:
+    templates = data.get('templates', data)
+    if not isinstance(templates, dict):
+        raise ConfigError(f"{path}: templates must be a mapping")
+    for name, template in templates.items():
+        where = f"{path}: templates.{name}"
+        if not isinstance(template, dict):
+            raise ConfigError(f"{where}: expected a mapping")
+        structure = template.get('structure', [])
+        if not isinstance(structure, list):
+            raise ConfigError(f"{where}.structure: expected a list of sections")
+        for i, section in enumerate(structure):
+            if not isinstance(section, dict) or not isinstance(section.get('section'), str):
+                raise ConfigError(f"{where}.structure[{i}]: every section needs a 'section' name")
+            _range(section.get('length_range'), f"{where}.structure[{i}].length_range")
+        if template.get('target_duration') is not None:
+            _range(template['target_duration'], f"{where}.target_duration")
+    return templates
+
+
+def _parse_llm(data: Dict, path: str) -> LLMSettings:
+    models = _mapping(data, 'models', path)
+    parameters = _mapping(data, 'parameters', path)
+    where = f"{path}: parameters"
+    model = models.get('default', 'gpt-4')
+    if not isinstance(model, str) or not model:
+        raise ConfigError(f"{path}: models.default must be a model name")
+    max_tokens = int(_number(parameters, 'max_tokens', 4000, where, minimum=1))
+    context_tokens = int(_number(parameters, 'context_tokens', 8192, where, minimum=1))
+    return LLMSettings(
+        model=model,
+        fallback_model=models.get('fallback'),
+        temperature=_number(parameters, 'temperature', 0.7, where, maximum=2),
+        top_p=_number(parameters, 'top_p', None, where, maximum=1),
+        max_tokens=max_tokens,
+        context_tokens=context_tokens,
+        backend=freeze(_mapping(data, 'backend', path)),
+        rate_limits=freeze(_mapping(data, 'rate_limits', path)),
+        system_prompts=freeze(_mapping(data, 'system_prompts', path)),
+    )
+
+
+def _parse_quality(data: Dict, path: str) -> QualitySettings:
+    validation = _mapping(data, 'validation', path)
+    style = _mapping(validation, 'style', f"{path}: validation")
+    banned = style.get('banned_transitions') or []
+    if not isinstance(banned, list) or not all(isinstance(phrase, str) for phrase in banned):
+        raise ConfigError(f"{path}: validation.style.banned_transitions must be a list of phrases")
+    pacing = _mapping(validation, 'pacing', f"{path}: validation")
+    _number(pacing, 'words_per_minute', 150, f"{path}: validation.pacing", minimum=1)
+    for name, seconds in _mapping(pacing, 'pauses', f"{path}: validation.pacing").items():
+        _number({name: seconds}, name, 0, f"{path}: validation.pacing.pauses")
+    coherence = _mapping(validation, 'coherence', f"{path}: validation")
+    _number(coherence, 'max_context_distance', 3, f"{path}: validation.coherence")
+    for name in ('min_proper_noun_repetition', 'callback_frequency', 'max_key_terms'):
+        _number(coherence, name, 1, f"{path}: validation.coherence", minimum=1)
+    fidelity = _mapping(validation, 'fidelity', f"{path}: validation")
+    where = f"{path}: validation.fidelity"
+    for name in ('shingle_size', 'num_perm', 'bands', 'window_words', 'max_matches'):
+        _number(fidelity, name, 1, where, minimum=1)
+    _number(fidelity, 'min_score', 0, where, maximum=1)
+    num_perm, bands = fidelity.get('num_perm', 64), fidelity.get('bands', 32)
+    if not isinstance(num_perm, int) or not isinstance(bands, int) or num_perm & (num_perm - 1) or num_perm % bands:
+        raise ConfigError(f"{where}: num_perm must be a power of two divisible by bands")
+    readability = _mapping(validation, 'readability', f"{path}: validation")
+    _number(readability, 'max_sentence_length', 25, f"{path}: validation.readability", minimum=1)
+    return QualitySettings(
+        validation=freeze(validation),
+        banned_transitions=tuple(phrase.lower() for phrase in banned),
+        pacing=freeze(pacing),
+        coherence=freeze(coherence),
+        fidelity=freeze(fidelity),
+        error_handling=freeze(_mapping(data, 'error_handling', path)),
+    )
+
+
+def _parse_prompts(data: Dict, path: str) -> Dict:
+    roles = _mapping(data, 'roles', path)
+    messages = _mapping(data, 'messages', path)
+    missing = [kind for kind in roles if kind not in messages]
+    if missing:
+        raise ConfigError(f"{path}: roles without a message template: {', '.join(missing)}")
+    return data
+
+
+def _parse_export(data: Dict, path: str) -> Dict:
+    templates = _mapping(data, 'templates', path)
+    if not all(isinstance(source, str) for source in templates.values()):
+        raise ConfigError(f"{path}: templates must map names to Jinja2 template text")
+    return data
+
+
+def load_config(paths: Dict[str, str], version: int = 1) -> AppConfig:
+    """Parse and validate every config file and compile what can be compiled up front."""
+    raw = {name: _read_yaml(path) for name, path in paths.items()}
+    templates = freeze(_parse_templates(raw['templates'], paths['templates']))
+    quality = _parse_quality(raw['quality'], paths['quality'])
+    return AppConfig(
+        version=version,
+        templates=templates,
+        compiled_templates=FrozenDict(compile_templates(templates)),
+        # One compiled matcher serves both the transition count and the banned phrase check
+        phrase_matcher=PhraseMatcher(list(TRANSITION_WORDS) + list(quality.banned_transitions)),
+        llm=_parse_llm(raw['llm'], paths['llm']),
+        quality=quality,
+        prompts=freeze(_parse_prompts(raw['prompts'], paths['prompts'])),
+        export=freeze(_parse_export(raw['export'], paths['export'])),
+    )
+
+
+class ConfigRegistry:
+    """Holds the current AppConfig and swaps in a new one when a config file changes.
+
+    Files are parsed once per process and shared by every component built on the
+    registry. ``check()`` is cheap enough for hot paths: it stats the files at most once
+    per ``check_interval`` seconds (0 disables reloading). A file that fails to parse or
+    validate is reported and the previous config stays in effect; only the first load raises.
+    """
+
+    def __init__(self, paths: Optional[Dict[str, str]] = None, check_interval: float = 2.0):
+        self.paths = {name: os.path.join(CONFIG_DIR, filename) for name, filename in CONFIG_FILES.items()}
+        self.paths.update({name: path for name, path in (paths or {}).items() if path})
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._config: Optional[AppConfig] = None
+        self._signature: Optional[Tuple] = None
+        self._next_check = 0.0
+        self._listeners: List[Callable[[AppConfig], None]] = []
+        self._stats = {'reloads': 0, 'errors': 0}
+        self.last_error: Optional[str] = None
+
+    def _file_signature(self) -> Tuple:
+        signature = []
+        for name in sorted(self.paths):
+            try:
+                stat = os.stat(self.paths[name])
+                signature.append((name, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((name, None, None))
+        return tuple(signature)
+
+    @property
+    def current(self) -> AppConfig:
+        config = self._config
+        if config is None:
+            with self._lock:
+                if self._config is None:
+                    self._load()
+                config = self._config
+        return config
+
+    def _load(self) -> AppConfig:
+        signature = self._file_signature()
+        version = self._config.version + 1 if self._config else 1
+        config = load_config(self.paths, version)
+        self._config = config
+        self._signature = signature
+        self._next_check = time.monotonic() + self.check_interval
+        return config
+
+    def check(self) -> bool:
+        """Reload if any file changed since the last load; returns whether a new config is in effect."""
+        if self.check_interval <= 0 or self._config is None or time.monotonic() < self._next_check:
+            return False
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            if self._file_signature() == self._signature:
+                return False
+            return self.reload()
+
+    def reload(self) -> bool:
+        """Re-read every file now and notify subscribers; keeps the old config on error."""
+        with self._lock:
+            if self._config is None:
+                self._load()
+                return True
+            try:
+                config = self._load()
+            except Exception as e:
+                # Any failure keeps the old config; do not retry the same broken files
+                # until they change again
+                self._signature = self._file_signature()
+                self._stats['errors'] += 1
+                self.last_error = str(e)
+                logger.error("Keeping config version %d: %s", self._config.version, e)
+                return False
+            self._stats['reloads'] += 1
+            self.last_error = None
+            listeners = list(self._listeners)
+        logger.info("Loaded config version %d", config.version)
+        for listener in listeners:
+            try:
+                listener(config)
+            except Exception:
+                logger.exception("Config subscriber failed to apply version %d", config.version)
+        return True
+
+    def subscribe(self, listener: Callable[[AppConfig], None]) -> None:
+        """Call listener with every config loaded after this one."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def stats(self) -> Dict:
+        config = self._config
+        return dict(
+            self._stats,
+            version=config.version if config else 0,
+            last_error=self.last_error,
+            check_interval=self.check_interval
+        )
+
+
+def create_config_registry() -> ConfigRegistry:
+    """Build a registry from APP_CONFIG_DIR (default: app/config) and CONFIG_RELOAD_INTERVAL."""
+    config_dir = os.getenv("APP_CONFIG_DIR")
+    paths = {
+        name: os.path.join(config_dir, filename) for name, filename in CONFIG_FILES.items()
+    } if config_dir else None
+    return ConfigRegistry(paths, float(os.getenv("CONFIG_RELOAD_INTERVAL", "2")))
+
+
+_default_registry: Optional[ConfigRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_config_registry() -> ConfigRegistry:
+    """The registry shared by every component in this process, created on first use."""
+    global _default_registry
+    if _default_registry is None:
+        with _default_lock:
+            if _default_registry is None:
+                _default_registry = create_config_registry()
+    return _default_registry
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Dict, Iterable, Tuple
+
+# Characters of each upload returned as a preview
+PREVIEW_CHARS = 500
+
+
+class UnknownContentError(LookupError):
+    """Raised when a content id does not refer to stored content (or it has expired)."""
+
+
+class ContentStore:
+    """Holds uploaded source text so clients can refer to it by id instead of resending it.
+
+    Text is written as it is decoded. Without a directory each upload is kept in a
+    spooled temporary file that stays in memory up to ``spool_chars`` characters and
+    rolls over to disk beyond that. With a directory every upload is written there as
+    ``<content_id>.txt`` plus a JSON sidecar, so several worker processes can share it.
+    Content older than ``ttl`` seconds, or beyond ``max_items``, is evicted.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        ttl: Optional[float] = 3600,
+        max_items: int = 256,
+        spool_chars: int = 1024 * 1024
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_items = max_items
+        self.spool_chars = spool_chars
+        self._items: "OrderedDict[str, Tuple[Dict, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, content_id: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, content_id)
+        return base + '.txt', base + '.json'
+
+    def add(self, pieces: Iterable[str], **metadata) -> Dict:
+        """Store text arriving in pieces and return its info, including the new ``content_id``."""
+        content_id = uuid.uuid4().hex
+        if self.directory:
+            handle = tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', dir=self.directory, suffix='.part', delete=False
+            )
+        else:
+            handle = tempfile.SpooledTemporaryFile(max_size=self.spool_chars, mode='w+', encoding='utf-8')
+
+        digest = hashlib.sha256()
+        characters = 0
+        preview = []
+        try:
+            for piece in pieces:
+                handle.write(piece)
+                digest.update(piece.encode('utf-8'))
+                if characters < PREVIEW_CHARS:
+                    preview.append(piece[:PREVIEW_CHARS - characters])
+                characters += len(piece)
+        except BaseException:
+            handle.close()
+            if self.directory:
+                os.unlink(handle.name)
+            raise
+
+        info = dict(
+            metadata,
+            content_id=content_id,
+            characters=characters,
+            sha256=digest.hexdigest(),
+            preview=''.join(preview),
+            created_at=time.time()
+        )
+        if self.directory:
+            handle.close()
+            text_path, info_path = self._paths(content_id)
+            os.replace(handle.name, text_path)
+            with open(info_path, 'w') as f:
+                json.dump(info, f)
+        else:
+            with self._lock:
+                self._items[content_id] = (info, handle)
+        self.evict_expired()
+        return dict(info)
+
+    def info(self, content_id: str) -> Dict:
+        """Return the stored metadata for content_id."""
+        if self.directory:
+            _, info_path = self._paths(self._check_id(content_id))
+            try:
+                with open(info_path) as f:
+                    info = json.load(f)
+            except FileNotFoundError:
+                raise UnknownContentError(content_id)
+            if self._expired(info['created_at']):
+                raise UnknownContentError(content_id)
+            return info
+        with self._lock:
+            item = self._items.get(content_id)
+            if item is None or self._expired(item[0]['created_at']):
+                raise UnknownContentError(content_id)
+            return dict(item[0])
+
+    def read(self, content_id: str) -> str:
+        """Return the full text stored under content_id."""
+        if self.directory:
+            self.info(content_id)
+            text_path, _ = self._paths(content_id)
+            try:
+                with open(text_path, encoding='utf-8') as f:
+                    return f.read()
+            except FileNotFoundError:
+                raise UnknownContentError(content_id)
+        with self._lock:
+            item = self._items.get(content_id)
+            if item is None or self._expired(item[0]['created_at']):
+                raise UnknownContentError(content_id)
+            handle = item[1]
+            handle.seek(0)
+            return handle.read()
+
+    def delete(self, content_id: str) -> None:
+        if self.directory:
+            for path in self._paths(self._check_id(content_id)):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            return
+        with self._lock:
+            item = self._items.pop(content_id, None)
+        if item is not None:
+            item[1].close()
+
+    def evict_expired(self) -> int:
+        """Drop expired content, then the oldest while over max_items; return how many were removed."""
+        if self.directory:
+            return self._evict_directory()
+        now = time.time()
+        removed = []
+        with self._lock:
+            while self._items:
+                content_id, (info, handle) = next(iter(self._items.items()))
+                expired = self.ttl is not None and info['created_at'] <= now - self.ttl
+                if not expired and len(self._items) <= self.max_items:
+                    break
+                self._items.popitem(last=False)
+                removed.append(handle)
+        for handle in removed:
+            handle.close()
+        return len(removed)
+
+    def _evict_directory(self) -> int:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), name[:-len('.json')]))
+                except FileNotFoundError:
+                    continue
+        entries.sort()
+        now = time.time()
+        removed = 0
+        for i, (modified, content_id) in enumerate(entries):
+            expired = self.ttl is not None and modified <= now - self.ttl
+            if not expired and len(entries) - i <= self.max_items:
+                break
+            self.delete(content_id)
+            removed += 1
+        return removed
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and created_at <= time.time() - self.ttl
+
+    @staticmethod
+    def _check_id(content_id: str) -> str:
+        # Ids are uuid4 hex; anything else must not be turned into a path
+        if len(content_id) != 32 or any(c not in '0123456789abcdef' for c in content_id):
+            raise UnknownContentError(content_id)
+        return content_id
+
+
+def create_content_store() -> ContentStore:
+    """Build the content store from CONTENT_STORE_DIR, CONTENT_TTL and CONTENT_STORE_MAX."""
+    return ContentStore(
+        directory=os.getenv("CONTENT_STORE_DIR") or None,
+        ttl=float(os.getenv("CONTENT_TTL", "3600")),
+        max_items=int(os.getenv("CONTENT_STORE_MAX", "256"))
+    )
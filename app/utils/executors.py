@@ -0,0 +1,129 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Dict, Callable, Tuple, TypeVar
+
+T = TypeVar('T')
+
+EXECUTOR_KINDS = ('thread', 'process')
+
+
+def _timed_call(fn: Callable, args: Tuple, kwargs: Dict) -> Tuple[float, float, bool, object]:
+    """Run fn in the worker and report when it started and finished.
+
+    Wall-clock time is used so start times from worker processes compare with the parent's.
+    """
+    started = time.time()
+    try:
+        value, ok = fn(*args, **kwargs), True
+    except Exception as e:
+        value, ok = e, False
+    return started, time.time(), ok, value
+
+
+class InstrumentedExecutor:
+    """A lazily started thread or process pool that records queue depth and wait times.
+
+    ``wait`` is the time between submission and a worker picking the call up; ``run`` is
+    the time the call itself took. Recent waits are kept for percentile reporting.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = 'thread',
+        max_workers: Optional[int] = None,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+        window: int = 1024
+    ):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unsupported executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._initializer = initializer
+        self._initargs = initargs
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._waits: deque = deque(maxlen=window)
+        self._in_flight = 0
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0,
+                       'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0, 'run_seconds_total': 0.0}
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                pool = ProcessPoolExecutor if self.kind == 'process' else ThreadPoolExecutor
+                self._executor = pool(
+                    max_workers=self.max_workers,
+                    initializer=self._initializer,
+                    initargs=self._initargs
+                )
+            return self._executor
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> "Future[T]":
+        """Schedule fn(*args, **kwargs) and return a future for its result."""
+        executor = self._get_executor()
+        submitted = time.time()
+        outer: Future = Future()
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._in_flight += 1
+        inner = executor.submit(_timed_call, fn, args, kwargs)
+
+        def done(future: Future) -> None:
+            try:
+                started, finished, ok, value = future.result()
+            except BaseException as e:
+                # The pool itself failed (e.g. a worker process died)
+                started = finished = time.time()
+                ok, value = False, e
+            wait = max(0.0, started - submitted)
+            with self._lock:
+                self._in_flight -= 1
+                self._stats['completed' if ok else 'failed'] += 1
+                self._stats['wait_seconds_total'] += wait
+                self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], wait)
+                self._stats['run_seconds_total'] += max(0.0, finished - started)
+                self._waits.append(wait)
+            if ok:
+                outer.set_result(value)
+            else:
+                outer.set_exception(value)
+
+        inner.add_done_callback(done)
+        return outer
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Await fn(*args, **kwargs) on the pool without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict:
+        """Return call counters, current queue depth and wait time percentiles."""
+        with self._lock:
+            stats = dict(self._stats)
+            waits = sorted(self._waits)
+            in_flight = self._in_flight
+        finished = stats['completed'] + stats['failed']
+        stats.update(
+            kind=self.kind,
+            max_workers=self.max_workers,
+            in_flight=in_flight,
+            # Pools run calls in submission order, so anything beyond the worker count is queued
+            queue_depth=max(0, in_flight - self.max_workers),
+            wait_seconds_avg=stats['wait_seconds_total'] / finished if finished else 0.0,
+            wait_seconds_p50=waits[len(waits) // 2] if waits else 0.0,
+            wait_seconds_p99=waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0
+        )
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the pool if it was started; it restarts on the next submission."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
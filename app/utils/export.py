@@ -0,0 +1,463 @@
+import math
+import re
+import tempfile
+import textwrap
+import zipfile
+import zlib
+from typing import List, Dict, Tuple, Optional, NamedTuple, Iterable, Iterator, Union
+
+from jinja2 import DictLoader, Environment, StrictUndefined
+
+from .compliance import CompiledTemplate
+from .text_analysis import WORDS_PER_MINUTE, iter_sentences
+
+# Size of the pieces exports are streamed in
+CHUNK_SIZE = 64 * 1024
+# Binary exports are assembled in memory up to this size, then in a temporary file
+SPOOL_SIZE = 8 * 1024 * 1024
+
+# Blank lines (possibly holding only whitespace) separate paragraphs
+_PARAGRAPH_BREAK_RE = re.compile(r"\n[^\S\n]*\n\s*")
+# A paragraph that is a single Markdown heading line
+_MARKDOWN_HEADING_RE = re.compile(r"#{1,6}[^\S\n]+(.+?)[^\S\n#]*")
+# Characters XML 1.0 does not allow, even escaped
+_XML_INVALID_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+# Line starts Markdown would read as structure: headings, quotes, lists, rules, fences
+_MARKDOWN_BLOCK_RE = re.compile(r"^([#>+\-*=`~|]|\d+[.)])")
+
+
+class ExportFormat(NamedTuple):
+    media_type: str
+    extension: str
+    # Rendered by a Jinja2 template of this name; None for formats written in code
+    template: Optional[str] = None
+    binary: bool = False
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    'txt': ExportFormat('text/plain', 'txt'),
+    'teleprompter': ExportFormat('text/plain', 'teleprompter.txt', 'teleprompter'),
+    'html': ExportFormat('text/html', 'html', 'html'),
+    'md': ExportFormat('text/markdown', 'md', 'md'),
+    'srt': ExportFormat('application/x-subrip', 'srt', 'srt'),
+    'vtt': ExportFormat('text/vtt', 'vtt', 'vtt'),
+    'docx': ExportFormat(
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'docx', 'docx_document', True
+    ),
+    'pdf': ExportFormat('application/pdf', 'pdf', binary=True),
+}
+# Templates whose output is markup, so values are escaped
+_AUTOESCAPED = {'html', 'docx_document'}
+
+
+class Block(NamedTuple):
+    """A heading or a paragraph of a script; paragraph lines are joined by newlines."""
+    kind: str
+    text: str
+
+    @property
+    def lines(self) -> List[str]:
+        return self.text.split('\n')
+
+
+class Cue(NamedTuple):
+    """One timed caption; start and end are in seconds from the start of the script."""
+    index: int
+    start: float
+    end: float
+    lines: List[str]
+
+
+def _paragraph_blocks(text: str, start: int, end: int) -> Iterator[Block]:
+    pos = start
+    for match in _PARAGRAPH_BREAK_RE.finditer(text, start, end):
+        yield from _block(text[pos:match.start()])
+        pos = match.end()
+    yield from _block(text[pos:end])
+
+
+def _block(chunk: str) -> Iterator[Block]:
+    lines = [line.strip() for line in chunk.split('\n')]
+    lines = [line for line in lines if line]
+    if not lines:
+        return
+    heading = _MARKDOWN_HEADING_RE.fullmatch(lines[0]) if len(lines) == 1 else None
+    if heading:
+        yield Block('heading', heading.group(1))
+    else:
+        yield Block('paragraph', '\n'.join(lines))
+
+
+def iter_blocks(script: str, template: Optional[CompiledTemplate] = None) -> Iterator[Block]:
+    """Yield the script's headings and paragraphs in order, one at a time.
+
+    With a template, its section headers become headings (a header continuing after a
+    colon also starts a paragraph); otherwise a paragraph that is one Markdown heading
+    line is a heading.
+    """
+    pos = 0
+    for span in (template.segment(script) if template else []):
+        yield from _paragraph_blocks(script, pos, span.header_start)
+        yield Block('heading', span.name)
+        pos = span.start
+    yield from _paragraph_blocks(script, pos, len(script))
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    return textwrap.wrap(text, width, break_long_words=False, break_on_hyphens=False) or [text]
+
+
+def iter_cues(
+    blocks: Iterable[Block],
+    words_per_minute: float = WORDS_PER_MINUTE,
+    max_words: int = 14,
+    line_width: int = 42,
+    max_lines: int = 2,
+    min_seconds: float = 1.0
+) -> Iterator[Cue]:
+    """Split paragraphs into captions of whole sentences, timed at the reading speed.
+
+    Long sentences are cut into evenly sized captions of at most ``max_words`` words.
+    Headings are not spoken and get no caption.
+    """
+    clock = 0.0
+    index = 0
+    for block in blocks:
+        if block.kind != 'paragraph':
+            continue
+        for sentence in iter_sentences(block.text):
+            words = sentence.split()
+            parts = math.ceil(len(words) / max_words)
+            size = math.ceil(len(words) / parts)
+            for i in range(0, len(words), size):
+                piece = words[i:i + size]
+                lines = _wrap(' '.join(piece), line_width)
+                if len(lines) > max_lines:
+                    lines = lines[:max_lines - 1] + [' '.join(lines[max_lines - 1:])]
+                duration = max(min_seconds, len(piece) * 60.0 / words_per_minute)
+                index += 1
+                yield Cue(index, clock, clock + duration, lines)
+                clock += duration
+
+
+def _timestamp(seconds: float, separator: str) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def _markdown_escape(line: str) -> str:
+    """Escape a line so Markdown shows it as written rather than as structure or HTML."""
+    line = line.replace('\\', '\\\\').replace('<', '&lt;')
+    return _MARKDOWN_BLOCK_RE.sub(lambda m: m.group()[:-1] + '\\' + m.group()[-1], line)
+
+
+def _chunked(pieces: Iterable[str], size: int) -> Iterator[bytes]:
+    """Gather small rendered pieces into UTF-8 chunks of about size characters."""
+    buffer: List[str] = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+DOCX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '<Override PartName="/word/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/>'
+        '</Relationships>'
+    ),
+    'word/_rels/document.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'word/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/>'
+        '<w:pPr><w:spacing w:after="160" w:line="276" w:lineRule="auto"/></w:pPr>'
+        '<w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial"/><w:sz w:val="22"/></w:rPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>'
+        '<w:rPr><w:b/><w:sz w:val="40"/></w:rPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>'
+        '<w:pPr><w:keepNext/><w:spacing w:before="240"/></w:pPr><w:rPr><w:b/><w:sz w:val="28"/></w:rPr></w:style>'
+        '</w:styles>'
+    ),
+}
+
+# Helvetica advance widths (1/1000 em) for ASCII 32-126, from the standard AFM metrics
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+# Helvetica-Bold runs wider; scaling keeps wrapped lines inside the margins
+_BOLD_SCALE = 1.1
+
+
+def _text_width(text: str, size: float, bold: bool = False) -> float:
+    units = sum(
+        _HELVETICA_WIDTHS[ord(char) - 32] if 32 <= ord(char) <= 126 else 556
+        for char in text
+    )
+    return units * size / 1000 * (_BOLD_SCALE if bold else 1)
+
+
+def _wrap_width(text: str, width: float, size: float, bold: bool = False) -> List[str]:
+    """Greedy word wrap to a width in points; overlong words are split."""
+    lines: List[str] = []
+    line = ''
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if _text_width(candidate, size, bold) <= width:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+        line = word
+        while _text_width(line, size, bold) > width and len(line) > 1:
+            cut = len(line) - 1
+            while cut > 1 and _text_width(line[:cut], size, bold) > width:
+                cut -= 1
+            lines.append(line[:cut])
+            line = line[cut:]
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _pdf_string(text: str) -> bytes:
+    data = text.encode('cp1252', 'replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class _PdfWriter:
+    """Tracks byte offsets of the objects written so far, for the cross-reference table."""
+
+    def __init__(self):
+        self.position = 0
+        self.offsets: Dict[int, int] = {}
+
+    def raw(self, data: bytes) -> bytes:
+        self.position += len(data)
+        return data
+
+    def obj(self, number: int, body: bytes) -> bytes:
+        self.offsets[number] = self.position
+        return self.raw(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def stream(self, number: int, content: bytes) -> bytes:
+        data = zlib.compress(content)
+        return self.obj(
+            number, b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(data) + data + b'\nendstream'
+        )
+
+
+class ScriptExporter:
+    """Renders scripts for download, streamed in chunks so memory stays flat.
+
+    Templates from ``config/export.yaml`` are compiled once. Text formats are rendered
+    block by block; DOCX is zipped into a temporary file that spills to disk past
+    SPOOL_SIZE, and PDF pages are written out as soon as they are laid out.
+    """
+
+    def __init__(self, config: Optional[Dict] = None, words_per_minute: float = WORDS_PER_MINUTE):
+        config = config or {}
+        self.words_per_minute = words_per_minute
+        self.teleprompter = config.get('teleprompter', {})
+        self.captions = config.get('captions', {})
+        self.pdf = config.get('pdf', {})
+        environment = Environment(
+            loader=DictLoader(config.get('templates', {})),
+            autoescape=lambda name: name in _AUTOESCAPED,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            keep_trailing_newline=True,
+            undefined=StrictUndefined
+        )
+        environment.filters.update({
+            'md_escape': _markdown_escape,
+            'xml_safe': lambda text: _XML_INVALID_RE.sub('', text),
+            'vtt_escape': lambda text: text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;'),
+            'srt_time': lambda seconds: _timestamp(seconds, ','),
+            'vtt_time': lambda seconds: _timestamp(seconds, '.'),
+            'teleprompter_lines': self._teleprompter_lines,
+        })
+        self.templates = {
+            name: environment.get_template(name) for name in environment.loader.list_templates()
+        }
+        # Formats whose template is missing from the config are not offered
+        self.formats = [
+            name for name, spec in EXPORT_FORMATS.items()
+            if spec.template is None or spec.template in self.templates
+        ]
+
+    def _spec(self, format_type: str) -> ExportFormat:
+        if format_type not in self.formats:
+            raise ValueError(f"Unsupported format type: {format_type}")
+        return EXPORT_FORMATS[format_type]
+
+    def media_type(self, format_type: str) -> str:
+        return self._spec(format_type).media_type
+
+    def filename(self, format_type: str) -> str:
+        return f"script.{self._spec(format_type).extension}"
+
+    def stream(
+        self,
+        script: str,
+        format_type: str,
+        template: Optional[CompiledTemplate] = None,
+        title: Optional[str] = None
+    ) -> Iterator[bytes]:
+        """Return an iterator over the export's bytes; unknown formats raise ValueError here."""
+        spec = self._spec(format_type)
+        title = title or "Script"
+        if format_type == 'txt':
+            return (script[i:i + CHUNK_SIZE].encode('utf-8') for i in range(0, len(script), CHUNK_SIZE))
+        blocks = iter_blocks(script, template)
+        if format_type == 'pdf':
+            return self._pdf(blocks, title)
+        context = {'title': title, 'blocks': blocks}
+        if format_type in ('srt', 'vtt'):
+            context['cues'] = iter_cues(blocks, self.words_per_minute, **self.captions)
+        pieces = self.templates[spec.template].generate(**context)
+        if format_type == 'docx':
+            return self._docx(pieces)
+        return _chunked(pieces, CHUNK_SIZE)
+
+    def render(
+        self,
+        script: str,
+        format_type: str,
+        template: Optional[CompiledTemplate] = None,
+        title: Optional[str] = None
+    ) -> Tuple[Union[str, bytes], str]:
+        """Render the whole export at once; returns (content, media_type), text formats as str."""
+        spec = self._spec(format_type)
+        content = b''.join(self.stream(script, format_type, template, title))
+        return (content if spec.binary else content.decode('utf-8')), spec.media_type
+
+    def _teleprompter_lines(self, text: str) -> Iterator[str]:
+        """One sentence per group of short lines."""
+        width = self.teleprompter.get('line_width', 32)
+        for sentence in iter_sentences(text):
+            yield from _wrap(sentence, width)
+
+    def _docx(self, document: Iterable[str]) -> Iterator[bytes]:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            with zipfile.ZipFile(spool, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for name, content in DOCX_PARTS.items():
+                    archive.writestr(name, content)
+                with archive.open('word/document.xml', 'w', force_zip64=True) as part:
+                    for chunk in _chunked(document, CHUNK_SIZE):
+                        part.write(chunk)
+            spool.seek(0)
+            while True:
+                chunk = spool.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def _pdf_lines(self, blocks: Iterable[Block], title: str) -> Iterator[Tuple[bool, float, str, float]]:
+        """Lay out (bold, font size, text, space before) lines within the page width."""
+        settings = self.pdf
+        margin = settings.get('margin', 72)
+        width = settings.get('page_width', 612) - 2 * margin
+        size = settings.get('font_size', 11)
+        heading_size = settings.get('heading_size', 14)
+        title_size = settings.get('title_size', 18)
+        for line in _wrap_width(title, width, title_size, bold=True):
+            yield True, title_size, line, 0
+        for block in blocks:
+            if block.kind == 'heading':
+                for i, line in enumerate(_wrap_width(block.text, width, heading_size, bold=True)):
+                    yield True, heading_size, line, heading_size if i == 0 else 0
+                continue
+            first = True
+            for source_line in block.lines:
+                for line in _wrap_width(source_line, width, size):
+                    yield False, size, line, size * 0.6 if first else 0
+                    first = False
+
+    def _pdf_pages(self, blocks: Iterable[Block], title: str) -> Iterator[bytes]:
+        """Yield the content stream of each page as soon as it is full."""
+        settings = self.pdf
+        margin = settings.get('margin', 72)
+        top = settings.get('page_height', 792) - margin
+        leading = settings.get('leading', 1.4)
+        ops: List[bytes] = []
+        y = top
+        for bold, size, text, space in self._pdf_lines(blocks, title):
+            advance = size * leading
+            if ops and y - space - advance < margin:
+                yield b'\n'.join(ops)
+                ops = []
+                y = top
+            if not ops:
+                space = 0
+            y -= space + advance
+            ops.append(b'BT /%s %.1f Tf %.2f %.2f Td %s Tj ET' % (
+                b'F2' if bold else b'F1', size, margin, y, _pdf_string(text)
+            ))
+        yield b'\n'.join(ops)
+
+    def _pdf(self, blocks: Iterable[Block], title: str) -> Iterator[bytes]:
+        """Write a PDF 1.4 file with the standard Helvetica fonts, one page at a time.
+
+        Objects 1 and 2 (catalog and page tree) are written last, once every page is known.
+        """
+        writer = _PdfWriter()
+        page_size = b'[0 0 %d %d]' % (self.pdf.get('page_width', 612), self.pdf.get('page_height', 792))
+        yield writer.raw(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        yield writer.obj(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        yield writer.obj(4, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+        number = 5
+        pages = []
+        for content in self._pdf_pages(blocks, title):
+            yield writer.stream(number, content)
+            yield writer.obj(number + 1, (
+                b'<< /Type /Page /Parent 2 0 R /MediaBox %s '
+                b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+            ) % (page_size, number))
+            pages.append(number + 1)
+            number += 2
+        kids = b' '.join(b'%d 0 R' % page for page in pages)
+        yield writer.obj(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(pages)))
+        yield writer.obj(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        info = number
+        yield writer.obj(info, b'<< /Title %s /Producer (script-generator) >>' % _pdf_string(title))
+
+        xref = writer.position
+        entries = [b'0000000000 65535 f \n'] + [b'%010d 00000 n \n' % writer.offsets[i] for i in range(1, info + 1)]
+        yield b'xref\n0 %d\n' % (info + 1) + b''.join(entries)
+        yield b'trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (info + 1, info, xref)
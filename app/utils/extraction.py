@@ -0,0 +1,212 @@
+import codecs
+import os
+import zipfile
+from html.parser import HTMLParser
+from typing import BinaryIO, Dict, Iterator, List, Optional
+from xml.etree.ElementTree import iterparse
+
+# Uploads are read and decoded this many bytes at a time
+BLOCK_SIZE = 64 * 1024
+# Bytes inspected when guessing the encoding of a non-UTF-8 upload
+SNIFF_BYTES = 64 * 1024
+
+TEXT_EXTENSIONS = ('.txt', '.text', '.md', '.markdown', '.rst', '.csv')
+HTML_EXTENSIONS = ('.html', '.htm')
+DOCX_EXTENSIONS = ('.docx',)
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"File exceeds the {limit} byte upload limit")
+        self.limit = limit
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised for uploads whose format has no text extractor."""
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    """Classify an upload as 'text', 'html' or 'docx' from its extension or content type."""
+    extension = os.path.splitext(filename or '')[1].lower()
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if extension in DOCX_EXTENSIONS or content_type.endswith('wordprocessingml.document'):
+        return 'docx'
+    if extension in HTML_EXTENSIONS or content_type == 'text/html':
+        return 'html'
+    if extension in TEXT_EXTENSIONS or not extension or content_type.startswith('text/'):
+        return 'text'
+    raise UnsupportedFormatError(f"Unsupported file type: {extension or content_type}")
+
+
+def detect_encoding(fileobj: BinaryIO) -> str:
+    """Return the encoding announced by a byte order mark, defaulting to UTF-8."""
+    head = fileobj.read(4)
+    fileobj.seek(0)
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    return 'utf-8'
+
+
+def guess_encoding(fileobj: BinaryIO) -> str:
+    """Guess the encoding of an upload that is not valid UTF-8.
+
+    Uses charset_normalizer when it is installed, otherwise assumes Windows-1252.
+    """
+    sample = fileobj.read(SNIFF_BYTES)
+    fileobj.seek(0)
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return 'cp1252'
+    match = from_bytes(sample).best()
+    return match.encoding if match is not None else 'cp1252'
+
+
+def iter_decoded(
+    fileobj: BinaryIO,
+    encoding: str = 'utf-8',
+    errors: str = 'strict',
+    max_bytes: Optional[int] = None,
+    block_size: int = BLOCK_SIZE
+) -> Iterator[str]:
+    """Decode a binary file block by block; multi-byte characters may straddle blocks."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors)
+    total = 0
+    while True:
+        block = fileobj.read(block_size)
+        if not block:
+            break
+        total += len(block)
+        if max_bytes is not None and total > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+class _HTMLText(HTMLParser):
+    """Collects visible text, turning block-level elements into paragraph breaks."""
+
+    BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'section', 'article', 'blockquote',
+                  'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+    SKIP_TAGS = {'script', 'style', 'head', 'title'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skipping += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n' if tag == 'br' else '\n\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n\n')
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+    def drain(self) -> str:
+        text, self.parts = ''.join(self.parts), []
+        return text
+
+
+def iter_html_text(pieces: Iterator[str]) -> Iterator[str]:
+    """Strip markup from decoded HTML pieces as they arrive."""
+    parser = _HTMLText()
+    for piece in pieces:
+        parser.feed(piece)
+        text = parser.drain()
+        if text:
+            yield text
+    parser.close()
+    text = parser.drain()
+    if text:
+        yield text
+
+
+def iter_docx_text(fileobj: BinaryIO, max_bytes: Optional[int] = None) -> Iterator[str]:
+    """Yield the paragraphs of a .docx file, parsing its document XML incrementally."""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise UnsupportedFormatError("Not a valid .docx file")
+    with archive:
+        try:
+            info = archive.getinfo('word/document.xml')
+        except KeyError:
+            raise UnsupportedFormatError("Not a valid .docx file")
+        # Guard against compressed archives that expand far beyond the upload limit
+        if max_bytes is not None and info.file_size > max_bytes * 4:
+            raise UploadTooLargeError(max_bytes)
+        with archive.open(info) as document:
+            parts: List[str] = []
+            for _, element in iterparse(document, events=('end',)):
+                tag = element.tag
+                if tag == f'{_WORD_NS}t':
+                    parts.append(element.text or '')
+                elif tag == f'{_WORD_NS}tab':
+                    parts.append('\t')
+                elif tag in (f'{_WORD_NS}br', f'{_WORD_NS}cr'):
+                    parts.append('\n')
+                elif tag == f'{_WORD_NS}p':
+                    yield ''.join(parts) + '\n\n'
+                    parts = []
+                    element.clear()
+
+
+def extract_upload(
+    fileobj: BinaryIO,
+    filename: Optional[str],
+    content_type: Optional[str],
+    store,
+    max_bytes: Optional[int] = None
+) -> Dict:
+    """Stream an uploaded file's text into a ContentStore and return the stored content's info.
+
+    Text is decoded as UTF-8 (or per its byte order mark); if that fails part-way
+    through, the partial copy is discarded and the file is re-read with a guessed encoding.
+    """
+    if max_bytes is not None:
+        fileobj.seek(0, os.SEEK_END)
+        if fileobj.tell() > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+        fileobj.seek(0)
+
+    file_format = detect_format(filename, content_type)
+    if file_format == 'docx':
+        return store.add(iter_docx_text(fileobj, max_bytes), filename=filename, format=file_format, encoding='utf-8')
+
+    def pieces(encoding: str, errors: str) -> Iterator[str]:
+        decoded = iter_decoded(fileobj, encoding, errors, max_bytes)
+        return iter_html_text(decoded) if file_format == 'html' else decoded
+
+    encoding = detect_encoding(fileobj)
+    try:
+        return store.add(pieces(encoding, 'strict'), filename=filename, format=file_format, encoding=encoding)
+    except UnicodeDecodeError:
+        fileobj.seek(0)
+        encoding = guess_encoding(fileobj)
+        return store.add(pieces(encoding, 'replace'), filename=filename, format=file_format, encoding=encoding)
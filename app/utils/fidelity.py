@@ -0,0 +1,225 @@
+import re
+import zlib
+from functools import lru_cache
+from typing import List, Dict, Tuple, Optional, Sequence, Set, NamedTuple
+
+from .coherence import STOPWORDS, scan_paragraph
+from .text_analysis import paragraph_spans
+
+# Words and numbers; "1,500", "3.5" and "don't" stay whole
+_TOKEN_RE = re.compile(r"\w+(?:[.,'’]\w+)*")
+_MASK = (1 << 64) - 1
+# Multiplicative mixing so the top bits of a shingle hash are uniform
+_GOLDEN = 0x9E3779B97F4A7C15
+
+DEFAULTS = {
+    'shingle_size': 2,      # content words per shingle
+    'num_perm': 64,         # MinHash bins; a power of two
+    'bands': 32,            # LSH bands; num_perm / bands rows each
+    'window_words': 80,     # content words per indexed source window, windows overlap by half
+    'min_score': 0.2,       # lowest containment reported as a match
+    'max_matches': 3,
+}
+
+
+@lru_cache(maxsize=65536)
+def _word_id(word: str) -> int:
+    # crc32 rather than hash(): str hashes change between processes
+    return zlib.crc32(word.encode('utf-8'))
+
+
+def content_tokens(text: str) -> List[Tuple[int, int, int]]:
+    """(word id, start, end) of every word or number in text that is not a stopword."""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        word = match.group()
+        if word in STOPWORDS or (len(word) == 1 and not word.isdigit()):
+            continue
+        tokens.append((_word_id(word), match.start(), match.end()))
+    return tokens
+
+
+def shingles(ids: Sequence[int], size: int) -> Set[int]:
+    """Hashes of every run of ``size`` consecutive word ids; int tuples hash the same in every process."""
+    if len(ids) < size:
+        return set()
+    return {hash(gram) & _MASK for gram in zip(*(ids[i:] for i in range(size)))}
+
+
+def signature(hashes: Set[int], num_perm: int) -> Optional[Tuple[int, ...]]:
+    """One-permutation MinHash: the minimum hash in each of num_perm bins of the hash space.
+
+    Empty bins borrow the next filled bin's minimum, tagged with the distance, so small
+    sets still give comparable signatures. None for an empty set.
+    """
+    if not hashes:
+        return None
+    bits = num_perm.bit_length() - 1
+    shift = 64 - bits
+    low = (1 << shift) - 1
+    empty = 1 << 64
+    bins = [empty] * num_perm
+    for h in hashes:
+        h = (h * _GOLDEN) & _MASK
+        b = h >> shift
+        value = h & low
+        if value < bins[b]:
+            bins[b] = value
+    if empty in bins:
+        filled = [i for i, value in enumerate(bins) if value != empty]
+        dense = list(bins)
+        for i, value in enumerate(bins):
+            if value == empty:
+                # Nearest filled bin to the right, wrapping around
+                j = next((k for k in filled if k > i), filled[0])
+                distance = (j - i) % num_perm
+                dense[i] = bins[j] + (distance << shift)
+        bins = dense
+    return tuple(bins)
+
+
+class SourceWindow(NamedTuple):
+    """An indexed stretch of one source chunk; offsets are into that chunk."""
+    chunk: int
+    start: int
+    end: int
+    shingles: int
+    signature: Tuple[int, ...]
+
+
+class FidelityIndex:
+    """MinHash/LSH index of source chunks for mapping script paragraphs back to them.
+
+    Each chunk is cut into overlapping windows of ``window_words`` content words whose
+    shingle sets are MinHashed and banded into LSH buckets. A query hashes one
+    paragraph, looks up its bands and scores only the windows it collides with, so its
+    cost depends on the paragraph and not on the length of the source. Scores are
+    estimated containment of the paragraph's shingles in a window. Novelty is the share
+    of a paragraph's shingles found nowhere in the source, checked against a set of
+    every source shingle.
+    """
+
+    def __init__(self, chunks: Sequence[str], config: Optional[Dict] = None):
+        config = {**DEFAULTS, **(config or {})}
+        self.shingle_size = config['shingle_size']
+        self.num_perm = config['num_perm']
+        self.bands = config['bands']
+        self.rows = self.num_perm // self.bands
+        self.window_words = config['window_words']
+        self.min_score = config['min_score']
+        self.max_matches = config['max_matches']
+        self.chunk_count = len(chunks)
+
+        self.windows: List[SourceWindow] = []
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(self.bands)]
+        self._shingles: Set[int] = set()
+        self._vocabulary: Set[str] = set()
+        for index, chunk in enumerate(chunks):
+            self._add_chunk(index, chunk)
+
+    def _add_chunk(self, index: int, chunk: str) -> None:
+        self._vocabulary.update(_TOKEN_RE.findall(chunk.lower()))
+        tokens = content_tokens(chunk)
+        ids = [token[0] for token in tokens]
+        self._shingles.update(shingles(ids, self.shingle_size))
+        step = max(1, self.window_words // 2)
+        for first in range(0, max(1, len(tokens) - step), step):
+            window = ids[first:first + self.window_words]
+            hashes = shingles(window, self.shingle_size)
+            minhash = signature(hashes, self.num_perm)
+            if minhash is None:
+                continue
+            last = tokens[min(first + self.window_words, len(tokens)) - 1]
+            self._add_window(SourceWindow(index, tokens[first][1], last[2], len(hashes), minhash))
+
+    def _add_window(self, window: SourceWindow) -> None:
+        position = len(self.windows)
+        self.windows.append(window)
+        rows = self.rows
+        for band, buckets in enumerate(self._buckets):
+            buckets.setdefault(window.signature[band * rows:(band + 1) * rows], []).append(position)
+
+    def _candidates(self, minhash: Tuple[int, ...]) -> Set[int]:
+        rows = self.rows
+        found: Set[int] = set()
+        for band, buckets in enumerate(self._buckets):
+            found.update(buckets.get(minhash[band * rows:(band + 1) * rows], ()))
+        return found
+
+    def _containment(self, minhash: Tuple[int, ...], size: int, window: SourceWindow) -> float:
+        """Estimated share of a query's shingles inside a window, from their Jaccard estimate."""
+        jaccard = sum(a == b for a, b in zip(minhash, window.signature)) / self.num_perm
+        return min(1.0, jaccard * (size + window.shingles) / ((1 + jaccard) * size))
+
+    def query(self, text: str) -> Optional[Dict]:
+        """Best-matching chunks, novelty and unsupported names and numbers of one paragraph.
+
+        None when the paragraph has too few content words to shingle.
+        """
+        ids = [token[0] for token in content_tokens(text)]
+        hashes = shingles(ids, self.shingle_size)
+        minhash = signature(hashes, self.num_perm)
+        if minhash is None:
+            return None
+
+        best: Dict[int, Tuple[float, SourceWindow]] = {}
+        for position in self._candidates(minhash):
+            window = self.windows[position]
+            score = self._containment(minhash, len(hashes), window)
+            if score >= self.min_score and score > best.get(window.chunk, (0.0, None))[0]:
+                best[window.chunk] = (score, window)
+        ranked = sorted(best.values(), key=lambda match: (-match[0], match[1].chunk))[:self.max_matches]
+
+        return {
+            'matches': [
+                {'chunk': window.chunk, 'start': window.start, 'end': window.end, 'score': round(score, 3)}
+                for score, window in ranked
+            ],
+            'shingles': len(hashes),
+            'novelty': round(sum(1 for h in hashes if h not in self._shingles) / len(hashes), 3),
+            'unsupported_terms': self._unsupported(text)
+        }
+
+    def _unsupported(self, text: str) -> List[str]:
+        """Names and numbers in text that never appear in the source."""
+        vocabulary = self._vocabulary
+        terms = [
+            name for name, _, _, ambiguous in scan_paragraph(text).names
+            if not ambiguous and any(part.lower() not in vocabulary for part in name.split())
+        ]
+        terms.extend(
+            number for number in _TOKEN_RE.findall(text)
+            if any(char.isdigit() for char in number) and number.lower() not in vocabulary
+        )
+        return list(dict.fromkeys(terms))
+
+    def check(self, script: str) -> Dict:
+        """Map every script paragraph to source chunks; totals cover the source and the script."""
+        paragraphs = []
+        covered: Set[int] = set()
+        novel = shingled = 0
+        for number, (start, end) in enumerate(paragraph_spans(script)):
+            result = self.query(script[start:end])
+            if result is None:
+                continue
+            paragraphs.append(dict(paragraph=number, start=start, end=end, **result))
+            covered.update(match['chunk'] for match in result['matches'])
+            # Weighted by paragraph size
+            novel += result['novelty'] * result['shingles']
+            shingled += result['shingles']
+
+        return {
+            'chunks': self.chunk_count,
+            'coverage': round(len(covered) / self.chunk_count, 3) if self.chunk_count else 0,
+            'uncovered_chunks': [index for index in range(self.chunk_count) if index not in covered],
+            'novelty': round(novel / shingled, 3) if shingled else 0,
+            'paragraphs': paragraphs
+        }
+
+    def stats(self) -> Dict:
+        return {
+            'chunks': self.chunk_count,
+            'windows': len(self.windows),
+            'shingles': len(self._shingles),
+            'buckets': sum(len(buckets) for buckets in self._buckets)
+        }
@@ -0,0 +1,152 @@
+import asyncio
+from typing import Optional, Dict, List, Tuple, NamedTuple
+
+from .text_analysis import apply_edits
+from .text_processor import UnknownDocumentError
+
+# Characters of surrounding script sent with a section for continuity
+CONTEXT_CHARS = 300
+
+
+class SectionEdit(NamedTuple):
+    """A replacement of script[start:end] produced for one section."""
+    section: str
+    start: int
+    end: int
+    text: str
+
+
+def failing_sections(validation: Dict) -> List[str]:
+    """Names of template sections that are missing or outside their word range."""
+    return [
+        name for name, details in validation.get('template_compliance', {}).items()
+        if not details['length_in_range']
+    ]
+
+
+def _strip_heading(text: str, section: str) -> str:
+    """Drop a leading heading line that only repeats the section name."""
+    text = text.strip()
+    first, _, rest = text.partition('\n')
+    if first.strip().strip('#*_: \t').lower() == section.lower():
+        return rest.strip()
+    return text
+
+
+class SectionImprover:
+    """Brings out-of-range template sections into range by rewriting only those sections.
+
+    Each round sends every failing section to the model concurrently with a little
+    surrounding context, splices the results back, and re-validates incrementally so
+    only the changed paragraphs are re-analyzed. Rounds stop when every section is in
+    range or after ``max_retries`` rounds.
+    """
+
+    def __init__(self, ai_handler, text_processor, max_retries: int = 3):
+        self.ai_handler = ai_handler
+        self.text_processor = text_processor
+        self.max_retries = max_retries
+
+    async def improve(
+        self,
+        script: str,
+        validation: Dict,
+        template_name: str,
+        highlighted_concept: Optional[str] = None,
+        document_id: Optional[str] = None
+    ) -> Tuple[str, Dict, List[Dict]]:
+        """Return the improved script, its validation and a summary of each round.
+
+        Pass the document_id under which ``script`` was last validated incrementally so
+        the first re-validation is incremental too.
+        """
+        template = self.text_processor.compiled_templates[template_name]
+        order = [name for name, _ in template.sections]
+        rounds = []
+
+        for attempt in range(self.max_retries):
+            failing = failing_sections(validation)
+            if not failing:
+                break
+            compliance = validation['template_compliance']
+            semaphore = asyncio.Semaphore(self.ai_handler.max_concurrency)
+
+            async def fix(name: str) -> SectionEdit:
+                async with semaphore:
+                    return await self._rewrite(script, name, compliance, order, highlighted_concept)
+
+            edits = list(await asyncio.gather(*(fix(name) for name in failing)))
+            ranges = [(edit.start, edit.end, edit.text) for edit in edits]
+            updated = apply_edits(script, ranges)
+
+            try:
+                document_id, validation, reanalyzed = await self.text_processor.validate_incremental_async(
+                    document_id=document_id,
+                    script=None if document_id else updated,
+                    edits=ranges if document_id else None,
+                    template_name=template_name,
+                    coherence=True,
+                    pacing=True
+                )
+            except UnknownDocumentError:
+                document_id, validation, reanalyzed = await self.text_processor.validate_incremental_async(
+                    script=updated, template_name=template_name, coherence=True, pacing=True
+                )
+
+            script = updated
+            rounds.append({
+                'round': attempt + 1,
+                'sections': failing,
+                'replaced_chars': sum(edit.end - edit.start for edit in edits),
+                'written_chars': sum(len(edit.text) for edit in edits),
+                'reanalyzed_paragraphs': reanalyzed
+            })
+
+        return script, validation, rounds
+
+    async def _rewrite(
+        self,
+        script: str,
+        name: str,
+        compliance: Dict,
+        order: List[str],
+        highlighted_concept: Optional[str]
+    ) -> SectionEdit:
+        details = compliance[name]
+        low, high = details['expected_range']
+
+        if details['present']:
+            # Rewrite the first occurrence; any others keep their share of the range
+            start, end = details['offsets'][0]
+            body = script[start:end]
+            others = details['actual_length'] - len(body.split())
+            low, high = max(1, low - others), max(1, high - others)
+            text = await self.ai_handler.improve_section(
+                name, body, (low, high), len(body.split()),
+                before=script[max(0, start - CONTEXT_CHARS):start],
+                after=script[end:end + CONTEXT_CHARS],
+                highlighted_concept=highlighted_concept
+            )
+            leading = body[:len(body) - len(body.lstrip())]
+            trailing = body[len(body.rstrip()):] if body.strip() else ''
+            return SectionEdit(name, start, end, leading + _strip_heading(text, name) + trailing)
+
+        position = self._insertion_point(name, compliance, order)
+        text = await self.ai_handler.improve_section(
+            name, "", (low, high), 0,
+            before=script[max(0, position - CONTEXT_CHARS):position],
+            after=script[position:position + CONTEXT_CHARS],
+            highlighted_concept=highlighted_concept
+        )
+        before = script[:position]
+        separator = '' if not before or before.endswith('\n\n') else ('\n' if before.endswith('\n') else '\n\n')
+        return SectionEdit(name, position, position, f"{separator}{name}\n{_strip_heading(text, name)}\n\n")
+
+    @staticmethod
+    def _insertion_point(name: str, compliance: Dict, order: List[str]) -> int:
+        """Where a missing section goes: after the nearest earlier section that is present."""
+        for previous in reversed(order[:order.index(name)]):
+            offsets = compliance.get(previous, {}).get('offsets')
+            if offsets:
+                return offsets[-1][1]
+        return 0
@@ -0,0 +1,339 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional, Dict, List
+
+JOB_STATUSES = ('queued', 'processing', 'completed', 'failed')
+FINISHED_STATUSES = ('completed', 'failed')
+
+_COLUMNS = (
+    "job_id, status, payload, result, error, attempts, max_attempts, worker_id, "
+    "lease_expires_at, available_at, created_at, updated_at, dedup_key, leader_id"
+)
+_UNFINISHED = "status IN ('queued', 'processing')"
+
+
+class JobQueue:
+    """Durable generation job queue in a SQLite file, shared by API and worker processes.
+
+    Workers claim the oldest available job with a lease of ``lease_seconds`` and must
+    extend it with ``heartbeat`` while they work. A job whose lease runs out (its
+    worker crashed or stalled) is claimed again by the next worker. Failed attempts
+    are retried after an exponential backoff from ``retry_delay`` until a job has
+    been attempted ``max_attempts`` times. Completing, failing or heartbeating a job
+    requires still holding its lease, so a worker that lost one cannot overwrite the
+    attempt that replaced it. Finished jobs older than ``ttl`` seconds are evicted
+    whenever a job is enqueued.
+
+    Jobs enqueued with the ``dedup_key`` of an unfinished job become its followers:
+    they are never claimed, report the leader's progress, and receive its outcome.
+
+    Put the file on storage every API and worker node can reach to scale across nodes;
+    SQLite needs working file locks there (a local disk or a filesystem with POSIX locking).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 60.0,
+        max_attempts: int = 3,
+        retry_delay: float = 5.0,
+        ttl: Optional[float] = 3600
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                worker_id TEXT,
+                lease_expires_at REAL,
+                available_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                dedup_key TEXT,
+                leader_id TEXT
+            )"""
+        )
+        # Queues created before request coalescing lack the last two columns
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column in ('dedup_key', 'leader_id'):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_available ON jobs (status, available_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_lease ON jobs (status, lease_expires_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs (dedup_key, status)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_leader ON jobs (leader_id)")
+
+    def _transaction(self, fn):
+        """Run fn inside an immediate (write-locked) transaction."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+                self._db.execute("COMMIT")
+                return result
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _row_to_job(row) -> Dict:
+        job = dict(zip([column.strip() for column in _COLUMNS.split(',')], row))
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def enqueue(self, payload: Dict, max_attempts: Optional[int] = None, dedup_key: Optional[str] = None) -> str:
+        """Add a job and return its id, which doubles as the task id.
+
+        With a dedup_key matching an unfinished job, the new job follows that one
+        instead of being run itself.
+        """
+        job_id = uuid.uuid4().hex
+
+        def insert() -> None:
+            now = time.time()
+            leader = None
+            if dedup_key is not None:
+                row = self._db.execute(
+                    f"SELECT job_id FROM jobs WHERE dedup_key = ? AND {_UNFINISHED} AND leader_id IS NULL "
+                    "ORDER BY created_at LIMIT 1",
+                    (dedup_key,)
+                ).fetchone()
+                leader = row[0] if row else None
+            self._db.execute(
+                "INSERT INTO jobs (job_id, status, payload, attempts, max_attempts, available_at, created_at, "
+                "updated_at, dedup_key, leader_id) VALUES (?, 'queued', ?, 0, ?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(payload if leader is None else {}), max_attempts or self.max_attempts,
+                 now, now, now, dedup_key, leader)
+            )
+
+        self._transaction(insert)
+        self.evict_expired()
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Lease the oldest available job to worker_id, or return None if there is none.
+
+        Jobs whose lease expired count as available; one that has used up its attempts
+        is marked failed instead of being handed out again.
+        """
+        def claim_one() -> Optional[Dict]:
+            while True:
+                now = time.time()
+                row = self._db.execute(
+                    f"SELECT {_COLUMNS} FROM jobs "
+                    "WHERE leader_id IS NULL AND ((status = 'queued' AND available_at <= ?) "
+                    "OR (status = 'processing' AND lease_expires_at <= ?)) "
+                    "ORDER BY available_at LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                job = self._row_to_job(row)
+                if job['attempts'] >= job['max_attempts']:
+                    error = job['error'] or f"Worker lease expired after {job['attempts']} attempts"
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, worker_id = NULL, "
+                        "lease_expires_at = NULL, updated_at = ? WHERE job_id = ?",
+                        (error, now, job['job_id'])
+                    )
+                    self._settle_followers(job['job_id'], 'failed', job['result'], error, now)
+                    continue
+                self._db.execute(
+                    "UPDATE jobs SET status = 'processing', attempts = attempts + 1, worker_id = ?, "
+                    "lease_expires_at = ?, updated_at = ? WHERE job_id = ?",
+                    (worker_id, now + self.lease_seconds, now, job['job_id'])
+                )
+                job.update(status='processing', attempts=job['attempts'] + 1, worker_id=worker_id,
+                           lease_expires_at=now + self.lease_seconds)
+                return job
+
+        return self._transaction(claim_one)
+
+    def _settle_followers(self, job_id: str, status: str, result: Optional[Dict], error: Optional[str], now: float) -> None:
+        """Give a finished job's outcome to the jobs that follow it."""
+        self._db.execute(
+            f"UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE leader_id = ? AND {_UNFINISHED}",
+            (status, json.dumps(result) if result else None, error, now, job_id)
+        )
+
+    def _owned_update(self, job_id: str, worker_id: str, assignments: str, params: tuple) -> bool:
+        """Apply an update only while worker_id still holds the job's lease."""
+        with self._lock:
+            cursor = self._db.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? "
+                "WHERE job_id = ? AND worker_id = ? AND status = 'processing'",
+                (*params, time.time(), job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extend the lease; False means the worker lost the job and should stop working on it."""
+        return self._owned_update(
+            job_id, worker_id, "lease_expires_at = ?", (time.time() + self.lease_seconds,)
+        )
+
+    def complete(self, job_id: str, worker_id: str, result: Dict) -> bool:
+        """Store the job's result and mark it and its followers completed."""
+        def finish() -> bool:
+            now = time.time()
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'completed', result = ?, error = NULL, worker_id = NULL, "
+                "lease_expires_at = NULL, updated_at = ? WHERE job_id = ? AND worker_id = ? AND status = 'processing'",
+                (json.dumps(result), now, job_id, worker_id)
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._settle_followers(job_id, 'completed', result, None, now)
+            return True
+
+        return self._transaction(finish)
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = True, result: Optional[Dict] = None) -> Optional[str]:
+        """Record a failed attempt; return the job's new status ('queued' or 'failed').
+
+        The job is queued again after a backoff while it has attempts left and
+        ``retry`` is set. Returns None if the worker no longer held the job.
+        """
+        def fail_attempt() -> Optional[str]:
+            row = self._db.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE job_id = ? AND worker_id = ? AND status = 'processing'",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return None
+            attempts, max_attempts = row
+            now = time.time()
+            status = 'queued' if retry and attempts < max_attempts else 'failed'
+            delay = self.retry_delay * 2 ** (attempts - 1)
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, worker_id = NULL, lease_expires_at = NULL, "
+                "available_at = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, json.dumps(result) if result else None, now + delay, now, job_id)
+            )
+            if status == 'failed':
+                self._settle_followers(job_id, status, result, error, now)
+            return status
+
+        return self._transaction(fail_attempt)
+
+    def release(self, job_id: str, worker_id: str) -> bool:
+        """Hand a job back without counting the attempt, e.g. when a worker shuts down."""
+        return self._owned_update(
+            job_id, worker_id,
+            "status = 'queued', attempts = attempts - 1, worker_id = NULL, lease_expires_at = NULL, available_at = 0",
+            ()
+        )
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the job as a task: status, attempts and error plus its result fields.
+
+        An unfinished follower reports its leader's progress under its own id.
+        """
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+        source = job
+        if job['leader_id'] is not None and job['status'] not in FINISHED_STATUSES:
+            source = self.get_job(job['leader_id']) or job
+        task = dict(source['result'] or {})
+        task.update(
+            task_id=job['job_id'],
+            status=source['status'],
+            attempts=source['attempts'],
+            error=source['error'],
+            created_at=job['created_at'],
+            updated_at=source['updated_at']
+        )
+        if job['leader_id'] is not None:
+            task['coalesced_with'] = job['leader_id']
+        return task
+
+    def list_by_status(self, status: str, limit: int = 100) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE status = ? ORDER BY updated_at LIMIT ?", (status, limit)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def stats(self) -> Dict:
+        """Jobs per status, how many queued jobs are ready to run and the oldest one's age.
+
+        ``following`` counts unfinished jobs waiting on an identical one; they are
+        excluded from the status counts.
+        """
+        now = time.time()
+        with self._lock:
+            counts = dict(self._db.execute(
+                f"SELECT status, COUNT(*) FROM jobs WHERE leader_id IS NULL OR NOT {_UNFINISHED} GROUP BY status"
+            ).fetchall())
+            (following,) = self._db.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE leader_id IS NOT NULL AND {_UNFINISHED}"
+            ).fetchone()
+            ready, oldest = self._db.execute(
+                "SELECT COUNT(*), MIN(available_at) FROM jobs "
+                "WHERE status = 'queued' AND leader_id IS NULL AND available_at <= ?", (now,)
+            ).fetchone()
+            (expired,) = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'processing' AND lease_expires_at <= ?", (now,)
+            ).fetchone()
+        stats = {status: counts.get(status, 0) for status in JOB_STATUSES}
+        stats.update(
+            following=following,
+            ready=ready,
+            expired_leases=expired,
+            oldest_ready_seconds=max(0.0, now - oldest) if oldest is not None else 0.0
+        )
+        return stats
+
+    def evict_expired(self) -> int:
+        """Drop finished jobs past their TTL and return how many were removed."""
+        if self.ttl is None:
+            return 0
+        cutoff = time.time() - self.ttl
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._lock:
+            cursor = self._db.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at <= ?",
+                (*FINISHED_STATUSES, cutoff)
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def create_job_queue() -> Optional[JobQueue]:
+    """Build the queue at JOB_QUEUE_PATH, or return None to run jobs in the API process."""
+    path = os.getenv("JOB_QUEUE_PATH")
+    if not path:
+        return None
+    return JobQueue(
+        path,
+        lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+        retry_delay=float(os.getenv("JOB_RETRY_DELAY", "5")),
+        ttl=float(os.getenv("TASK_TTL", "3600"))
+    )
@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import math
+import os
+import random
+import re
+from abc import ABC, abstractmethod
+from typing import Optional, Dict, List, Tuple, AsyncIterator, NamedTuple, Callable, Awaitable
+
+from .scheduler import RateLimitError
+from .tokenizer import count_tokens
+
+
+class Completion(NamedTuple):
+    """A finished chat completion; usage is (prompt, completion, cached prompt) tokens if reported."""
+    text: str
+    usage: Optional[Tuple[int, int, int]] = None
+
+
+class LLMBackend(ABC):
+    """Interface for chat completion providers.
+
+    ``open_stream`` returns once the provider has accepted the request, so the
+    scheduler can retry failures to open a stream like any other call.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    async def complete(self, model: str, messages: List[Dict], **params) -> Completion:
+        """Run a chat completion and return its text and usage."""
+
+    @abstractmethod
+    async def open_stream(self, model: str, messages: List[Dict], **params) -> AsyncIterator[str]:
+        """Start a streaming completion and return an iterator over its content deltas."""
+
+    async def aclose(self) -> None:
+        """Release pooled connections."""
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def response_usage(response) -> Optional[Tuple[int, int, int]]:
+    """(prompt, completion, cached prompt) tokens reported on a completion response, if any."""
+    usage = getattr(response, 'usage', None)
+    prompt_tokens = getattr(usage, 'prompt_tokens', None)
+    completion_tokens = getattr(usage, 'completion_tokens', None)
+    if not isinstance(prompt_tokens, int) or not isinstance(completion_tokens, int):
+        return None
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached = getattr(details, 'cached_tokens', None)
+    return prompt_tokens, completion_tokens, cached if isinstance(cached, int) else 0
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions through one shared ``AsyncOpenAI`` client.
+
+    The client wraps a single pooled httpx client with keep-alive, using HTTP/2 when
+    the optional ``h2`` package is installed. Retries are left to the LLMScheduler.
+    The client is created on first use so the app can start without an API key.
+    """
+
+    name = 'openai'
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout: float = 60.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: Optional[bool] = None
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = _http2_available() if http2 is None else http2
+        self._client = None
+        self._http_client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            self._http_client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+            self._client = AsyncOpenAI(
+                api_key=self.api_key or os.getenv("OPENAI_API_KEY"),
+                base_url=self.base_url or os.getenv("OPENAI_BASE_URL") or None,
+                http_client=self._http_client,
+                max_retries=0
+            )
+        return self._client
+
+    async def complete(self, model: str, messages: List[Dict], **params) -> Completion:
+        response = await self._get_client().chat.completions.create(model=model, messages=messages, **params)
+        return Completion(response.choices[0].message.content or "", response_usage(response))
+
+    async def open_stream(self, model: str, messages: List[Dict], **params) -> AsyncIterator[str]:
+        stream = await self._get_client().chat.completions.create(
+            model=model, messages=messages, stream=True, **params
+        )
+
+        async def deltas() -> AsyncIterator[str]:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = getattr(chunk.choices[0].delta, "content", None)
+                if token:
+                    yield token
+
+        return deltas()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = self._http_client = None
+
+
+class FakeBackendError(Exception):
+    """A server error injected by the fake backend."""
+    status_code = 500
+
+
+_SECTIONS_RE = re.compile(r"each starting with its name on its own line: (.+?)\.\n", re.IGNORECASE)
+_TARGET_RE = re.compile(r"Target length: \d+-\d+ words, about (\d+)\.")
+_VOCABULARY = (
+    "the history of science shows how curious people asked simple questions and found surprising "
+    "answers about light stars cells machines oceans cities language memory energy time and the "
+    "small habits that changed how we live work travel learn and remember"
+).split()
+
+
+class FakeBackend(LLMBackend):
+    """A local stand-in for an LLM provider, for tests and offline load testing.
+
+    Replies are deterministic for a given prompt and seed: plausible narration with
+    the requested template sections, or roughly the requested length for section
+    rewrites. Each call waits a time-to-first-token drawn from ``latency``
+    ('constant', 'uniform', 'exponential' or 'lognormal' around ``latency_mean``
+    seconds), then streams at ``tokens_per_second``. ``error_rate`` and
+    ``rate_limit_rate`` inject server errors and 429s.
+    """
+
+    name = 'fake'
+    LATENCIES = ('constant', 'uniform', 'exponential', 'lognormal')
+
+    def __init__(
+        self,
+        latency: str = 'lognormal',
+        latency_mean: float = 0.5,
+        latency_sigma: float = 0.5,
+        tokens_per_second: float = 80.0,
+        reply_words: int = 300,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: Optional[int] = 0,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep
+    ):
+        if latency not in self.LATENCIES:
+            raise ValueError(f"Unsupported latency distribution: {latency}")
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.reply_words = reply_words
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._seed = seed
+        self._sleep = sleep
+        self.calls = 0
+
+    def _first_token_delay(self) -> float:
+        mean = self.latency_mean
+        if mean <= 0 or self.latency == 'constant':
+            return max(0.0, mean)
+        if self.latency == 'uniform':
+            return self._random.uniform(0, 2 * mean)
+        if self.latency == 'exponential':
+            return self._random.expovariate(1 / mean)
+        # Lognormal with the requested mean
+        sigma = self.latency_sigma
+        return self._random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+    def _inject_errors(self) -> None:
+        roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            raise RateLimitError("Fake backend rate limit")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeBackendError("Fake backend server error")
+
+    def reply(self, messages: List[Dict], max_tokens: Optional[int] = None) -> str:
+        """The deterministic reply text for a prompt."""
+        prompt = messages[-1]["content"]
+        digest = hashlib.sha256(f"{self._seed}:{prompt}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+
+        target = _TARGET_RE.search(prompt)
+        words = int(target.group(1)) if target else self.reply_words
+        if max_tokens:
+            words = min(words, int(max_tokens * 0.75))
+        sections = _SECTIONS_RE.search(prompt)
+        names = [name.strip() for name in sections.group(1).split(",")] if sections else []
+
+        def paragraph(count: int) -> str:
+            sentences = []
+            while count > 0:
+                length = min(count, rng.randint(6, 14))
+                sentence = " ".join(rng.choice(_VOCABULARY) for _ in range(length))
+                sentences.append(sentence[0].upper() + sentence[1:] + rng.choice("..?"))
+                count -= length
+            return " ".join(sentences)
+
+        if not names:
+            return paragraph(max(1, words))
+        share = max(1, words // len(names))
+        return "\n\n".join(f"{name}\n{paragraph(share)}" for name in names)
+
+    async def _respond(self, messages: List[Dict], params: Dict) -> str:
+        self.calls += 1
+        self._inject_errors()
+        await self._sleep(self._first_token_delay())
+        return self.reply(messages, params.get('max_tokens'))
+
+    async def complete(self, model: str, messages: List[Dict], **params) -> Completion:
+        text = await self._respond(messages, params)
+        completion_tokens = count_tokens(text, model)
+        if self.tokens_per_second > 0:
+            await self._sleep(completion_tokens / self.tokens_per_second)
+        prompt_tokens = sum(count_tokens(message["content"], model) for message in messages)
+        return Completion(text, (prompt_tokens, completion_tokens, 0))
+
+    async def open_stream(self, model: str, messages: List[Dict], **params) -> AsyncIterator[str]:
+        text = await self._respond(messages, params)
+        pieces = re.findall(r"\S+\s*", text)
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+
+        async def deltas() -> AsyncIterator[str]:
+            for piece in pieces:
+                await self._sleep(delay)
+                yield piece
+
+        return deltas()
+
+
+def create_backend(config: Optional[Dict] = None, provider: Optional[str] = None) -> LLMBackend:
+    """Build the backend named by provider, LLM_BACKEND or ``backend.provider`` in llm.yaml."""
+    config = config or {}
+    provider = provider or os.getenv("LLM_BACKEND") or config.get('provider', 'openai')
+    if provider == 'fake':
+        return FakeBackend(**config.get('fake', {}))
+    if provider == 'openai':
+        return OpenAIBackend(
+            timeout=config.get('timeout', 60.0),
+            max_connections=config.get('max_connections', 100),
+            max_keepalive_connections=config.get('max_keepalive_connections', 20)
+        )
+    raise ValueError(f"Unknown LLM backend: {provider}")
@@ -0,0 +1,193 @@
+from bisect import bisect_left, bisect_right
+from operator import mul
+from typing import List, Dict, Tuple, Optional, NamedTuple
+
+from .compliance import CompiledTemplate, SectionSpan
+from .text_analysis import PAUSE_MARKS, TextAnalysis, pause_marks
+
+# Seconds of silence after each mark; overridden by validation.pacing.pauses
+DEFAULT_PAUSES = {
+    'comma': 0.2,
+    'clause': 0.3,       # semicolons, colons and dashes
+    'sentence': 0.4,
+    'question': 0.5,
+    'exclamation': 0.5,
+    'ellipsis': 0.6,
+    'paragraph': 0.8,
+    'section': 1.5,
+}
+# Narration runs slower than silent reading (text_analysis.WORDS_PER_MINUTE)
+NARRATION_WORDS_PER_MINUTE = 150
+
+
+def _word_count(text: str) -> int:
+    """Words as analysis counts them: tokens with at least one letter or digit."""
+    return sum(1 for token in text.split() if any(char.isalnum() for char in token))
+
+
+class SentenceTiming(NamedTuple):
+    """When a sentence, or a whole paragraph, is spoken; offsets are into the script, times in seconds."""
+    start: int
+    end: int
+    words: int
+    start_time: float
+    speech: float
+    # Silence after the sentence, paragraph and section breaks included
+    pause: float
+
+    @property
+    def end_time(self) -> float:
+        return self.start_time + self.speech + self.pause
+
+
+class PacingModel:
+    """Narration timeline of a script: speech at a words-per-minute rate plus weighted pauses.
+
+    Built from the per-sentence word and pause mark counts of a TextAnalysis, which live
+    in the paragraph cache, so timing an edited script only adds up cached counts; only
+    sentences that hold a section header are recounted.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        config = config or {}
+        self.words_per_minute = config.get('words_per_minute', NARRATION_WORDS_PER_MINUTE)
+        self.pauses = {**DEFAULT_PAUSES, **config.get('pauses', {})}
+        self._weights = tuple(self.pauses[mark] for mark in PAUSE_MARKS)
+
+    def timeline(
+        self,
+        analysis: TextAnalysis,
+        spans: Optional[List[SectionSpan]] = None,
+        sentences: bool = True
+    ) -> List[SentenceTiming]:
+        """Time every sentence in one pass; sections start at the headers in spans.
+
+        With ``sentences=False`` a paragraph holding no header is timed as one entry,
+        which is all the totals and per-section durations need.
+        """
+        text = analysis.text
+        seconds_per_word = 60.0 / self.words_per_minute
+        spans = spans or []
+        section_starts = [span.header_start for span in spans]
+        # Headers are not narrated: their words and the colon after them are skipped
+        headers = [
+            (span.header_start, span.start, _word_count(text[span.header_start:span.start]))
+            for span in spans
+        ]
+        header = 0
+        weights = self._weights
+        # [start, end, words, start_time, speech, pause], frozen into SentenceTimings at the end
+        entries: List[list] = []
+        clock = 0.0
+        section = None
+        last_paragraph = max(
+            (i for i, paragraph in enumerate(analysis.paragraphs) if paragraph.sentences), default=-1
+        )
+
+        for i, ((offset, paragraph_end), paragraph) in enumerate(zip(analysis.paragraph_offsets, analysis.paragraphs)):
+            if not paragraph.sentences:
+                continue
+            paragraph_section = bisect_right(section_starts, offset)
+            if entries:
+                # The break before this paragraph goes on the previous sentence
+                pause = self.pauses['section' if paragraph_section != section else 'paragraph']
+                entries[-1][5] += pause
+                clock += pause
+            section = paragraph_section
+            # The last sentence loses its pause below, so its paragraph is timed per sentence
+            if (
+                not sentences and i != last_paragraph
+                and bisect_left(section_starts, offset) == bisect_left(section_starts, paragraph_end)
+            ):
+                speech = paragraph.word_count * seconds_per_word
+                pause = sum(map(mul, weights, paragraph.pause_counts))
+                entries.append([offset, paragraph_end, paragraph.word_count, clock, speech, pause])
+                clock += speech + pause
+                continue
+            for (start, end, words, _), counts in zip(paragraph.sentences, paragraph.sentence_pauses):
+                start += offset
+                end += offset
+                spoken_from = start
+                while header < len(headers) and headers[header][0] < end:
+                    if headers[header][0] >= start:
+                        spoken_from = max(spoken_from, headers[header][1])
+                        words = max(0, words - headers[header][2])
+                    header += 1
+                if spoken_from != start:
+                    counts = pause_marks(text, spoken_from, end)
+                speech = words * seconds_per_word
+                pause = sum(map(mul, weights, counts))
+                entries.append([start, end, words, clock, speech, pause])
+                clock += speech + pause
+
+        if entries:
+            # Nothing follows the last sentence
+            entries[-1][5] = 0.0
+        return [SentenceTiming(*entry) for entry in entries]
+
+    def _expected_seconds(self, length_range: Tuple[int, int]) -> List[float]:
+        return [round(words * 60.0 / self.words_per_minute, 2) for words in length_range]
+
+    def _sections(
+        self,
+        timings: List[SentenceTiming],
+        spans: List[SectionSpan],
+        template: CompiledTemplate
+    ) -> List[Dict]:
+        ranges = dict(template.sections)
+        starts = [timing.start for timing in timings]
+        sections = []
+        for span in spans:
+            first = bisect_left(starts, span.header_start)
+            last = bisect_left(starts, span.end)
+            inside = timings[first:last]
+            duration = sum(timing.speech + timing.pause for timing in inside)
+            expected = self._expected_seconds(ranges[span.name])
+            sections.append({
+                'name': span.name,
+                'start_time': round(inside[0].start_time, 2) if inside else None,
+                'duration': round(duration, 2),
+                'words': sum(timing.words for timing in inside),
+                'expected_duration': expected,
+                'duration_in_range': expected[0] <= duration <= expected[1]
+            })
+        return sections
+
+    def summarize(
+        self,
+        timings: List[SentenceTiming],
+        template: Optional[CompiledTemplate] = None,
+        spans: Optional[List[SectionSpan]] = None,
+        include_sentences: bool = False
+    ) -> Dict:
+        """Totals, the template's target duration and, with a template, per-section timing."""
+        speech = sum(timing.speech for timing in timings)
+        pause = sum(timing.pause for timing in timings)
+        duration = speech + pause
+        words = sum(timing.words for timing in timings)
+        target = template.target_duration if template is not None else None
+
+        summary = {
+            'words_per_minute': self.words_per_minute,
+            'duration': round(duration, 2),
+            'speech_seconds': round(speech, 2),
+            'pause_seconds': round(pause, 2),
+            'effective_words_per_minute': round(words * 60 / duration, 1) if duration else 0,
+            'target_duration': list(target) if target else None,
+            'within_target': target[0] <= duration <= target[1] if target else None
+        }
+        if template is not None:
+            summary['sections'] = self._sections(timings, spans if spans is not None else [], template)
+        if include_sentences:
+            summary['sentences'] = [
+                {
+                    'start': timing.start,
+                    'end': timing.end,
+                    'words': timing.words,
+                    'start_time': round(timing.start_time, 2),
+                    'end_time': round(timing.end_time, 2),
+                    'pause': round(timing.pause, 2)
+                }
+                for timing in timings
+            ]
+        return summary
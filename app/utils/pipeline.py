@@ -0,0 +1,110 @@
+from typing import Optional, Dict
+
+from .metrics import REGISTRY, StageTimer
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'script_stage_duration_seconds', 'Time spent in each script generation stage', ['stage']
+)
+TASKS = REGISTRY.counter('script_tasks', 'Finished script generation tasks by status', ['status'])
+TASK_SECONDS = REGISTRY.histogram(
+    'script_task_duration_seconds', 'Script generation task duration by status', ['status']
+)
+
+
+class ScriptPipeline:
+    """The generate-script pipeline: chunk, draft and combine, validate, fix failing sections.
+
+    The finished script is mapped back to the source chunks it was drafted from.
+    Used in the API process when there is no job queue, and by ``app.worker`` otherwise.
+    Requests are plain dicts with the ScriptRequest fields; uploaded content is read from
+    the content store by ``content_id``.
+    """
+
+    def __init__(self, text_processor, ai_handler, section_improver, content_store=None):
+        self.text_processor = text_processor
+        self.ai_handler = ai_handler
+        self.section_improver = section_improver
+        self.content_store = content_store
+
+    async def load_content(self, request: Dict) -> str:
+        if request.get('content') is not None:
+            return request['content']
+        return await self.text_processor.chunking_executor.run(self.content_store.read, request['content_id'])
+
+    async def run(self, request: Dict, timer: Optional[StageTimer] = None) -> Dict:
+        """Generate and validate one script; returns its task fields, stage timings included.
+
+        Pass a timer to keep the timings of a run that raises.
+        """
+        timer = timer or StageTimer(STAGE_SECONDS)
+        text_processor = self.text_processor
+        template_name = request.get('template_name')
+        highlighted_concept = request.get('highlighted_concept')
+
+        # Process the text in chunks
+        with timer.stage("chunking"):
+            content = await self.load_content(request)
+            chunks = await text_processor.chunk_text_async(content)
+            processed_chunks = await text_processor.process_chunks(chunks)
+
+        # Draft every chunk concurrently, then stitch the drafts into the template
+        with timer.stage("generation"):
+            script = await self.ai_handler.generate_script_from_chunks(
+                processed_chunks,
+                template_name=template_name,
+                template_sections=text_processor.get_template_sections(template_name),
+                highlighted_concept=highlighted_concept,
+                previous_topic=request.get('previous_topic')
+            )
+
+        # Validate the script; with a template, keep it as a document so the
+        # section fixes below are re-validated incrementally
+        if template_name in text_processor.compiled_templates:
+            with timer.stage("validation"):
+                document_id, validation_results, _ = await text_processor.validate_incremental_async(
+                    script=script,
+                    template_name=template_name,
+                    coherence=True,
+                    pacing=True
+                )
+            # Rewrite only the sections that are missing or out of range
+            with timer.stage("improvement"):
+                script, validation_results, improvement_rounds = await self.section_improver.improve(
+                    script,
+                    validation_results,
+                    template_name,
+                    highlighted_concept=highlighted_concept,
+                    document_id=document_id
+                )
+        else:
+            with timer.stage("validation"):
+                validation_results = await text_processor.validate_script_async(script)
+            improvement_rounds = []
+
+        # Link each paragraph to the source chunks it draws on
+        with timer.stage("fidelity"):
+            fidelity = await text_processor.check_fidelity_async(script, content, chunks)
+
+        return {
+            'script': script,
+            'validation': validation_results,
+            'fidelity': fidelity,
+            'improvement_rounds': improvement_rounds,
+            'timings': timer.timings()
+        }
+
+    @staticmethod
+    def record(status: str, timer: StageTimer) -> None:
+        """Count a finished task and observe its duration."""
+        TASKS.inc(status=status)
+        TASK_SECONDS.observe(timer.total, status=status)
+
+    async def process(self, request: Dict) -> Dict:
+        """Run the pipeline and return task fields with a final status instead of raising."""
+        timer = StageTimer(STAGE_SECONDS)
+        try:
+            fields = dict(await self.run(request, timer), status="completed")
+        except Exception as e:
+            fields = {'status': "failed", 'error': str(e), 'timings': timer.timings()}
+        self.record(fields['status'], timer)
+        return fields
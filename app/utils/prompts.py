@@ -0,0 +1,181 @@
+import threading
+from collections import deque
+from typing import Optional, Dict, List, Tuple
+from jinja2 import DictLoader, Environment, StrictUndefined
+
+from .tokenizer import count_tokens
+
+
+def _format_number(value) -> str:
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def format_feedback(validation: Dict, thresholds: Optional[Dict] = None) -> str:
+    """Serialize validation results into a few terse lines, one per category.
+
+    Only the figures an editor needs are kept; values that fail a threshold or a
+    template range end with ``!``.
+    """
+    thresholds = thresholds or {}
+    readability_limits = thresholds.get('readability', {})
+    structure_limits = thresholds.get('structure', {})
+    lines = []
+
+    readability = validation.get('readability')
+    if readability:
+        parts = []
+        if 'flesch_score' in readability:
+            minimum = readability_limits.get('min_flesch_score')
+            part = f"flesch {_format_number(readability['flesch_score'])}"
+            if minimum is not None:
+                part += f" (>={minimum})" + ("!" if readability['flesch_score'] < minimum else "")
+            parts.append(part)
+        if 'grade_level' in readability:
+            parts.append(f"grade {_format_number(readability['grade_level'])}")
+        lines.append("readability: " + ", ".join(parts))
+
+    structure = validation.get('structure')
+    if structure:
+        parts = []
+        if 'word_count' in structure:
+            minimum = structure_limits.get('min_word_count')
+            part = f"words {structure['word_count']}"
+            if minimum is not None:
+                part += f" (>={minimum})" + ("!" if structure['word_count'] < minimum else "")
+            parts.append(part)
+        if 'avg_sentence_length' in structure:
+            maximum = readability_limits.get('max_sentence_length')
+            part = f"avg sentence {structure['avg_sentence_length']:.1f}"
+            if maximum is not None:
+                part += f" (<={maximum})" + ("!" if structure['avg_sentence_length'] > maximum else "")
+            parts.append(part)
+        if 'paragraph_count' in structure:
+            parts.append(f"paragraphs {structure['paragraph_count']}")
+        lines.append("structure: " + ", ".join(parts))
+
+    engagement = validation.get('engagement')
+    if engagement:
+        parts = [f"questions {engagement.get('question_count', 0)}"]
+        parts.extend(f'"{phrase}" x{count}!' for phrase, count in engagement.get('banned_transitions', {}).items())
+        lines.append("engagement: " + ", ".join(parts))
+
+    compliance = validation.get('template_compliance')
+    if compliance:
+        parts = []
+        for section, details in compliance.items():
+            low, high = details['expected_range']
+            if not details['present']:
+                parts.append(f"{section} missing ({low}-{high} words)!")
+            else:
+                flag = "" if details['length_in_range'] else "!"
+                parts.append(f"{section} {details['actual_length']} ({low}-{high}){flag}")
+        lines.append("template sections: " + ", ".join(parts))
+
+    return "\n".join(lines)
+
+
+class PromptBuilder:
+    """Renders the system and user messages for every kind of LLM call from prompts.yaml.
+
+    Templates are compiled once. System messages have no variables and are rendered
+    once up front; each is the shared preamble followed by the kind's role.
+    """
+
+    def __init__(self, prompts_config: Dict, preamble: str = "", thresholds: Optional[Dict] = None):
+        self.preamble = preamble.strip()
+        self.thresholds = thresholds or {}
+        self._env = Environment(
+            loader=DictLoader(prompts_config.get('messages', {})),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            undefined=StrictUndefined,
+            autoescape=False
+        )
+        self._system = {
+            kind: "\n\n".join(part for part in (self.preamble, role.strip()) if part)
+            for kind, role in prompts_config.get('roles', {}).items()
+        }
+        self._templates = {kind: self._env.get_template(kind) for kind in self._system}
+
+    @property
+    def kinds(self) -> List[str]:
+        return list(self._system)
+
+    def system_message(self, kind: str) -> str:
+        return self._system[kind]
+
+    def build(self, kind: str, **context) -> Tuple[str, str]:
+        """Return (system message, user message) for one call of the given kind.
+
+        Optional directives (template_name, template_sections, highlighted_concept,
+        previous_topic) default to None.
+        """
+        context.setdefault('template_name', None)
+        context.setdefault('template_sections', None)
+        context.setdefault('highlighted_concept', None)
+        context.setdefault('previous_topic', None)
+        return self._system[kind], self._templates[kind].render(**context).strip()
+
+    def feedback(self, validation: Dict) -> str:
+        """Compact validation feedback against the configured quality thresholds."""
+        return format_feedback(validation, self.thresholds)
+
+
+class UsageLog:
+    """Token usage per LLM call, with totals per call kind and the most recent calls.
+
+    Provider-reported counts are used when a response carries them; otherwise
+    prompt and completion tokens are estimated locally and marked as such.
+    """
+
+    def __init__(self, recent: int = 100):
+        self._totals: Dict[str, Dict] = {}
+        self._recent: deque = deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        kind: str,
+        model: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached_prompt_tokens: int = 0,
+        prefix_tokens: int = 0,
+        estimated: bool = False,
+        response_cached: bool = False
+    ) -> Dict:
+        call = {
+            'kind': kind,
+            'model': model,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cached_prompt_tokens': cached_prompt_tokens,
+            'prefix_tokens': prefix_tokens,
+            'estimated': estimated,
+            'response_cached': response_cached
+        }
+        with self._lock:
+            totals = self._totals.setdefault(kind, {
+                'calls': 0, 'response_cache_hits': 0, 'prompt_tokens': 0,
+                'completion_tokens': 0, 'cached_prompt_tokens': 0
+            })
+            totals['calls'] += 1
+            totals['response_cache_hits'] += int(response_cached)
+            if not response_cached:
+                totals['prompt_tokens'] += prompt_tokens
+                totals['completion_tokens'] += completion_tokens
+                totals['cached_prompt_tokens'] += cached_prompt_tokens
+            self._recent.append(call)
+        return call
+
+    def stats(self) -> Dict:
+        """Return totals per call kind and the most recent calls, newest last."""
+        with self._lock:
+            return {
+                'totals': {kind: dict(totals) for kind, totals in self._totals.items()},
+                'recent': list(self._recent)
+            }
+
+
+def estimate_prompt_tokens(system_message: str, user_message: str, model: str) -> int:
+    return count_tokens(system_message, model) + count_tokens(user_message, model)
@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import Optional, Dict, Callable, Awaitable, TypeVar, Tuple, List
+
+T = TypeVar('T')
+
+
+class RateLimitError(Exception):
+    """Raised by LLM clients when the provider rejects a call for rate limiting (HTTP 429)."""
+    status_code = 429
+
+
+def is_rate_limit(error: BaseException) -> bool:
+    """Whether an error is a provider rate limit rejection."""
+    return getattr(error, 'status_code', None) == 429 or getattr(error, 'http_status', None) == 429
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error is transient: rate limits, server errors, timeouts and dropped connections."""
+    if is_rate_limit(error) or isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, 'status_code', None) or getattr(error, 'http_status', None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    # openai.APIConnectionError / APITimeoutError carry no status code
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+
+class TokenBucket:
+    """Continuously refilling budget of ``per_minute`` units."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount units are available (oversized requests wait for a full bucket)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    """Shared async scheduler for LLM calls.
+
+    Calls are queued by priority (lower runs first) and released while the
+    concurrency cap and each model's requests-per-minute and tokens-per-minute
+    budgets allow. Transient failures are retried with jittered exponential backoff.
+    When the primary model is saturated or rate limited, calls move to the fallback model.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 300000,
+        max_concurrency: int = 16,
+        max_retries: int = 3,
+        backoff_factor: float = 1.5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        fallback_model: Optional[str] = None,
+        saturation_wait: float = 5.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.fallback_model = fallback_model
+        self.saturation_wait = saturation_wait
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self._waiters: List = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'retries': 0,
+                       'rate_limited': 0, 'fallbacks': 0}
+
+    @classmethod
+    def from_config(cls, llm_config: Dict, quality_config: Dict) -> "LLMScheduler":
+        """Build a scheduler from llm.yaml (rate_limits, models.fallback) and quality_control.yaml (error_handling)."""
+        limits = llm_config.get('rate_limits', {})
+        error_handling = quality_config.get('error_handling', {})
+        return cls(
+            requests_per_minute=limits.get('requests_per_minute', 500),
+            tokens_per_minute=limits.get('tokens_per_minute', 300000),
+            max_concurrency=limits.get('max_concurrency', 16),
+            max_retries=error_handling.get('max_retries', 3),
+            backoff_factor=error_handling.get('backoff_factor', 1.5),
+            fallback_model=llm_config.get('models', {}).get('fallback')
+        )
+
+    def _model_buckets(self, model: str) -> Tuple[TokenBucket, TokenBucket]:
+        if model not in self._buckets:
+            self._buckets[model] = (
+                TokenBucket(self.requests_per_minute, self._clock),
+                TokenBucket(self.tokens_per_minute, self._clock)
+            )
+        return self._buckets[model]
+
+    def _wait_time(self, model: str, tokens: int) -> float:
+        requests, token_budget = self._model_buckets(model)
+        return max(requests.wait_time(1), token_budget.wait_time(tokens))
+
+    def _choose_model(self, model: str, tokens: int) -> str:
+        """Route to the fallback model when the primary would make the caller wait too long."""
+        if not self.fallback_model or model == self.fallback_model:
+            return model
+        primary_wait = self._wait_time(model, tokens)
+        if primary_wait > self.saturation_wait and self._wait_time(self.fallback_model, tokens) < primary_wait:
+            self._stats['fallbacks'] += 1
+            return self.fallback_model
+        return model
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Jittered exponential delay before retry number attempt (0-based)."""
+        delay = min(self.max_delay, self.base_delay * self.backoff_factor ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def submit(
+        self,
+        call: Callable[[str], Awaitable[T]],
+        model: str,
+        tokens: int = 0,
+        priority: int = 0
+    ) -> T:
+        """Run call(model_name) under the scheduler's budgets, retrying transient failures.
+
+        ``tokens`` is the estimated prompt plus completion size charged to the TPM budget.
+        """
+        self._stats['submitted'] += 1
+        current_model = self._choose_model(model, tokens)
+        attempt = 0
+        while True:
+            await self._acquire(current_model, tokens, priority)
+            try:
+                result = await call(current_model)
+                self._stats['completed'] += 1
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._stats['failed'] += 1
+                    raise
+                if is_rate_limit(e):
+                    self._stats['rate_limited'] += 1
+                    if self.fallback_model and current_model != self.fallback_model:
+                        current_model = self.fallback_model
+                        self._stats['fallbacks'] += 1
+                self._stats['retries'] += 1
+            finally:
+                self._release()
+
+            await asyncio.sleep(self.backoff_delay(attempt))
+            attempt += 1
+
+    async def _acquire(self, model: str, tokens: int, priority: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), model, tokens, future))
+        self._pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just before cancellation; give it back
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._pump()
+
+    def _pump(self) -> None:
+        """Grant queued calls in priority order while capacity and budgets allow."""
+        while self._waiters:
+            priority, sequence, model, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self._active >= self.max_concurrency:
+                return
+            wait = self._wait_time(model, tokens)
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._on_timer)
+                return
+            heapq.heappop(self._waiters)
+            requests, token_budget = self._model_buckets(model)
+            requests.consume(1)
+            token_budget.consume(tokens)
+            self._active += 1
+            future.set_result(None)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._pump()
+
+    def stats(self) -> Dict:
+        """Return call counters plus current queue depth and in-flight calls."""
+        stats = dict(self._stats)
+        stats['queued'] = sum(1 for waiter in self._waiters if not waiter[-1].done())
+        stats['active'] = self._active
+        return stats
@@ -0,0 +1,227 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Dict, List
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+class TaskStore(ABC):
+    """Interface for storing generation task state.
+
+    Tasks are plain dicts with at least ``status``; stores add ``task_id``,
+    ``created_at`` and ``updated_at``. Finished tasks older than ``ttl`` seconds are
+    evicted; in-flight tasks are never evicted.
+    """
+
+    def __init__(self, ttl: Optional[float] = 3600):
+        self.ttl = ttl
+
+    @staticmethod
+    def new_id() -> str:
+        """Return a collision-free task id, safe across processes."""
+        return uuid.uuid4().hex
+
+    @abstractmethod
+    def create(self, status: str = 'processing', **fields) -> str:
+        """Create a task and return its id."""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict]:
+        """Return the task, or None if it does not exist."""
+
+    @abstractmethod
+    def update(self, task_id: str, **fields) -> None:
+        """Merge fields into an existing task."""
+
+    @abstractmethod
+    def list_by_status(self, status: str, older_than: Optional[float] = None, limit: int = 100) -> List[Dict]:
+        """Return tasks with the given status, oldest first, optionally last updated before older_than."""
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """Drop finished tasks past their TTL and return how many were removed."""
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+
+class MemoryTaskStore(TaskStore):
+    """Bounded in-process store for single-worker deployments."""
+
+    def __init__(self, max_tasks: int = 10000, ttl: Optional[float] = 3600):
+        super().__init__(ttl)
+        self.max_tasks = max_tasks
+        self._tasks: "OrderedDict[str, Dict]" = OrderedDict()
+        self._by_status: Dict[str, "OrderedDict[str, None]"] = {}
+        self._lock = threading.Lock()
+
+    def _index(self, task_id: str, old_status: Optional[str], new_status: str) -> None:
+        if old_status is not None:
+            self._by_status.get(old_status, {}).pop(task_id, None)
+        self._by_status.setdefault(new_status, OrderedDict())[task_id] = None
+
+    def create(self, status: str = 'processing', **fields) -> str:
+        task_id = self.new_id()
+        now = time.time()
+        with self._lock:
+            self._tasks[task_id] = dict(
+                fields, task_id=task_id, status=status, created_at=now, updated_at=now
+            )
+            self._index(task_id, None, status)
+            self._evict(now)
+        return task_id
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return dict(task) if task is not None else None
+
+    def update(self, task_id: str, **fields) -> None:
+        now = time.time()
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                raise KeyError(task_id)
+            old_status = task['status']
+            task.update(fields, updated_at=now)
+            # Keep the status index ordered by last update
+            self._by_status.get(old_status, {}).pop(task_id, None)
+            self._index(task_id, None, task['status'])
+
+    def list_by_status(self, status: str, older_than: Optional[float] = None, limit: int = 100) -> List[Dict]:
+        with self._lock:
+            result = []
+            for task_id in self._by_status.get(status, {}):
+                task = self._tasks[task_id]
+                if older_than is not None and task['updated_at'] >= older_than:
+                    break
+                result.append(dict(task))
+                if len(result) >= limit:
+                    break
+            return result
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            return self._evict(time.time())
+
+    def _evict(self, now: float) -> int:
+        """Drop expired finished tasks, then the oldest finished ones while over capacity."""
+        removed = 0
+        for status in FINISHED_STATUSES:
+            ids = self._by_status.get(status, OrderedDict())
+            while ids:
+                task_id = next(iter(ids))
+                expired = self.ttl is not None and self._tasks[task_id]['updated_at'] <= now - self.ttl
+                if not expired and len(self._tasks) <= self.max_tasks:
+                    break
+                ids.pop(task_id)
+                del self._tasks[task_id]
+                removed += 1
+        return removed
+
+
+class SQLiteTaskStore(TaskStore):
+    """File-backed store that several worker processes can share."""
+
+    def __init__(self, path: str, ttl: Optional[float] = 3600):
+        super().__init__(ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                data TEXT NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_updated ON tasks (status, updated_at)")
+
+    @staticmethod
+    def _row_to_task(row) -> Dict:
+        task_id, status, created_at, updated_at, data = row
+        task = json.loads(data)
+        task.update(task_id=task_id, status=status, created_at=created_at, updated_at=updated_at)
+        return task
+
+    def create(self, status: str = 'processing', **fields) -> str:
+        task_id = self.new_id()
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO tasks (task_id, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+                (task_id, status, now, now, json.dumps(fields))
+            )
+        self.evict_expired()
+        return task_id
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT task_id, status, created_at, updated_at, data FROM tasks WHERE task_id = ?",
+                (task_id,)
+            ).fetchone()
+        return self._row_to_task(row) if row is not None else None
+
+    def update(self, task_id: str, **fields) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT status, data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+                if row is None:
+                    raise KeyError(task_id)
+                status, data = row
+                merged = json.loads(data)
+                status = fields.pop('status', status)
+                merged.update(fields)
+                self._db.execute(
+                    "UPDATE tasks SET status = ?, updated_at = ?, data = ? WHERE task_id = ?",
+                    (status, now, json.dumps(merged), task_id)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def list_by_status(self, status: str, older_than: Optional[float] = None, limit: int = 100) -> List[Dict]:
+        query = "SELECT task_id, status, created_at, updated_at, data FROM tasks WHERE status = ?"
+        params: list = [status]
+        if older_than is not None:
+            query += " AND updated_at < ?"
+            params.append(older_than)
+        query += " ORDER BY updated_at LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def evict_expired(self) -> int:
+        if self.ttl is None:
+            return 0
+        cutoff = time.time() - self.ttl
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._lock:
+            cursor = self._db.execute(
+                f"DELETE FROM tasks WHERE status IN ({placeholders}) AND updated_at <= ?",
+                (*FINISHED_STATUSES, cutoff)
+            )
+        return cursor.rowcount
+
+
+def create_task_store() -> TaskStore:
+    """Build the task store selected by TASK_STORE_PATH (SQLite) or an in-memory one."""
+    ttl = float(os.getenv("TASK_TTL", "3600"))
+    path = os.getenv("TASK_STORE_PATH")
+    if path:
+        return SQLiteTaskStore(path, ttl=ttl)
+    return MemoryTaskStore(max_tasks=int(os.getenv("TASK_STORE_MAX", "10000")), ttl=ttl)
@@ -0,0 +1,306 @@
+import re
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, NamedTuple
+
+# Blank lines (possibly holding only whitespace) separate paragraphs
+_PARAGRAPH_BREAK_RE = re.compile(r"\n[^\S\n]*\n\s*")
+# A sentence runs to terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace, or to the end of the paragraph; "3.5" or "e.g.," do not end one
+_SENTENCE_RE = re.compile(
+    r"""\S[^.!?]*(?:[.!?]+(?!["')\]’”]*(?:\s|$))[^.!?]*)*(?:[.!?]+["')\]’”]*)?"""
+)
+# Everything that is neither a word character nor whitespace, as textstat strips it
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+
+# Sentences of this many words or fewer are not counted, as in textstat
+MIN_SENTENCE_WORDS = 2
+
+# Reading speed behind reading_time and caption timing
+WORDS_PER_MINUTE = 200
+
+# Marks counted for narration pauses, in the order of the pause_marks tuples
+PAUSE_MARKS = ('comma', 'clause', 'ellipsis', 'question', 'exclamation', 'sentence')
+_CLAUSE_MARKS = ('; ', ': ', ' - ', '—', '–')
+_CLOSERS = '"\')]’”'
+
+
+@lru_cache(maxsize=65536)
+def syllable_count(word: str) -> int:
+    """Syllables in a single lowercase word, memoised across calls."""
+    # textstat loads its dictionaries on import; keep it off the startup path
+    import textstat
+    return textstat.syllable_count(word)
+
+
+def legacy_round(number: float, points: int = 0) -> float:
+    """Round half up, matching textstat's output rounding."""
+    p = 10 ** points
+    return float(int(number * p + 0.5) / p) if number >= 0 else -float(int(-number * p + 0.5) / p)
+
+
+class PhraseMatcher:
+    """Counts many words and phrases in one scan with a single compiled regex.
+
+    Matches are case-insensitive, on word boundaries, and allow any run of whitespace
+    between the words of a phrase. Longer phrases win over their prefixes.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases = sorted({' '.join(p.lower().split()) for p in phrases if p.strip()},
+                              key=len, reverse=True)
+        if self.phrases:
+            alternatives = '|'.join(r'\s+'.join(map(re.escape, p.split())) for p in self.phrases)
+            # Cheap first-character lookahead lets the engine skip most positions
+            initials = ''.join(sorted({c for p in self.phrases for c in (p[0], p[0].upper())}))
+            self._pattern = re.compile(
+                rf"\b(?=[{re.escape(initials)}])(?:{alternatives})\b", re.IGNORECASE
+            )
+        else:
+            self._pattern = None
+
+    def finditer(self, text: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator[Tuple[str, int, int]]:
+        """Yield (phrase, start, end) for every match in text[pos:endpos]."""
+        if self._pattern is None:
+            return
+        for match in self._pattern.finditer(text, pos, len(text) if endpos is None else endpos):
+            yield ' '.join(match.group().lower().split()), match.start(), match.end()
+
+    def count(self, text: str, pos: int = 0, endpos: Optional[int] = None) -> Counter:
+        """Return a Counter of phrase -> occurrences."""
+        return Counter(phrase for phrase, _, _ in self.finditer(text, pos, endpos))
+
+
+def pause_marks(text: str, start: int, end: int) -> Tuple[int, int, int, int, int, int]:
+    """Counts of the PAUSE_MARKS in the sentence text[start:end].
+
+    The last three count its terminal mark; a sentence trailing off in an ellipsis has none.
+    """
+    count = text.count
+    ellipses = count('...', start, end) + count('…', start, end)
+    tail = text[max(start, end - 8):end].rstrip(_CLOSERS)
+    terminal = '' if tail.endswith(('...', '…')) else tail[-1:]
+    return (
+        count(', ', start, end),
+        sum(count(mark, start, end) for mark in _CLAUSE_MARKS),
+        ellipses,
+        int(terminal == '?'),
+        int(terminal == '!'),
+        int(terminal == '.')
+    )
+
+
+class ParagraphAnalysis(NamedTuple):
+    """Counts for one paragraph; offsets are relative to the paragraph start."""
+    word_count: int
+    syllable_count: int
+    letter_count: int
+    sentences: Tuple[Tuple[int, int, int, int], ...]  # (start, end, words, syllables)
+    sentence_count: int  # sentences long enough to count towards readability metrics
+    question_count: int
+    quote_count: int
+    phrase_counts: Dict[str, int]
+    sentence_pauses: Tuple[Tuple[int, ...], ...]  # pause_marks of each sentence
+    pause_counts: Tuple[int, ...]  # pause_marks summed over the paragraph
+
+
+def analyze_paragraph(text: str, matcher: Optional[PhraseMatcher] = None) -> ParagraphAnalysis:
+    """Scan one paragraph once, sentence by sentence, and derive every per-paragraph count.
+
+    Per-word work (punctuation stripping, splitting, syllable lookup) runs in C via
+    ``re.sub``, ``str.split`` and ``map`` over the memoised syllable counter.
+    """
+    sentences = []
+    pauses = []
+    words = syllables = letters = 0
+    strip_punctuation = _PUNCTUATION_RE.sub
+
+    for match in _SENTENCE_RE.finditer(text):
+        cores = strip_punctuation('', match.group().lower()).split()
+        if not cores:
+            continue
+        sentence_syllables = sum(map(syllable_count, cores))
+        sentences.append((match.start(), match.end(), len(cores), sentence_syllables))
+        pauses.append(pause_marks(text, match.start(), match.end()))
+        words += len(cores)
+        syllables += sentence_syllables
+        letters += sum(map(len, cores))
+
+    return ParagraphAnalysis(
+        word_count=words,
+        syllable_count=syllables,
+        letter_count=letters,
+        sentences=tuple(sentences),
+        sentence_count=sum(1 for sentence in sentences if sentence[2] > MIN_SENTENCE_WORDS),
+        question_count=text.count('?'),
+        quote_count=text.count('"'),
+        phrase_counts=dict(matcher.count(text)) if matcher is not None else {},
+        sentence_pauses=tuple(pauses),
+        pause_counts=tuple(map(sum, zip(*pauses))) if pauses else (0,) * len(PAUSE_MARKS)
+    )
+
+
+def iter_sentences(text: str) -> Iterator[str]:
+    """Yield the sentences of text, split as in analysis, with their whitespace collapsed."""
+    for match in _SENTENCE_RE.finditer(text):
+        yield ' '.join(match.group().split())
+
+
+def paragraph_spans(text: str) -> List[Tuple[int, int]]:
+    """Return (start, end) offsets of the non-empty, whitespace-trimmed paragraphs in text."""
+    spans = []
+    start = 0
+    for match in _PARAGRAPH_BREAK_RE.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+
+    trimmed = []
+    for start, end in spans:
+        segment = text[start:end]
+        stripped = segment.strip()
+        if stripped:
+            offset = start + (len(segment) - len(segment.lstrip()))
+            trimmed.append((offset, offset + len(stripped)))
+    return trimmed
+
+
+class TextAnalysis:
+    """Document-level view over per-paragraph analyses; every validation metric reads from here."""
+
+    def __init__(
+        self,
+        text: str,
+        spans: List[Tuple[int, int]],
+        paragraphs: List[ParagraphAnalysis],
+        matcher: Optional[PhraseMatcher] = None
+    ):
+        self.text = text
+        self.paragraph_offsets = spans
+        self.paragraphs = paragraphs
+        # The matcher behind phrase_counts, if any
+        self.matcher = matcher
+        self.analyzed_paragraphs = len(paragraphs)
+        words = syllables = letters = raw_sentences = sentences = questions = quotes = 0
+        phrase_counts: Counter = Counter()
+        for p in paragraphs:
+            words += p.word_count
+            syllables += p.syllable_count
+            letters += p.letter_count
+            raw_sentences += len(p.sentences)
+            sentences += p.sentence_count
+            questions += p.question_count
+            quotes += p.quote_count
+            if p.phrase_counts:
+                phrase_counts.update(p.phrase_counts)
+        self.word_count = words
+        self.syllable_count = syllables
+        self.letter_count = letters
+        self.raw_sentence_count = raw_sentences
+        self.sentence_count = max(1, sentences)
+        self.question_count = questions
+        self.quote_count = quotes // 2
+        self.phrase_counts = phrase_counts
+
+    @property
+    def paragraph_count(self) -> int:
+        return len(self.paragraphs)
+
+    def sentences(self) -> Iterator[Tuple[int, int, int, int]]:
+        """Yield (start, end, words, syllables) for every sentence, with document offsets."""
+        for (offset, _), paragraph in zip(self.paragraph_offsets, self.paragraphs):
+            for start, end, words, syllables in paragraph.sentences:
+                yield offset + start, offset + end, words, syllables
+
+    def flesch_reading_ease(self) -> float:
+        if not self.word_count:
+            return legacy_round(206.835, 2)
+        sentence_length = legacy_round(self.word_count / self.sentence_count, 1)
+        syllables_per_word = legacy_round(self.syllable_count / self.word_count, 1)
+        return legacy_round(206.835 - 1.015 * sentence_length - 84.6 * syllables_per_word, 2)
+
+    def coleman_liau_index(self) -> float:
+        if not self.word_count:
+            return legacy_round(-15.8, 2)
+        letters = legacy_round(legacy_round(self.letter_count / self.word_count, 2) * 100, 2)
+        sentences = legacy_round(legacy_round(self.sentence_count / self.word_count, 2) * 100, 2)
+        return legacy_round(0.058 * letters - 0.296 * sentences - 15.8, 2)
+
+
+class ParagraphCache:
+    """Bounded LRU of paragraph analyses keyed by paragraph text (i.e. by its hash).
+
+    Only valid for a single PhraseMatcher; each TextProcessor owns its own cache.
+    """
+
+    def __init__(self, max_entries: int = 8192):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, ParagraphAnalysis]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, paragraphs: List[str]) -> List[Optional[ParagraphAnalysis]]:
+        """Look up several paragraphs under one lock; misses come back as None."""
+        with self._lock:
+            entries = self._entries
+            found = [entries.get(paragraph) for paragraph in paragraphs]
+            touch = entries.move_to_end
+            for paragraph, entry in zip(paragraphs, found):
+                if entry is not None:
+                    touch(paragraph)
+            misses = found.count(None)
+            self.misses += misses
+            self.hits += len(found) - misses
+            return found
+
+    def put(self, paragraph: str, analysis: ParagraphAnalysis) -> None:
+        with self._lock:
+            self._entries[paragraph] = analysis
+            self._entries.move_to_end(paragraph)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def analyze_text(
+    text: str,
+    matcher: Optional[PhraseMatcher] = None,
+    cache: Optional[ParagraphCache] = None
+) -> TextAnalysis:
+    """Analyze a whole document paragraph by paragraph.
+
+    With a cache, unchanged paragraphs are reused and only new or edited ones are scanned;
+    the number scanned is recorded on the result as ``analyzed_paragraphs``.
+    """
+    spans = paragraph_spans(text)
+    texts = [text[start:end] for start, end in spans]
+    paragraphs = cache.get_many(texts) if cache is not None else [None] * len(texts)
+    analyzed = 0
+    for i, result in enumerate(paragraphs):
+        if result is None:
+            result = paragraphs[i] = analyze_paragraph(texts[i], matcher)
+            analyzed += 1
+            if cache is not None:
+                cache.put(texts[i], result)
+    analysis = TextAnalysis(text, spans, paragraphs, matcher)
+    analysis.analyzed_paragraphs = analyzed
+    return analysis
+
+
+def apply_edits(text: str, edits: Iterable[Tuple[int, int, str]]) -> str:
+    """Apply non-overlapping (start, end, replacement) edits, all relative to the original text."""
+    ordered = sorted(edits, key=lambda edit: edit[0])
+    parts = []
+    position = 0
+    for start, end, replacement in ordered:
+        if start < position or end < start or end > len(text):
+            raise ValueError(f"Invalid or overlapping edit range: {start}-{end}")
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
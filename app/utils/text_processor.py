@@ -1,28 +1,216 @@
+import asyncio
 import os
-from typing import List, Dict, Tuple, Optional
-import yaml
-import textstat
-from semantic_text_splitter import TextSplitter
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Dict, Tuple, Optional, NamedTuple, Iterable, Iterator, AsyncIterator, Union, TYPE_CHECKING
+
+from .coherence import CoherenceAnalyzer
+from .coalescing import content_sha256
+from .compliance import CompiledTemplate, SectionSpan
+from .config import TRANSITION_WORDS, AppConfig, ConfigRegistry, get_config_registry
+from .executors import InstrumentedExecutor
+from .export import ScriptExporter
+from .fidelity import FidelityIndex
+from .pacing import PacingModel
+from .text_analysis import WORDS_PER_MINUTE, ParagraphCache, TextAnalysis, analyze_text, apply_edits
+from .tokenizer import count_tokens
+
+if TYPE_CHECKING:
+    from semantic_text_splitter import TextSplitter
+
+class UnknownDocumentError(LookupError):
+    """Raised when incremental edits refer to a document that is not held in memory."""
+
+# Each validation worker process builds its own TextProcessor once, in the pool initializer
+_worker_processor: Optional["TextProcessor"] = None
+
+
+def _init_validation_worker(config_paths: Dict[str, str], check_interval: float) -> None:
+    global _worker_processor
+    _worker_processor = TextProcessor(config=ConfigRegistry(config_paths, check_interval))
+
+
+def _validate_indexed(
+    processor: "TextProcessor",
+    batch: List[Tuple[int, str]],
+    template_name: Optional[str]
+) -> List[Dict]:
+    """Validate one dispatched batch of (index, script) pairs.
+
+    A failing script is reported in its own result instead of failing the whole batch.
+    """
+    results = []
+    for index, script in batch:
+        try:
+            results.append({'index': index, 'validation': processor.validate_script(script, template_name)})
+        except Exception as e:
+            results.append({'index': index, 'error': f"Error validating script: {str(e)}"})
+    return results
+
+
+def _validate_batch(batch: List[Tuple[int, str]], template_name: Optional[str]) -> List[Dict]:
+    """Validate a batch inside a worker process."""
+    return _validate_indexed(_worker_processor, batch, template_name)
+
+
+def _validate_in_worker(script: str, template_name: Optional[str]) -> Dict:
+    """Validate a single script inside a worker process."""
+    return _worker_processor.validate_script(script, template_name)
+
+
+class TextChunk(NamedTuple):
+    """A chunk of source text, described by character offsets into the original string."""
+    index: int
+    start: int
+    end: int
+    token_count: int
+
+    def text(self, source: str) -> str:
+        """Return the chunk's text from the source it was computed on."""
+        return source[self.start:self.end]
+
 
 class TextProcessor:
-    def __init__(self, templates_path: Optional[str] = None):
-        """Initialize the text processor with optional templates path."""
-        if templates_path is None:
-            templates_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                                        "config", "templates.yaml")
-        self.templates = self._load_templates(templates_path)
-        self.splitter = TextSplitter()
-
-    def _load_templates(self, templates_path: str) -> dict:
-        """Load script templates from YAML file."""
-        if os.path.exists(templates_path):
-            with open(templates_path, 'r') as f:
-                return yaml.safe_load(f)
-        return {}
-
-    def chunk_text(self, text: str) -> List[str]:
-        """Split text into semantic chunks."""
-        return self.splitter.split_text(text)
+    def __init__(
+        self,
+        templates_path: Optional[str] = None,
+        llm_config_path: Optional[str] = None,
+        chunk_tokens: Optional[int] = None,
+        chunk_overlap: int = 0,
+        quality_config_path: Optional[str] = None,
+        export_config_path: Optional[str] = None,
+        config: Optional[ConfigRegistry] = None
+    ):
+        """Initialize the text processor with optional config paths and a chunk token budget.
+
+        Config comes from the process-wide ConfigRegistry unless a registry or any config
+        path is given, and is re-applied whenever the registry reloads. The budget and
+        tokenizer model default to ``parameters.max_tokens`` and ``models.default`` from
+        ``config/llm.yaml``.
+        """
+        paths = {
+            'templates': templates_path,
+            'llm': llm_config_path,
+            'quality': quality_config_path,
+            'export': export_config_path
+        }
+        if config is None:
+            config = ConfigRegistry(paths) if any(paths.values()) else get_config_registry()
+        self.config = config
+        self._chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self._splitters: Dict[Tuple[int, int], "TextSplitter"] = {}
+        self.max_documents = 256
+        self._documents: "OrderedDict[str, str]" = OrderedDict()
+        self._documents_lock = threading.Lock()
+        # Fidelity indexes of recent sources, keyed by content hash and chunk budget
+        self.max_fidelity_indexes = 8
+        self._fidelity_indexes: "OrderedDict[Tuple[str, int], FidelityIndex]" = OrderedDict()
+        self._fidelity_lock = threading.Lock()
+        self._apply_config(config.current)
+        config.subscribe(self._apply_config)
+        # CPU-bound work runs off the event loop: chunking and export on a thread pool
+        # (CHUNKING_THREADS), validation on a process pool (VALIDATION_WORKERS, default: all
+        # cores), or on threads when VALIDATION_EXECUTOR=thread
+        self.chunking_executor = InstrumentedExecutor(
+            'chunking', 'thread', int(os.getenv("CHUNKING_THREADS", "4"))
+        )
+        workers = os.getenv("VALIDATION_WORKERS")
+        self.validation_executor = self._validation_executor(
+            os.getenv("VALIDATION_EXECUTOR", "process"), int(workers) if workers else None
+        )
+
+    def _apply_config(self, config: AppConfig) -> None:
+        """Swap in everything derived from a config snapshot."""
+        if getattr(self, 'phrase_matcher', None) is not config.phrase_matcher:
+            # Cached analyses hold phrase counts from the matcher they were made with
+            self.paragraph_cache = ParagraphCache()
+        if getattr(self, 'model', None) != config.llm.model:
+            self._splitters = {}
+        self.templates = config.templates
+        self.compiled_templates = config.compiled_templates
+        self.banned_transitions = list(config.quality.banned_transitions)
+        self.phrase_matcher = config.phrase_matcher
+        self.pacing = PacingModel(config.quality.pacing)
+        self.coherence = CoherenceAnalyzer(
+            config.quality.coherence,
+            max_sentence_length=config.quality.validation.get('readability', {}).get('max_sentence_length', 25),
+            banned_transitions=config.quality.banned_transitions
+        )
+        self.exporter = ScriptExporter(config.export)
+        self.fidelity_config = config.quality.fidelity
+        with self._fidelity_lock:
+            self._fidelity_indexes.clear()
+        self.model = config.llm.model
+        self.chunk_tokens = self._chunk_tokens or config.llm.max_tokens
+
+    def _validation_executor(self, kind: str, max_workers: Optional[int]) -> InstrumentedExecutor:
+        """Build a validation executor; process workers each load their own TextProcessor."""
+        if kind == 'process':
+            return InstrumentedExecutor(
+                'validation', 'process', max_workers,
+                initializer=_init_validation_worker,
+                initargs=(self.config.paths, self.config.check_interval)
+            )
+        return InstrumentedExecutor('validation', kind, max_workers)
+
+    def _get_splitter(self, max_tokens: int, overlap: int) -> "TextSplitter":
+        """Return a cached token-budgeted splitter for the configured model."""
+        # Imported on first use: the Rust extension is only needed where text is chunked
+        from semantic_text_splitter import TextSplitter
+
+        if overlap >= max_tokens:
+            raise ValueError("Chunk overlap must be smaller than the chunk token budget")
+        key = (max_tokens, overlap)
+        if key not in self._splitters:
+            try:
+                splitter = TextSplitter.from_tiktoken_model(self.model, max_tokens, overlap=overlap)
+            except Exception:
+                splitter = TextSplitter.from_tiktoken_model("gpt-4", max_tokens, overlap=overlap)
+            self._splitters[key] = splitter
+        return self._splitters[key]
+
+    @property
+    def splitter(self) -> "TextSplitter":
+        """The splitter for the default chunk budget and overlap."""
+        return self._get_splitter(self.chunk_tokens, self.chunk_overlap)
+
+    def get_template_sections(self, template_name: Optional[str]) -> List[str]:
+        """Return the ordered section names of a template, or an empty list."""
+        template = self.compiled_templates.get(template_name) if template_name else None
+        return [name for name, _ in template.sections] if template else []
+
+    def chunk_text(
+        self,
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap: Optional[int] = None
+    ) -> List[str]:
+        """Split text into semantic chunks of at most max_tokens tokens each."""
+        self.config.check()
+        splitter = self._get_splitter(
+            max_tokens or self.chunk_tokens,
+            self.chunk_overlap if overlap is None else overlap
+        )
+        return splitter.chunks(text)
+
+    def chunk_spans(
+        self,
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap: Optional[int] = None
+    ) -> List[TextChunk]:
+        """Split text like chunk_text but return offsets and token counts instead of strings."""
+        splitter = self._get_splitter(
+            max_tokens or self.chunk_tokens,
+            self.chunk_overlap if overlap is None else overlap
+        )
+        return [
+            TextChunk(index, start, start + len(chunk), count_tokens(chunk, self.model))
+            for index, (start, chunk) in enumerate(splitter.chunk_indices(text))
+        ]
 
     async def process_chunks(self, chunks: List[str]) -> List[str]:
         """Process text chunks asynchronously."""
@@ -30,126 +218,301 @@ class TextProcessor:
         # For now, we'll just return the chunks as is
         return chunks
 
+    def analyze(self, script: str) -> TextAnalysis:
+        """Tokenize the script once into the shared analysis every metric is derived from.
+
+        Paragraphs seen before are served from the paragraph cache.
+        """
+        self.config.check()
+        return analyze_text(script, self.phrase_matcher, self.paragraph_cache)
+
     def validate_script(self, script: str, template_name: Optional[str] = None) -> Dict:
         """Validate script against readability metrics and template if provided."""
+        return self._validate(script, self.analyze(script), template_name)
+
+    def pacing_timeline(self, script: str, template_name: Optional[str] = None) -> Dict:
+        """Narration timeline of the script, sentence by sentence and per template section."""
+        analysis = self.analyze(script)
+        template = self.compiled_templates.get(template_name)
+        spans = template.segment(script) if template else None
+        return self.pacing.summarize(
+            self.pacing.timeline(analysis, spans), template, spans, include_sentences=True
+        )
+
+    def fidelity_index(self, source: str, chunks: Optional[List[str]] = None) -> FidelityIndex:
+        """The fidelity index of a source's chunks, built once and kept for the next few sources.
+
+        Pass the chunks when chunk_text has already run on the source.
+        """
+        key = (content_sha256(source), self.chunk_tokens)
+        with self._fidelity_lock:
+            index = self._fidelity_indexes.get(key)
+            if index is not None:
+                self._fidelity_indexes.move_to_end(key)
+                return index
+        index = FidelityIndex(self.chunk_text(source) if chunks is None else chunks, self.fidelity_config)
+        with self._fidelity_lock:
+            self._fidelity_indexes[key] = index
+            while len(self._fidelity_indexes) > self.max_fidelity_indexes:
+                self._fidelity_indexes.popitem(last=False)
+        return index
+
+    def check_fidelity(self, script: str, source: str, chunks: Optional[List[str]] = None) -> Dict:
+        """Map every script paragraph to the source chunks it draws on, without the LLM."""
+        return self.fidelity_index(source, chunks).check(script)
+
+    def validate_incremental(
+        self,
+        document_id: Optional[str] = None,
+        script: Optional[str] = None,
+        edits: Optional[Iterable[Tuple[int, int, str]]] = None,
+        template_name: Optional[str] = None,
+        coherence: bool = False,
+        pacing: bool = False
+    ) -> Tuple[str, Dict, int]:
+        """Validate a document from a full script or from edits to its last validated version.
+
+        Edits are (start, end, replacement) ranges relative to the previous version.
+        Coherence and pacing time every paragraph, so they only run when requested.
+        Returns the document id, the validation results and how many paragraphs were re-analyzed.
+        Raises UnknownDocumentError when edits refer to a document this processor does not hold.
+        """
+        if script is None:
+            if edits is None:
+                raise ValueError("Either script or edits must be provided")
+            with self._documents_lock:
+                previous = self._documents.get(document_id) if document_id else None
+            if previous is None:
+                raise UnknownDocumentError(document_id)
+            script = apply_edits(previous, edits)
+
+        document_id = document_id or uuid.uuid4().hex
+        with self._documents_lock:
+            self._documents[document_id] = script
+            self._documents.move_to_end(document_id)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+        analysis = self.analyze(script)
+        validation = self._validate(script, analysis, template_name, coherence=coherence, pacing=pacing)
+        return document_id, validation, analysis.analyzed_paragraphs
+
+    def executor_stats(self) -> Dict:
+        """Queue depth and wait time metrics for the chunking and validation executors."""
+        return {
+            executor.name: executor.stats()
+            for executor in (self.chunking_executor, self.validation_executor)
+        }
+
+    def close(self) -> None:
+        """Shut down the executors' worker threads and processes, if any were started."""
+        self.chunking_executor.shutdown()
+        self.validation_executor.shutdown()
+
+    def _submit_batch(
+        self,
+        executor: InstrumentedExecutor,
+        batch: List[Tuple[int, str]],
+        template_name: Optional[str]
+    ) -> "Future[List[Dict]]":
+        if executor.kind == 'process':
+            return executor.submit(_validate_batch, batch, template_name)
+        return executor.submit(_validate_indexed, self, batch, template_name)
+
+    @staticmethod
+    def _batches(scripts: List[str], workers: int, chunksize: Optional[int]) -> List[List[Tuple[int, str]]]:
+        """Split scripts into dispatch batches; by default about four per worker."""
+        if not chunksize:
+            chunksize = max(1, -(-len(scripts) // (workers * 4)))
+        indexed = list(enumerate(scripts))
+        return [indexed[i:i + chunksize] for i in range(0, len(indexed), chunksize)]
+
+    def validate_many(
+        self,
+        scripts: Iterable[str],
+        template_name: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        chunksize: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """Validate many scripts across worker processes, yielding results in input order.
+
+        Each result is ``{'index': i, 'validation': {...}}`` or ``{'index': i, 'error': '...'}``.
+        Scripts are dispatched in batches of ``chunksize`` to amortise inter-process overhead.
+        Passing max_workers runs the batch on a dedicated pool instead of the shared one.
+        """
+        scripts = list(scripts)
+        if not scripts:
+            return
+        executor = self.validation_executor
+        if max_workers is not None:
+            executor = self._validation_executor(executor.kind, max_workers)
+        try:
+            futures = [
+                self._submit_batch(executor, batch, template_name)
+                for batch in self._batches(scripts, executor.max_workers, chunksize)
+            ]
+            for future in futures:
+                yield from future.result()
+        finally:
+            if executor is not self.validation_executor:
+                executor.shutdown()
+
+    async def validate_many_stream(
+        self,
+        scripts: Iterable[str],
+        template_name: Optional[str] = None,
+        chunksize: Optional[int] = None
+    ) -> AsyncIterator[Dict]:
+        """Validate many scripts on the validation executor without blocking the event loop.
+
+        Results are yielded batch by batch as soon as each finishes, so they may arrive
+        out of input order; use each result's ``index`` to match it up.
+        """
+        scripts = list(scripts)
+        if not scripts:
+            return
+        executor = self.validation_executor
+        pending = [
+            asyncio.wrap_future(self._submit_batch(executor, batch, template_name))
+            for batch in self._batches(scripts, executor.max_workers, chunksize)
+        ]
+        try:
+            for finished in asyncio.as_completed(pending):
+                for result in await finished:
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def chunk_text_async(
+        self,
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap: Optional[int] = None
+    ) -> List[str]:
+        """chunk_text on the chunking thread pool; the Rust splitter releases the GIL."""
+        return await self.chunking_executor.run(self.chunk_text, text, max_tokens, overlap)
+
+    async def validate_script_async(self, script: str, template_name: Optional[str] = None) -> Dict:
+        """validate_script on the validation executor, keeping the event loop free."""
+        if self.validation_executor.kind == 'process':
+            return await self.validation_executor.run(_validate_in_worker, script, template_name)
+        return await self.validation_executor.run(self.validate_script, script, template_name)
+
+    async def validate_incremental_async(
+        self,
+        document_id: Optional[str] = None,
+        script: Optional[str] = None,
+        edits: Optional[Iterable[Tuple[int, int, str]]] = None,
+        template_name: Optional[str] = None,
+        coherence: bool = False,
+        pacing: bool = False
+    ) -> Tuple[str, Dict, int]:
+        """validate_incremental on the thread pool, since it needs this process's document store."""
+        return await self.chunking_executor.run(
+            self.validate_incremental, document_id, script, edits, template_name, coherence, pacing
+        )
+
+    async def pacing_timeline_async(self, script: str, template_name: Optional[str] = None) -> Dict:
+        """pacing_timeline on the thread pool, sharing this process's paragraph cache."""
+        return await self.chunking_executor.run(self.pacing_timeline, script, template_name)
+
+    async def check_fidelity_async(self, script: str, source: str, chunks: Optional[List[str]] = None) -> Dict:
+        """check_fidelity on the thread pool, sharing this process's fidelity indexes."""
+        return await self.chunking_executor.run(self.check_fidelity, script, source, chunks)
+
+    async def format_script_for_export_async(
+        self,
+        script: str,
+        format_type: str,
+        template_name: Optional[str] = None
+    ) -> Tuple[Union[str, bytes], str]:
+        """format_script_for_export on the thread pool."""
+        return await self.chunking_executor.run(self.format_script_for_export, script, format_type, template_name)
+
+    def _validate(
+        self,
+        script: str,
+        analysis: TextAnalysis,
+        template_name: Optional[str],
+        coherence: bool = True,
+        pacing: bool = True
+    ) -> Dict:
+        """Aggregate document-level validation results from a finished analysis.
+
+        ``coherence`` and ``pacing`` can be turned off where those whole-document checks are not needed.
+        """
         validation = {
-            'readability': self._check_readability(script),
-            'structure': self._check_structure(script),
-            'engagement': self._check_engagement(script)
+            'readability': self._check_readability(analysis),
+            'structure': self._check_structure(analysis),
+            'engagement': self._check_engagement(analysis)
         }
 
-        if template_name and template_name in self.templates:
-            validation['template_compliance'] = self._check_template_compliance(
-                script, self.templates[template_name]
+        template = self.compiled_templates.get(template_name) if template_name else None
+        spans = template.segment(script) if template else None
+        if template is not None:
+            validation['template_compliance'] = self._check_template_compliance(script, template, spans)
+        if pacing:
+            validation['pacing'] = self.pacing.summarize(
+                self.pacing.timeline(analysis, spans, sentences=False), template, spans
             )
+        if coherence:
+            validation['coherence'] = self.coherence.check(analysis, spans)
 
         return validation
 
-    def _check_readability(self, text: str) -> Dict:
+    def _check_readability(self, analysis: TextAnalysis) -> Dict:
         """Check text readability metrics."""
         return {
-            'flesch_score': textstat.flesch_reading_ease(text),
-            'grade_level': textstat.coleman_liau_index(text),
-            'reading_time': len(text.split()) / 200  # Assuming 200 words per minute
+            'flesch_score': analysis.flesch_reading_ease(),
+            'grade_level': analysis.coleman_liau_index(),
+            'reading_time': analysis.word_count / WORDS_PER_MINUTE
         }
 
-    def _check_structure(self, text: str) -> Dict:
+    def _check_structure(self, analysis: TextAnalysis) -> Dict:
         """Check text structure metrics."""
-        paragraphs = [p for p in text.split('\n\n') if p.strip()]
-        sentences = textstat.sentence_count(text)
-        words = len(text.split())
+        paragraphs = analysis.paragraph_count
+        sentences = analysis.sentence_count
+        words = analysis.word_count
 
         return {
-            'paragraph_count': len(paragraphs),
+            'paragraph_count': paragraphs,
             'sentence_count': sentences,
             'word_count': words,
-            'avg_paragraph_length': words / len(paragraphs) if paragraphs else 0,
+            'avg_paragraph_length': words / paragraphs if paragraphs else 0,
             'avg_sentence_length': words / sentences if sentences else 0
         }
 
-    def _check_engagement(self, text: str) -> Dict:
+    def _check_engagement(self, analysis: TextAnalysis) -> Dict:
         """Check text engagement metrics."""
-        questions = text.count('?')
-        quotes = text.count('"') // 2  # Divide by 2 as quotes come in pairs
-        
-        # Simple list of transition words
-        transition_words = ['however', 'therefore', 'furthermore', 'moreover', 'meanwhile']
-        transition_count = sum(text.lower().count(word) for word in transition_words)
+        counts = analysis.phrase_counts
 
         return {
-            'question_count': questions,
-            'quote_count': quotes,
-            'transition_words': transition_count
+            'question_count': analysis.question_count,
+            'quote_count': analysis.quote_count,  # Quotes come in pairs
+            'transition_words': sum(counts.get(word, 0) for word in TRANSITION_WORDS),
+            'banned_transitions': {
+                phrase: counts[phrase] for phrase in self.banned_transitions if counts.get(phrase)
+            }
         }
 
-    def _check_template_compliance(self, text: str, template: Dict) -> Dict:
+    def _check_template_compliance(
+        self,
+        text: str,
+        template: CompiledTemplate,
+        spans: Optional[List[SectionSpan]] = None
+    ) -> Dict:
         """Check if text follows template structure."""
-        compliance = {}
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-        current_section = None
-        section_content = []
-
-        for section in template['sections']:
-            section_name = section['name']
-            expected_range = section['length_range']
-            
-            # Simple heuristic: Look for section headers
-            section_found = False
-            for i, para in enumerate(paragraphs):
-                if section_name.lower() in para.lower():
-                    section_found = True
-                    current_section = section_name
-                    section_content = []
-                elif current_section == section_name:
-                    section_content.append(para)
-                
-            if section_found:
-                section_text = ' '.join(section_content)
-                word_count = len(section_text.split())
-                compliance[section_name] = {
-                    'present': True,
-                    'length_in_range': expected_range[0] <= word_count <= expected_range[1],
-                    'actual_length': word_count,
-                    'expected_range': expected_range
-                }
-            else:
-                compliance[section_name] = {
-                    'present': False,
-                    'length_in_range': False,
-                    'actual_length': 0,
-                    'expected_range': expected_range
-                }
-
-        return compliance
-
-    def format_script_for_export(self, script: str, format_type: str) -> Tuple[str, str]:
-        """Format script for export in various formats."""
-        if format_type == 'txt':
-            return script, 'text/plain'
-        
-        elif format_type == 'html':
-            html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <title>Script</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }}
-        h1, h2 {{ color: #333; }}
-        p {{ margin-bottom: 1em; }}
-    </style>
-</head>
-<body>
-    {script.replace('\n\n', '</p><p>').replace('\n', '<br>')}
-</body>
-</html>"""
-            return html_content, 'text/html'
-        
-        elif format_type == 'md':
-            # Convert paragraphs to markdown format
-            md_content = script.replace('\n\n', '\n\n## ')
-            if not md_content.startswith('# '):
-                md_content = '# ' + md_content
-            return md_content, 'text/markdown'
-        
-        else:
-            raise ValueError(f"Unsupported format type: {format_type}")
+        return template.check(text, spans)
+
+    def format_script_for_export(
+        self,
+        script: str,
+        format_type: str,
+        template_name: Optional[str] = None
+    ) -> Tuple[Union[str, bytes], str]:
+        """Format script for export in various formats; DOCX and PDF come back as bytes.
+
+        Use ``exporter.stream`` to send large exports without holding them in memory.
+        """
+        return self.exporter.render(script, format_type, self.compiled_templates.get(template_name))
@@ -0,0 +1,219 @@
+"""Script generation worker: claims jobs from the durable queue and runs the pipeline.
+
+    JOB_QUEUE_PATH=/data/jobs.db python -m app.worker --processes 4 --concurrency 8
+
+Run as many workers as needed, on any node that can reach JOB_QUEUE_PATH (and
+CONTENT_STORE_DIR for uploaded content). Each process works on up to ``concurrency``
+jobs at once on one event loop; ``--processes`` starts several such processes.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import uuid
+from typing import Optional, Dict, Set
+
+from .utils.content_store import UnknownContentError
+from .utils.job_queue import JobQueue, create_job_queue
+from .utils.metrics import StageTimer
+from .utils.pipeline import ScriptPipeline, STAGE_SECONDS
+
+logger = logging.getLogger("app.worker")
+
+# Failures that another attempt cannot fix
+PERMANENT_ERRORS = (UnknownContentError,)
+
+
+class Worker:
+    """Claims jobs from a JobQueue and runs them through a ScriptPipeline concurrently.
+
+    Every running job's lease is renewed every third of ``lease_seconds``; a job whose
+    renewal fails is cancelled. Queue calls block on SQLite locks, so they run in a
+    thread to keep one contended write from stalling every job on the loop. On stop,
+    running jobs get ``drain_timeout`` seconds to finish before they are cancelled and
+    handed back to the queue.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        pipeline: ScriptPipeline,
+        concurrency: int = 4,
+        poll_interval: float = 1.0,
+        drain_timeout: float = 30.0,
+        worker_id: Optional[str] = None
+    ):
+        self.queue = queue
+        self.pipeline = pipeline
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.drain_timeout = drain_timeout
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = {'claimed': 0, 'completed': 0, 'retried': 0, 'failed': 0, 'lost': 0, 'released': 0}
+        self._running: Set[asyncio.Task] = set()
+
+    async def _heartbeat(self, job_id: str, task: asyncio.Task) -> None:
+        """Renew the lease until cancelled; returns only after cancelling a job whose lease was lost."""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if not await asyncio.to_thread(self.queue.heartbeat, job_id, self.worker_id):
+                task.cancel()
+                return
+
+    async def run_job(self, job: Dict) -> Optional[str]:
+        """Run one claimed job and record its outcome; returns the job's new status."""
+        job_id = job['job_id']
+        timer = StageTimer(STAGE_SECONDS)
+        work = asyncio.ensure_future(self.pipeline.run(job['payload'], timer))
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id, work))
+        try:
+            result = await work
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled():
+                # Lost the lease; whoever holds it now owns the outcome
+                self.stats['lost'] += 1
+                logger.warning("Lost the lease on job %s", job_id)
+                return None
+            raise
+        except Exception as e:
+            permanent = isinstance(e, PERMANENT_ERRORS)
+            status = await asyncio.to_thread(
+                self.queue.fail, job_id, self.worker_id, str(e), retry=not permanent, result={'timings': timer.timings()}
+            )
+            if status == 'queued':
+                self.stats['retried'] += 1
+                logger.warning("Job %s attempt %d failed, will retry: %s", job_id, job['attempts'], e)
+            elif status == 'failed':
+                self.stats['failed'] += 1
+                self.pipeline.record('failed', timer)
+                logger.error("Job %s failed: %s", job_id, e)
+            return status
+        finally:
+            heartbeat.cancel()
+
+        if not await asyncio.to_thread(self.queue.complete, job_id, self.worker_id, result):
+            self.stats['lost'] += 1
+            return None
+        self.stats['completed'] += 1
+        self.pipeline.record('completed', timer)
+        return 'completed'
+
+    async def _run_claimed(self, job: Dict) -> None:
+        try:
+            await self.run_job(job)
+        except asyncio.CancelledError:
+            if await asyncio.to_thread(self.queue.release, job['job_id'], self.worker_id):
+                self.stats['released'] += 1
+            raise
+        except Exception:
+            logger.exception("Unexpected error running job %s", job['job_id'])
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Claim and run jobs until stop is set, then drain."""
+        while not stop.is_set():
+            if len(self._running) >= self.concurrency:
+                stopping = asyncio.ensure_future(stop.wait())
+                await asyncio.wait({*self._running, stopping}, return_when=asyncio.FIRST_COMPLETED)
+                stopping.cancel()
+                continue
+            job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+            if job is None:
+                try:
+                    await asyncio.wait_for(stop.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.stats['claimed'] += 1
+            task = asyncio.ensure_future(self._run_claimed(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+        await self.drain()
+
+    async def drain(self) -> None:
+        """Give running jobs drain_timeout seconds, then cancel and release the rest."""
+        if not self._running:
+            return
+        _, pending = await asyncio.wait(self._running, timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def build_worker(queue: JobQueue, concurrency: int, poll_interval: float, drain_timeout: float) -> Worker:
+    """Build a worker with its own text processor, AI handler and content store."""
+    from .utils.ai_handler import AIHandler
+    from .utils.content_store import create_content_store
+    from .utils.improvement import SectionImprover
+    from .utils.text_processor import TextProcessor
+
+    text_processor = TextProcessor()
+    ai_handler = AIHandler()
+    section_improver = SectionImprover(ai_handler, text_processor, max_retries=ai_handler.scheduler.max_retries)
+    pipeline = ScriptPipeline(text_processor, ai_handler, section_improver, create_content_store())
+    return Worker(queue, pipeline, concurrency, poll_interval, drain_timeout)
+
+
+async def _serve(concurrency: int, poll_interval: float, drain_timeout: float) -> None:
+    queue = create_job_queue()
+    worker = build_worker(queue, concurrency, poll_interval, drain_timeout)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    logger.info("Worker %s started with concurrency %d", worker.worker_id, worker.concurrency)
+    try:
+        await worker.run(stop)
+    finally:
+        worker.pipeline.text_processor.close()
+        await worker.pipeline.ai_handler.aclose()
+        queue.close()
+        logger.info("Worker %s stopped: %s", worker.worker_id, worker.stats)
+
+
+def _run_process(concurrency: int, poll_interval: float, drain_timeout: float) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    asyncio.run(_serve(concurrency, poll_interval, drain_timeout))
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=int(os.getenv("JOB_WORKER_PROCESSES", "1")),
+                        help="worker processes to start (default: JOB_WORKER_PROCESSES or 1)")
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv("JOB_WORKER_CONCURRENCY", "4")),
+                        help="jobs each process runs at once (default: JOB_WORKER_CONCURRENCY or 4)")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="seconds between polls of an empty queue")
+    parser.add_argument('--drain-timeout', type=float, default=30.0,
+                        help="seconds running jobs get to finish on shutdown before they are handed back")
+    args = parser.parse_args(argv)
+
+    if not os.getenv("JOB_QUEUE_PATH"):
+        print("JOB_QUEUE_PATH must point at the job queue database shared with the API", file=sys.stderr)
+        return 2
+
+    if args.processes <= 1:
+        _run_process(args.concurrency, args.poll_interval, args.drain_timeout)
+        return 0
+
+    processes = [
+        multiprocessing.Process(
+            target=_run_process, args=(args.concurrency, args.poll_interval, args.drain_timeout), daemon=False
+        )
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # Children get SIGINT from the terminal themselves; forward SIGTERM
+    signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in processes])
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
+    return max(process.exitcode or 0 for process in processes)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""Offline benchmarks for the generation and validation pipeline.
+
+Run ``python -m benchmarks.run --help`` for options.
+"""
@@ -0,0 +1,86 @@
+import random
+from typing import List, Optional, Sequence, Tuple
+
+# Mixed-length words so readability scores land in a realistic range
+_WORDS = (
+    "the a of and to in is was it that for on as with by at from this his her they we you "
+    "light star cell ocean city river engine letter market island winter garden signal "
+    "history science language memory energy journey evidence pattern question discovery "
+    "experiment population civilization architecture revolutionary observatory "
+    "mathematician extraordinary communication understanding interpretation "
+    "however therefore meanwhile moreover suddenly eventually quietly carefully "
+    "built found asked changed measured traveled wrote learned carried argued"
+).split()
+_NAMES = ["Ada Lovelace", "Galileo", "Marie Curie", "Alexandria", "Babbage", "Kepler", "Hypatia"]
+
+# Distinct paragraphs generated per seed; larger corpora sample from this pool
+POOL_SIZE = 2000
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 24))]
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), rng.choice(_NAMES))
+    sentence = " ".join(words)
+    return sentence[0].upper() + sentence[1:] + rng.choice("....?!")
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng) for _ in range(rng.randint(2, 6)))
+
+
+def paragraph_pool(seed: int = 0, size: int = POOL_SIZE) -> List[str]:
+    rng = random.Random(seed)
+    return [_paragraph(rng) for _ in range(size)]
+
+
+def synthetic_text(size_bytes: int, seed: int = 0) -> str:
+    """Source-like prose of about size_bytes UTF-8 bytes, deterministic for a seed."""
+    pool = paragraph_pool(seed)
+    rng = random.Random(seed + 1)
+    paragraphs, total = [], 0
+    while total < size_bytes:
+        paragraph = rng.choice(pool)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:size_bytes]
+
+
+def _words(rng: random.Random, count: int) -> str:
+    sentences = []
+    while count > 0:
+        sentence = _sentence(rng)
+        words = sentence.split()[:count]
+        sentences.append(" ".join(words))
+        count -= len(words)
+    return " ".join(sentences)
+
+
+def synthetic_script(
+    words: int,
+    sections: Optional[Sequence[Tuple[str, Tuple[int, int]]]] = None,
+    seed: int = 0
+) -> str:
+    """A script of about ``words`` words in short paragraphs.
+
+    With template sections, each gets a header line and a share of the words in
+    proportion to the midpoint of its length range.
+    """
+    rng = random.Random(seed)
+
+    def body(count: int) -> str:
+        paragraphs = []
+        while count > 0:
+            size = min(count, rng.randint(30, 80))
+            paragraphs.append(_words(rng, size))
+            count -= size
+        return "\n\n".join(paragraphs)
+
+    if not sections:
+        return body(words)
+    weights = [(low + high) / 2 for _, (low, high) in sections]
+    total = sum(weights)
+    return "\n\n".join(
+        f"{name}\n{body(max(1, round(words * weight / total)))}"
+        for (name, _), weight in zip(sections, weights)
+    )
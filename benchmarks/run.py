@@ -0,0 +1,160 @@
+"""Run the offline benchmarks and compare them with a baseline.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --quick --baseline results.json --threshold 0.2
+
+The exit status is 1 when any result is worse than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Optional, Dict, List
+
+from app.utils.export import EXPORT_FORMATS
+
+from .suites import (
+    KB, MB, bench_chunking, bench_validation, bench_compliance, bench_export, bench_fidelity, bench_api,
+    result_key
+)
+
+SUITES = ('chunking', 'validation', 'compliance', 'export', 'fidelity', 'api')
+
+# Input sizes per suite: (quick, full)
+SIZES = {
+    'chunking': ([1 * KB, 64 * KB, 1 * MB], [1 * KB, 64 * KB, 1 * MB, 10 * MB, 50 * MB]),
+    'validation': ([500, 2000, 10000], [500, 2000, 10000, 50000]),
+    'compliance_sections': ([3, 10, 50], [3, 10, 50, 200]),
+    'compliance_words': ([1000, 10000], [1000, 10000, 100000]),
+    'export': ([1000, 10000], [1000, 10000, 100000]),
+    'fidelity': ([64 * KB, 1 * MB], [64 * KB, 1 * MB, 10 * MB]),
+    'api_requests': ([8], [64])
+}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suites(suites: List[str], quick: bool = False, api_concurrency: int = 8, api_latency: float = 0.05) -> Dict:
+    """Run the selected suites and return the results with details of the machine they ran on."""
+    from app.utils.text_processor import TextProcessor
+
+    size = 0 if quick else 1
+    processor = TextProcessor()
+    results = []
+    started = time.time()
+    try:
+        if 'chunking' in suites:
+            results += bench_chunking(processor, SIZES['chunking'][size])
+        if 'validation' in suites:
+            results += bench_validation(processor, SIZES['validation'][size])
+        if 'compliance' in suites:
+            results += bench_compliance(SIZES['compliance_sections'][size], SIZES['compliance_words'][size])
+        if 'export' in suites:
+            results += bench_export(processor, list(EXPORT_FORMATS), SIZES['export'][size])
+        if 'fidelity' in suites:
+            results += bench_fidelity(processor, SIZES['fidelity'][size])
+        if 'api' in suites:
+            for requests in SIZES['api_requests'][size]:
+                results += bench_api(requests, concurrency=api_concurrency, latency_mean=api_latency)
+    finally:
+        processor.close()
+
+    return {
+        'meta': {
+            'started_at': started,
+            'duration': time.time() - started,
+            'quick': quick,
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.15) -> List[Dict]:
+    """Match results to the baseline and flag changes beyond the relative threshold.
+
+    ``change`` is the relative change in the value; whether that is a regression depends
+    on the metric's direction. Results missing from either run are skipped.
+    """
+    previous = {result_key(entry): entry for entry in baseline.get('results', [])}
+    comparisons = []
+    for entry in current.get('results', []):
+        key = result_key(entry)
+        before = previous.get(key)
+        if before is None or not before['value']:
+            continue
+        change = (entry['value'] - before['value']) / before['value']
+        worse = -change if entry['higher_is_better'] else change
+        comparisons.append({
+            'key': key,
+            'baseline': before['value'],
+            'current': entry['value'],
+            'change': change,
+            'status': 'regression' if worse > threshold else ('improvement' if worse < -threshold else 'unchanged')
+        })
+    return comparisons
+
+
+def _report(results: List[Dict], comparisons: Optional[List[Dict]]) -> str:
+    changes = {comparison['key']: comparison for comparison in comparisons or []}
+    lines = []
+    for entry in results:
+        key = result_key(entry)
+        line = f"{key:<80} {entry['value']:>12.6g}"
+        if key in changes:
+            comparison = changes[key]
+            line += f"  {comparison['change']:+7.1%}"
+            if comparison['status'] != 'unchanged':
+                line += f"  {comparison['status']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suite', action='append', choices=SUITES,
+                        help="suite to run (repeatable; default: all)")
+    parser.add_argument('--quick', action='store_true', help="smaller inputs, for a fast check")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--baseline', help="results JSON from an earlier run to compare with")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="relative change that counts as a regression (default: 0.15)")
+    parser.add_argument('--api-concurrency', type=int, default=8, help="concurrent generate-script requests")
+    parser.add_argument('--api-latency', type=float, default=0.05,
+                        help="mean fake backend time to first token, in seconds")
+    args = parser.parse_args(argv)
+
+    report = run_suites(args.suite or list(SUITES), args.quick, args.api_concurrency, args.api_latency)
+    comparisons = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            comparisons = compare(report, json.load(f), args.threshold)
+        report['comparison'] = {'baseline': args.baseline, 'threshold': args.threshold, 'results': comparisons}
+
+    print(_report(report['results'], comparisons))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    regressions = [comparison for comparison in comparisons or [] if comparison['status'] == 'regression']
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+import asyncio
+import gc
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Callable, Iterator
+
+from app.utils.compliance import CompiledTemplate
+from app.utils.text_analysis import ParagraphCache, paragraph_spans
+from app.utils.text_processor import TextProcessor
+
+from .corpus import synthetic_text, synthetic_script
+
+KB = 1024
+MB = 1024 * KB
+
+
+def summarize(samples: List[float]) -> Dict:
+    """Count, mean and percentiles of timing samples, in seconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'n': 0}
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    return {
+        'n': len(ordered),
+        'min': ordered[0],
+        'mean': sum(ordered) / len(ordered),
+        'p50': percentile(0.5),
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+        'max': ordered[-1]
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, warmup: int = 1, setup: Optional[Callable] = None) -> Dict:
+    """Time fn ``repeat`` times after ``warmup`` untimed calls; setup runs untimed before each call."""
+    samples = []
+    for i in range(warmup + repeat):
+        if setup:
+            setup()
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        if i >= warmup:
+            samples.append(elapsed)
+    return summarize(samples)
+
+
+def result(
+    suite: str,
+    name: str,
+    metric: str,
+    value: float,
+    params: Optional[Dict] = None,
+    higher_is_better: bool = False,
+    stats: Optional[Dict] = None
+) -> Dict:
+    """One measured value; results are compared with a baseline by suite, name, params and metric."""
+    return {
+        'suite': suite,
+        'name': name,
+        'params': params or {},
+        'metric': metric,
+        'value': value,
+        'higher_is_better': higher_is_better,
+        'stats': stats or {}
+    }
+
+
+def result_key(entry: Dict) -> str:
+    params = ",".join(f"{key}={value}" for key, value in sorted(entry['params'].items()))
+    return f"{entry['suite']}/{entry['name']}[{params}]/{entry['metric']}"
+
+
+def _repeats(size: int, small: int = 5) -> int:
+    """Fewer repetitions for inputs that take seconds each."""
+    return small if size <= MB else 1
+
+
+def bench_chunking(processor: TextProcessor, sizes: List[int]) -> List[Dict]:
+    """chunk_text throughput on synthetic corpora of the given byte sizes."""
+    results = []
+    for size in sizes:
+        text = synthetic_text(size)
+        chunks = processor.chunk_text(text)
+        stats = measure(lambda: processor.chunk_text(text), repeat=_repeats(size), warmup=0)
+        params = {'bytes': size}
+        results.append(result('chunking', 'chunk_text', 'seconds', stats['p50'], params, stats=stats))
+        results.append(result(
+            'chunking', 'chunk_text', 'mb_per_second', size / MB / stats['p50'], params,
+            higher_is_better=True, stats={'chunks': len(chunks)}
+        ))
+    return results
+
+
+def _one_paragraph_edits(processor: TextProcessor, script: str, template_name: str) -> Callable[[], object]:
+    """A call that re-validates the script after a new sentence is added to its middle paragraph."""
+    document_id, _, _ = processor.validate_incremental(script=script, template_name=template_name)
+    spans = paragraph_spans(script)
+    insert_at = spans[len(spans) // 2][0]
+    edits = iter(range(1, 1 << 30))
+
+    def edit():
+        return processor.validate_incremental(
+            document_id, edits=[(insert_at, insert_at, f"Edit number {next(edits)} lands here. ")],
+            template_name=template_name
+        )
+    return edit
+
+
+def bench_validation(processor: TextProcessor, word_counts: List[int], template_name: str = 'documentary') -> List[Dict]:
+    """validate_script latency per metric, on an analysis shared the way _validate shares it.
+
+    ``validate_incremental`` times the editing loop: one paragraph changes per call.
+    """
+    template = processor.compiled_templates[template_name]
+    results = []
+    for words in word_counts:
+        script = synthetic_script(words, template.sections)
+        params = {'words': words}
+        repeat = 5 if words <= 10000 else 2
+
+        def reset_cache():
+            processor.paragraph_cache = ParagraphCache()
+
+        analysis = processor.analyze(script)
+        timings = {
+            'analyze_cold': measure(lambda: processor.analyze(script), repeat, setup=reset_cache),
+            'analyze_warm': measure(lambda: processor.analyze(script), repeat),
+            'readability': measure(lambda: processor._check_readability(analysis), repeat),
+            'structure': measure(lambda: processor._check_structure(analysis), repeat),
+            'engagement': measure(lambda: processor._check_engagement(analysis), repeat),
+            'template_compliance': measure(lambda: processor._check_template_compliance(script, template), repeat),
+            'pacing': measure(
+                lambda: processor.pacing.timeline(analysis, template.segment(script), sentences=False), repeat
+            ),
+            'coherence': measure(lambda: processor.coherence.check(analysis, template.segment(script)), repeat),
+            'validate_script': measure(
+                lambda: processor.validate_script(script, template_name), repeat, setup=reset_cache
+            ),
+            'validate_incremental': measure(_one_paragraph_edits(processor, script, template_name), repeat)
+        }
+        for name, stats in timings.items():
+            results.append(result('validation', name, 'seconds', stats['p50'], params, stats=stats))
+    return results
+
+
+def _synthetic_template(sections: int) -> CompiledTemplate:
+    return CompiledTemplate(f'bench_{sections}', {
+        'structure': [
+            {'section': f"Part {i + 1} Overview", 'length_range': [50, 500]} for i in range(sections)
+        ]
+    })
+
+
+def bench_compliance(section_counts: List[int], word_counts: List[int]) -> List[Dict]:
+    """Template compliance cost as the number of sections and the script length grow."""
+    results = []
+    for sections in section_counts:
+        template = _synthetic_template(sections)
+        for words in word_counts:
+            script = synthetic_script(words, template.sections)
+            stats = measure(lambda: template.check(script), repeat=5 if words <= 10000 else 2)
+            results.append(result(
+                'compliance', 'check', 'seconds', stats['p50'],
+                {'sections': sections, 'words': words}, stats=stats
+            ))
+    return results
+
+
+def bench_export(processor: TextProcessor, formats: List[str], word_counts: List[int]) -> List[Dict]:
+    """Time to stream a whole export, per format and script length."""
+    results = []
+    for words in word_counts:
+        script = synthetic_script(words)
+        for format_type in formats:
+            stats = measure(lambda: sum(len(chunk) for chunk in processor.exporter.stream(script, format_type)))
+            results.append(result(
+                'export', format_type, 'seconds', stats['p50'], {'words': words}, stats=stats
+            ))
+    return results
+
+
+def bench_fidelity(processor: TextProcessor, sizes: List[int], queries: int = 50) -> List[Dict]:
+    """Fidelity index build time and per-paragraph query latency as the source grows."""
+    from app.utils.fidelity import FidelityIndex
+
+    results = []
+    for size in sizes:
+        chunks = processor.chunk_text(synthetic_text(size))
+        params = {'bytes': size}
+        build = measure(lambda: FidelityIndex(chunks, processor.fidelity_config), repeat=_repeats(size, 3), warmup=0)
+        results.append(result('fidelity', 'build', 'seconds', build['p50'], params, stats=build))
+
+        index = FidelityIndex(chunks, processor.fidelity_config)
+        paragraphs = [synthetic_text(600, seed=seed) for seed in range(queries)]
+        query = measure(lambda: [index.query(paragraph) for paragraph in paragraphs])
+        results.append(result(
+            'fidelity', 'query', 'seconds', query['p50'] / queries, params,
+            stats=dict(index.stats(), queries=queries)
+        ))
+    return results
+
+
+@contextmanager
+def _fake_llm(handler, backend) -> Iterator[None]:
+    """Point the app's AIHandler at an offline backend with no rate limits or response cache."""
+    from app.utils.cache import ResponseCache
+    from app.utils.scheduler import LLMScheduler
+
+    saved = handler.backend, handler.scheduler, handler.cache
+    handler.backend = backend
+    handler.scheduler = LLMScheduler(
+        requests_per_minute=1e9, tokens_per_minute=1e12,
+        max_concurrency=handler.scheduler.max_concurrency, max_retries=0
+    )
+    handler.cache = ResponseCache(max_entries=0)
+    try:
+        yield
+    finally:
+        handler.backend, handler.scheduler, handler.cache = saved
+
+
+async def _generate_requests(
+    requests: int,
+    concurrency: int,
+    content_bytes: int,
+    template_name: Optional[str],
+    poll_interval: float
+) -> Dict:
+    import httpx
+    from app.api import main
+
+    async def one(client: "httpx.AsyncClient", seed: int) -> float:
+        payload = {'content': synthetic_text(content_bytes, seed=seed), 'template_name': template_name}
+        started = time.perf_counter()
+        response = await client.post('/api/generate-script', json=payload)
+        response.raise_for_status()
+        task_id = response.json()['task_id']
+        while True:
+            status = (await client.get(f'/api/script-status/{task_id}')).json()
+            if status['status'] != 'processing':
+                break
+            await asyncio.sleep(poll_interval)
+        if status['status'] != 'completed':
+            raise RuntimeError(f"Generation failed: {status.get('error')}")
+        return time.perf_counter() - started
+
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        # One untimed request starts the executors
+        await one(client, seed=-1)
+
+        async def limited(seed: int) -> float:
+            async with semaphore:
+                return await one(client, seed)
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(limited(seed) for seed in range(requests)))
+        elapsed = time.perf_counter() - started
+    return {'latencies': list(latencies), 'elapsed': elapsed}
+
+
+def bench_api(
+    requests: int = 32,
+    concurrency: int = 8,
+    content_bytes: int = 16 * KB,
+    template_name: Optional[str] = 'documentary',
+    latency_mean: float = 0.05,
+    tokens_per_second: float = 2000.0,
+    poll_interval: float = 0.01
+) -> List[Dict]:
+    """End-to-end /api/generate-script throughput and latency against the fake backend.
+
+    Each request submits distinct content and polls script-status until it finishes, so
+    latency covers chunking, drafting, combining, validation and section fixes.
+    """
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    from app.api import main
+    from app.utils.llm_backends import FakeBackend
+
+    backend = FakeBackend(latency='lognormal', latency_mean=latency_mean, tokens_per_second=tokens_per_second)
+    with _fake_llm(main.ai_handler, backend):
+        run = asyncio.run(_generate_requests(requests, concurrency, content_bytes, template_name, poll_interval))
+    calls = backend.calls
+
+    stats = summarize(run['latencies'])
+    params = {
+        'requests': requests, 'concurrency': concurrency, 'content_bytes': content_bytes,
+        'latency_mean': latency_mean
+    }
+    return [
+        result('api', 'generate_script', 'requests_per_second', requests / run['elapsed'], params,
+               higher_is_better=True, stats={'llm_calls': calls, 'elapsed': run['elapsed']}),
+        result('api', 'generate_script', 'latency_p50', stats['p50'], params, stats=stats),
+        result('api', 'generate_script', 'latency_p95', stats['p95'], params, stats=stats),
+        result('api', 'generate_script', 'latency_p99', stats['p99'], params, stats=stats)
+    ]
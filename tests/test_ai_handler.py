@@ -1,6 +1,9 @@
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
-from app.utils.ai_handler import AIHandler
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.utils.ai_handler import AIHandler, SCRIPT_MAX_TOKENS, PROMPT_OVERHEAD_TOKENS
+from app.utils.llm_backends import Completion
+from app.utils.tokenizer import count_tokens
 
 @pytest.fixture
 def ai_handler():
@@ -40,10 +43,7 @@ def sample_validation_results():
 
 @pytest.mark.asyncio
 async def test_generate_script_basic(ai_handler, sample_content):
-    with patch('openai.ChatCompletion.acreate') as mock_create:
-        mock_create.return_value = MagicMock(
-            choices=[MagicMock(message=MagicMock(content="Generated script content"))]
-        )
+    with patch.object(ai_handler.backend, 'complete', new=AsyncMock(return_value=Completion("Generated script content"))) as mock_create:
         
         script = await ai_handler.generate_script(
             content=sample_content
@@ -55,10 +55,7 @@ async def test_generate_script_basic(ai_handler, sample_content):
 
 @pytest.mark.asyncio
 async def test_generate_script_with_template(ai_handler, sample_content):
-    with patch('openai.ChatCompletion.acreate') as mock_create:
-        mock_create.return_value = MagicMock(
-            choices=[MagicMock(message=MagicMock(content="Generated script with template"))]
-        )
+    with patch.object(ai_handler.backend, 'complete', new=AsyncMock(return_value=Completion("Generated script with template"))) as mock_create:
         
         script = await ai_handler.generate_script(
             content=sample_content,
@@ -73,10 +70,7 @@ async def test_generate_script_with_template(ai_handler, sample_content):
 
 @pytest.mark.asyncio
 async def test_generate_script_with_context(ai_handler, sample_content):
-    with patch('openai.ChatCompletion.acreate') as mock_create:
-        mock_create.return_value = MagicMock(
-            choices=[MagicMock(message=MagicMock(content="Generated script with context"))]
-        )
+    with patch.object(ai_handler.backend, 'complete', new=AsyncMock(return_value=Completion("Generated script with context"))) as mock_create:
         
         script = await ai_handler.generate_script(
             content=sample_content,
@@ -95,10 +89,7 @@ async def test_generate_script_with_context(ai_handler, sample_content):
 async def test_improve_script(ai_handler, sample_validation_results):
     original_script = "Original script content that needs improvement"
     
-    with patch('openai.ChatCompletion.acreate') as mock_create:
-        mock_create.return_value = MagicMock(
-            choices=[MagicMock(message=MagicMock(content="Improved script content"))]
-        )
+    with patch.object(ai_handler.backend, 'complete', new=AsyncMock(return_value=Completion("Improved script content"))) as mock_create:
         
         improved_script = await ai_handler.improve_script(
             original_script,
@@ -118,8 +109,7 @@ async def test_improve_script(ai_handler, sample_validation_results):
 
 @pytest.mark.asyncio
 async def test_error_handling(ai_handler, sample_content):
-    with patch('openai.ChatCompletion.acreate') as mock_create:
-        mock_create.side_effect = Exception("API Error")
+    with patch.object(ai_handler.backend, 'complete', new=AsyncMock(side_effect=Exception("API Error"))):
         
         with pytest.raises(Exception):
             await ai_handler.generate_script(content=sample_content)
@@ -128,3 +118,170 @@ def test_initialization():
     handler = AIHandler()
     assert handler is not None
     # Add more specific initialization tests based on your implementation
+
+@pytest.mark.asyncio
+async def test_generate_script_from_chunks_map_reduce(ai_handler):
+    chunks = [f"Source chunk {i}" for i in range(6)]
+    in_flight = 0
+    peak = 0
+    calls = []
+
+    async def fake_complete(system_message, user_message, max_tokens=2000, priority=0, kind='script'):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        calls.append(user_message)
+        return f"draft {len(calls)}"
+
+    with patch.object(ai_handler, '_complete', side_effect=fake_complete):
+        script = await ai_handler.generate_script_from_chunks(
+            chunks,
+            template_sections=["Introduction", "Main Content", "Conclusion"],
+            max_concurrency=2
+        )
+
+    # One map call per chunk plus a single reduce call
+    assert len(calls) == len(chunks) + 1
+    assert peak == 2
+    assert script == f"draft {len(chunks) + 1}"
+    reduce_prompt = calls[-1]
+    assert "Introduction, Main Content, Conclusion" in reduce_prompt
+    assert reduce_prompt.index("[Draft 1]") < reduce_prompt.index("[Draft 6]")
+
+@pytest.mark.asyncio
+async def test_generate_script_from_single_chunk(ai_handler, sample_content):
+    with patch.object(ai_handler, '_complete', return_value="Single pass script") as mock_complete:
+        script = await ai_handler.generate_script_from_chunks([sample_content])
+
+    assert script == "Single pass script"
+    mock_complete.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_stream_script_yields_tokens_and_caches(ai_handler, sample_content):
+    async def fake_stream():
+        for token in ["Hello", " world"]:
+            yield token
+
+    async def fake_open_stream(**kwargs):
+        return fake_stream()
+
+    with patch.object(ai_handler.backend, 'open_stream', new=AsyncMock(side_effect=fake_open_stream)) as mock_open:
+        tokens = [token async for token in ai_handler.stream_script([sample_content])]
+        # A repeat request is served from the cache in one piece
+        repeat = [token async for token in ai_handler.stream_script([sample_content])]
+
+    assert tokens == ["Hello", " world"]
+    assert repeat == ["Hello world"]
+    assert mock_open.call_count == 1
+
+SUMMARY = "word " * 30
+
+@pytest.mark.asyncio
+async def test_summarize_tree_merges_until_budget(ai_handler):
+    chunks = [f"Source chunk {i}" for i in range(8)]
+    budget = 3 * count_tokens(SUMMARY) + 1
+    prompts = []
+
+    async def fake_complete(system_message, user_message, max_tokens=2000, priority=0, kind='script'):
+        prompts.append(user_message)
+        return SUMMARY
+
+    with patch.object(ai_handler, '_complete', side_effect=fake_complete):
+        levels = await ai_handler.summarize_tree(chunks, budget=budget, merge_budget=budget)
+
+    assert [len(level) for level in levels] == [8, 3]
+    merges = [p for p in prompts if "Consecutive segments" in p]
+    assert len(merges) == 3
+    assert merges[0].count("[Segment") == 3
+
+@pytest.mark.asyncio
+async def test_tree_nodes_do_not_depend_on_template(ai_handler):
+    chunks = [f"Source chunk {i}" for i in range(8)]
+    ai_handler.context_tokens = SCRIPT_MAX_TOKENS + PROMPT_OVERHEAD_TOKENS + 3 * count_tokens(SUMMARY)
+    runs = []
+
+    async def fake_complete(system_message, user_message, max_tokens=2000, priority=0, kind='script'):
+        runs[-1].append(user_message)
+        return SUMMARY
+
+    with patch.object(ai_handler, '_complete', side_effect=fake_complete):
+        for template in ("documentary", "educational"):
+            runs.append([])
+            await ai_handler.generate_script_from_chunks(chunks, template_name=template)
+
+    # Every node prompt (and so its cache key) repeats; only the final combine differs
+    assert sorted(runs[0][:-1]) == sorted(runs[1][:-1])
+    assert runs[0][-1] != runs[1][-1]
+    assert "[Segment 8]" in runs[0][-2]
+    assert "[Draft 1]" in runs[0][-1] and "[Draft 2]" not in runs[0][-1]
+
+@pytest.mark.asyncio
+async def test_summarize_tree_rejects_oversized_drafts(ai_handler):
+    async def fake_complete(system_message, user_message, max_tokens=2000, priority=0, kind='script'):
+        return SUMMARY
+
+    with patch.object(ai_handler, '_complete', side_effect=fake_complete):
+        with pytest.raises(Exception, match="too large"):
+            await ai_handler.summarize_tree(["a", "b"], budget=10, merge_budget=10)
+
+@pytest.mark.asyncio
+async def test_improve_script_sends_compact_feedback(ai_handler, sample_validation_results):
+    with patch.object(ai_handler, '_complete', return_value="Improved") as mock_complete:
+        await ai_handler.improve_script("Original script", sample_validation_results)
+
+    system_message, user_message = mock_complete.call_args[0][:2]
+    assert system_message.startswith("You are a World-Class Narrative Scriptwriter")
+    assert "Introduction 50 (60-100)!" in user_message
+    assert "{" not in user_message
+    assert mock_complete.call_args[1]['kind'] == 'improve'
+
+@pytest.mark.asyncio
+async def test_complete_records_token_usage(ai_handler):
+    async def fake_submit(call, model, tokens=0, priority=0):
+        return Completion("Reply", (321, 12, 256))
+
+    with patch.object(ai_handler.scheduler, 'submit', side_effect=fake_submit):
+        await ai_handler._complete("System", "Usage test", kind='draft')
+        await ai_handler._complete("System", "Usage test", kind='draft')
+
+    stats = ai_handler.usage.stats()
+    assert stats['totals']['draft']['calls'] == 2
+    assert stats['totals']['draft']['response_cache_hits'] == 1
+    assert stats['recent'][-2]['prompt_tokens'] == 321
+    assert stats['recent'][-2]['cached_prompt_tokens'] == 256
+    assert stats['recent'][-2]['estimated'] is False
+
+@pytest.mark.asyncio
+async def test_complete_records_llm_metrics(ai_handler):
+    from app.utils.ai_handler import LLM_REQUEST_SECONDS, LLM_REQUESTS, LLM_TOKENS
+
+    calls = LLM_REQUEST_SECONDS.count(kind='merge')
+    ok = LLM_REQUESTS.value(kind='merge', outcome='ok')
+    cached = LLM_REQUESTS.value(kind='merge', outcome='cached')
+    completion_tokens = LLM_TOKENS.value(kind='merge', type='completion')
+
+    with patch.object(ai_handler.backend, 'complete', new=AsyncMock(return_value=Completion("Reply", (100, 7, 0)))):
+        await ai_handler._complete("System", "Metrics test", kind='merge')
+        await ai_handler._complete("System", "Metrics test", kind='merge')
+
+    assert LLM_REQUEST_SECONDS.count(kind='merge') == calls + 1
+    assert LLM_REQUESTS.value(kind='merge', outcome='ok') == ok + 1
+    assert LLM_REQUESTS.value(kind='merge', outcome='cached') == cached + 1
+    assert LLM_TOKENS.value(kind='merge', type='completion') == completion_tokens + 7
+
+@pytest.mark.asyncio
+async def test_improve_section_sends_only_the_section(ai_handler):
+    with patch.object(ai_handler, '_complete', return_value="Longer conclusion") as mock_complete:
+        result = await ai_handler.improve_section(
+            "Conclusion", "Too short.", (30, 60), 2, before="...end of the main part."
+        )
+
+    assert result == "Longer conclusion"
+    user_message = mock_complete.call_args[0][1]
+    assert "Section: Conclusion" in user_message
+    assert "Target length: 30-60 words, about 45." in user_message
+    assert "Too short." in user_message
+    assert mock_complete.call_args[1]['max_tokens'] == 170
+    assert mock_complete.call_args[1]['kind'] == 'section'
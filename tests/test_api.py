@@ -1,6 +1,8 @@
+import json
 import pytest
+from unittest.mock import patch
 from fastapi.testclient import TestClient
-from app.api.main import app
+from app.api.main import app, ai_handler
 
 @pytest.fixture
 def client():
@@ -41,6 +43,147 @@ def test_generate_script(client, sample_content):
     assert "task_id" in data
     assert data["status"] == "processing"
 
+def test_generate_script_stream(client, sample_content):
+    async def fake_stream(chunks, **kwargs):
+        for token in ["The ", "Rise ", "of AI."]:
+            yield token
+
+    with patch.object(ai_handler, "stream_script", side_effect=fake_stream):
+        response = client.post(
+            "/api/generate-script/stream",
+            json={"content": sample_content, "template_name": "documentary"}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in response.text.strip().split("\n\n")
+    ]
+    names = [name for name, _ in events]
+    assert names == ["token", "token", "token", "validation", "done"]
+    assert "".join(data["text"] for name, data in events if name == "token") == "The Rise of AI."
+    final = events[3][1]
+    assert final["script"] == "The Rise of AI."
+    assert "readability" in final["validation"]
+
+def test_script_status_reports_stage_timings(client, sample_content):
+    async def fake_generate(chunks, **kwargs):
+        return "The Rise of AI. What comes next?"
+
+    with patch.object(ai_handler, "generate_script_from_chunks", side_effect=fake_generate):
+        task_id = client.post("/api/generate-script", json={"content": sample_content}).json()["task_id"]
+
+    data = client.get(f"/api/script-status/{task_id}").json()
+    assert data["status"] == "completed"
+    assert list(data["timings"]) == ["chunking", "generation", "validation", "fidelity", "total"]
+    assert data["timings"]["total"] >= data["timings"]["validation"] >= 0
+    assert data["fidelity"]["chunks"] >= 1
+
+def test_metrics(client, sample_content):
+    async def fake_generate(chunks, **kwargs):
+        return "The Rise of AI."
+
+    with patch.object(ai_handler, "generate_script_from_chunks", side_effect=fake_generate):
+        client.post("/api/generate-script", json={"content": sample_content})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert "# TYPE script_stage_duration_seconds histogram" in text
+    assert 'script_stage_duration_seconds_count{stage="generation"}' in text
+    assert 'script_tasks_total{status="completed"}' in text
+    assert "script_tasks_in_progress 0" in text
+    assert 'llm_cache_lookups_total{result="hit"}' in text
+    assert 'executor_queue_depth{executor="validation"}' in text
+
+def test_generate_script_with_job_queue(client, sample_content, tmp_path):
+    from app.api import main
+    from app.utils.job_queue import JobQueue
+
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    with patch.object(main, "job_queue", queue):
+        response = client.post(
+            "/api/generate-script", json={"content": sample_content, "template_name": "documentary"}
+        )
+        assert response.status_code == 200
+        assert response.json()["status"] == "queued"
+        task_id = response.json()["task_id"]
+        assert client.get(f"/api/script-status/{task_id}").json()["status"] == "queued"
+        assert "job_queue_ready 1" in client.get("/metrics").text
+
+        # A worker picks the job up and stores its result in the queue
+        job = queue.claim("worker-1")
+        assert job["payload"]["template_name"] == "documentary"
+        queue.complete(job["job_id"], "worker-1", {"script": "Queued script", "validation": {}, "timings": {"total": 1.0}})
+
+        data = client.get(f"/api/script-status/{task_id}").json()
+        assert data["status"] == "completed"
+        assert data["script"] == "Queued script"
+        assert data["attempts"] == 1
+
+        assert client.post("/api/generate-script", json={"content_id": "0" * 32}).status_code == 404
+    queue.close()
+
+def test_identical_queued_requests_are_coalesced(client, sample_content, tmp_path):
+    from app.api import main
+    from app.utils.job_queue import JobQueue
+
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    payload = {"content": sample_content, "template_name": "documentary"}
+    with patch.object(main, "job_queue", queue):
+        first = client.post("/api/generate-script", json=payload).json()
+        second = client.post("/api/generate-script", json=payload).json()
+        different = client.post("/api/generate-script", json=dict(payload, highlighted_concept="AI")).json()
+
+        assert second["task_id"] != first["task_id"]
+        assert second["coalesced_with"] == first["task_id"]
+        assert different["coalesced_with"] is None
+
+        job = queue.claim("worker-1")
+        queue.complete(job["job_id"], "worker-1", {"script": "Shared script"})
+        assert client.get(f"/api/script-status/{second['task_id']}").json()["script"] == "Shared script"
+    queue.close()
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_requests_share_one_generation(sample_content):
+    import asyncio
+    import httpx
+    from app.api import main
+
+    calls = 0
+
+    async def fake_generate(chunks, **kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return "One shared script."
+
+    transport = httpx.ASGITransport(app=app)
+    with patch.object(ai_handler, "generate_script_from_chunks", side_effect=fake_generate):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            responses = await asyncio.gather(*(
+                async_client.post("/api/generate-script", json={"content": sample_content}) for _ in range(3)
+            ))
+            task_ids = [response.json()["task_id"] for response in responses]
+            statuses = [(await async_client.get(f"/api/script-status/{task_id}")).json() for task_id in task_ids]
+
+    assert calls == 1
+    assert len(set(task_ids)) == 3
+    assert all(status["status"] == "completed" for status in statuses)
+    assert all(status["script"] == "One shared script." for status in statuses)
+    assert sum(status["coalesced_with"] is not None for status in statuses) == 2
+
+def test_generate_script_failure_outside_the_pipeline(client, sample_content):
+    from app.api import main
+
+    with patch.object(main.single_flight, "do", side_effect=RuntimeError("Leader was cancelled")):
+        task_id = client.post("/api/generate-script", json={"content": sample_content}).json()["task_id"]
+    status = client.get(f"/api/script-status/{task_id}").json()
+    assert status["status"] == "failed"
+    assert status["error"] == "Leader was cancelled"
+
 def test_get_script_status_not_found(client):
     response = client.get("/api/script-status/nonexistent_id")
     assert response.status_code == 404
@@ -79,6 +222,92 @@ def test_validate_script(client):
     assert "readability" in validation
     assert "structure" in validation
     assert "engagement" in validation
+    assert validation["pacing"]["target_duration"] == [180, 420]
+    assert validation["pacing"]["duration"] > 0
+    assert "callbacks" in validation["coherence"]
+
+def test_script_fidelity(client):
+    source = (
+        "Julius Caesar crossed the Rubicon river with a single legion and started a civil war against Pompey.\n\n"
+        "Johannes Gutenberg built a printing press with movable metal type and made books cheaper across Europe."
+    )
+    script = (
+        "Caesar crossed the Rubicon river with a single legion, starting a civil war.\n\n"
+        "In 1969 Neil Armstrong walked on the Moon."
+    )
+    response = client.post("/api/fidelity", json={"script": script, "content": source})
+    assert response.status_code == 200
+    fidelity = response.json()["fidelity"]
+    first, second = fidelity["paragraphs"]
+    assert [match["chunk"] for match in first["matches"]] == [0]
+    assert second["matches"] == [] and second["novelty"] == 1
+    assert second["unsupported_terms"] == ["Neil Armstrong", "Moon", "1969"]
+
+    response = client.post("/api/fidelity", json={"script": script})
+    assert response.status_code == 422
+
+def test_script_pacing(client):
+    script = "Introduction: Hello, world.\n\nMain Content\nA longer stretch of narration. Is it paced?"
+    response = client.post("/api/pacing", json={"script": script, "template_name": "documentary"})
+    assert response.status_code == 200
+    pacing = response.json()["pacing"]
+    assert [section["name"] for section in pacing["sections"]] == ["Introduction", "Main Content"]
+    assert len(pacing["sentences"]) == 3
+    assert pacing["sentences"][-1]["end_time"] == pacing["duration"]
+
+def test_validate_batch(client):
+    scripts = [f"Script number {i}. Is it readable?" for i in range(5)]
+    response = client.post("/api/validate-batch", json={"scripts": scripts, "chunk_size": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(result["index"] for result in results) == [0, 1, 2, 3, 4]
+    assert all(result["validation"]["engagement"]["question_count"] == 1 for result in results)
+
+def test_executor_stats(client):
+    client.post("/api/validate-script", json={"script": "A script. Is it good?"})
+    response = client.get("/api/executor-stats")
+    assert response.status_code == 200
+    executors = response.json()["executors"]
+    assert set(executors) == {"chunking", "validation"}
+    assert executors["validation"]["completed"] >= 1
+    assert "queue_depth" in executors["validation"]
+    assert "wait_seconds_p99" in executors["validation"]
+
+def test_validate_script_incremental(client):
+    script = "First paragraph about AI.\n\nSecond paragraph about robots."
+    response = client.post("/api/validate-script/incremental", json={"script": script})
+    assert response.status_code == 200
+    data = response.json()
+    document_id = data["document_id"]
+    assert data["reanalyzed_paragraphs"] == 2
+
+    response = client.post(
+        "/api/validate-script/incremental",
+        json={"document_id": document_id, "edits": [{"start": 0, "end": 5, "text": "Opening"}]}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["document_id"] == document_id
+    assert data["reanalyzed_paragraphs"] == 1
+    assert data["validation"]["structure"]["paragraph_count"] == 2
+    assert "coherence" not in data["validation"]
+    assert "pacing" not in data["validation"]
+
+    response = client.post(
+        "/api/validate-script/incremental",
+        json={"document_id": document_id, "edits": [], "coherence": True, "pacing": True}
+    )
+    assert response.status_code == 200
+    assert "callbacks" in response.json()["validation"]["coherence"]
+    assert response.json()["validation"]["pacing"]["duration"] > 0
+
+    response = client.post(
+        "/api/validate-script/incremental",
+        json={"document_id": "unknown", "edits": [{"start": 0, "end": 0, "text": "x"}]}
+    )
+    assert response.status_code == 409
 
 def test_export_script(client):
     script = "Test script content for export testing."
@@ -121,6 +350,25 @@ def test_export_script(client):
     assert response.headers["Content-Type"] == "text/markdown"
     assert response.headers["Content-Disposition"] == 'attachment; filename="script.md"'
 
+def test_export_binary_and_caption_formats(client):
+    script = "Introduction: A long script. " + "More words follow here. " * 5000
+    response = client.post(
+        "/api/export-script",
+        json={"script": script, "format": "pdf", "template_name": "documentary", "title": "Long"}
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/pdf"
+    assert response.headers["Content-Disposition"] == 'attachment; filename="script.pdf"'
+    assert response.content.startswith(b"%PDF-") and response.content.endswith(b"%%EOF\n")
+
+    response = client.post("/api/export-script", json={"script": script, "format": "docx"})
+    assert response.status_code == 200
+    assert response.content.startswith(b"PK")
+
+    response = client.post("/api/export-script", json={"script": script, "format": "srt"})
+    assert response.headers["Content-Disposition"] == 'attachment; filename="script.srt"'
+    assert response.text.startswith("1\n00:00:00,000 --> ")
+
 def test_invalid_export_format(client):
     response = client.post(
         "/api/export-script",
@@ -139,7 +387,29 @@ def test_upload_file(client):
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "success"
-    assert data["content"] == content.decode()
+    assert "content" not in data
+    assert data["characters"] == len(content)
+    assert data["preview"] == content.decode()
+
+    response = client.post(
+        "/api/generate-script",
+        json={"content_id": data["content_id"], "template_name": "documentary"}
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "processing"
+
+def test_upload_file_limits(client):
+    from app.api import main
+    with patch.object(main, "UPLOAD_MAX_BYTES", 10):
+        files = {"file": ("big.txt", b"x" * 100, "text/plain")}
+        assert client.post("/api/upload-file", files=files).status_code == 413
+
+    files = {"file": ("slides.pdf", b"%PDF-1.4", "application/pdf")}
+    assert client.post("/api/upload-file", files=files).status_code == 415
+
+def test_generate_script_unknown_content_id(client):
+    response = client.post("/api/generate-script", json={"content_id": "0" * 32})
+    assert response.status_code == 404
 
 def test_upload_file_invalid(client):
     response = client.post("/api/upload-file")
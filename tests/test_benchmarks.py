@@ -0,0 +1,107 @@
+import json
+import pytest
+
+from benchmarks.corpus import synthetic_text, synthetic_script
+from benchmarks.run import compare, main
+from benchmarks.suites import (
+    summarize, result, result_key, bench_chunking, bench_validation, bench_compliance, bench_export, bench_api
+)
+from app.utils.export import EXPORT_FORMATS
+from app.utils.text_processor import TextProcessor
+
+
+@pytest.fixture
+def processor():
+    processor = TextProcessor()
+    yield processor
+    processor.close()
+
+
+def test_synthetic_corpora_are_deterministic():
+    assert synthetic_text(4096) == synthetic_text(4096)
+    assert synthetic_text(4096) != synthetic_text(4096, seed=1)
+    assert len(synthetic_text(4096).encode('utf-8')) == 4096
+
+    sections = [("Introduction", (60, 100)), ("Conclusion", (50, 100))]
+    script = synthetic_script(300, sections)
+    assert script.startswith("Introduction\n")
+    assert "\n\nConclusion\n" in script
+
+
+def test_summarize_percentiles():
+    stats = summarize([float(i) for i in range(1, 101)])
+    assert stats['n'] == 100
+    assert stats['min'] == 1.0 and stats['max'] == 100.0
+    assert stats['p50'] == 51.0
+    assert stats['p99'] == 100.0
+    assert summarize([]) == {'n': 0}
+
+
+def test_compare_respects_metric_direction():
+    baseline = {'results': [
+        result('chunking', 'chunk_text', 'seconds', 1.0, {'bytes': 1024}),
+        result('chunking', 'chunk_text', 'mb_per_second', 10.0, {'bytes': 1024}, higher_is_better=True),
+        result('export', 'txt', 'seconds', 1.0, {'words': 10})
+    ]}
+    current = {'results': [
+        result('chunking', 'chunk_text', 'seconds', 1.5, {'bytes': 1024}),
+        result('chunking', 'chunk_text', 'mb_per_second', 15.0, {'bytes': 1024}, higher_is_better=True),
+        result('export', 'txt', 'seconds', 1.05, {'words': 10}),
+        result('export', 'html', 'seconds', 1.0, {'words': 10})
+    ]}
+
+    comparisons = {c['key']: c for c in compare(current, baseline, threshold=0.1)}
+
+    assert len(comparisons) == 3
+    assert comparisons['chunking/chunk_text[bytes=1024]/seconds']['status'] == 'regression'
+    assert comparisons['chunking/chunk_text[bytes=1024]/mb_per_second']['status'] == 'improvement'
+    assert comparisons['export/txt[words=10]/seconds']['status'] == 'unchanged'
+    assert comparisons['chunking/chunk_text[bytes=1024]/seconds']['change'] == pytest.approx(0.5)
+
+
+def test_offline_suites_produce_results(processor):
+    results = (
+        bench_chunking(processor, [2048])
+        + bench_validation(processor, [300])
+        + bench_compliance([3], [300])
+        + bench_export(processor, ['txt', 'html'], [300])
+    )
+
+    keys = {result_key(entry) for entry in results}
+    assert 'chunking/chunk_text[bytes=2048]/mb_per_second' in keys
+    assert 'validation/template_compliance[words=300]/seconds' in keys
+    assert 'compliance/check[sections=3,words=300]/seconds' in keys
+    assert 'export/html[words=300]/seconds' in keys
+    assert all(entry['value'] > 0 for entry in results)
+
+
+def test_api_benchmark_uses_fake_backend_and_restores_handler():
+    from app.api import main as api
+
+    backend, scheduler = api.ai_handler.backend, api.ai_handler.scheduler
+    results = bench_api(requests=2, concurrency=2, content_bytes=2048, latency_mean=0.0, tokens_per_second=0)
+
+    by_metric = {entry['metric']: entry for entry in results}
+    assert by_metric['requests_per_second']['value'] > 0
+    assert by_metric['requests_per_second']['stats']['llm_calls'] > 0
+    assert by_metric['latency_p50']['stats']['n'] == 2
+    assert api.ai_handler.backend is backend
+    assert api.ai_handler.scheduler is scheduler
+
+
+def test_main_writes_json_and_fails_on_regression(tmp_path, monkeypatch):
+    import benchmarks.run as run
+
+    monkeypatch.setattr(run, 'SIZES', {**run.SIZES, 'export': ([100], [100])})
+    output = tmp_path / "results.json"
+    assert main(['--suite', 'export', '--quick', '--output', str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert report['meta']['quick'] is True
+    assert {entry['name'] for entry in report['results']} == set(EXPORT_FORMATS)
+
+    # A baseline ten times faster than anything measurable is a regression
+    for entry in report['results']:
+        entry['value'] /= 10
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report))
+    assert main(['--suite', 'export', '--quick', '--baseline', str(baseline)]) == 1
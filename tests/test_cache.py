@@ -0,0 +1,81 @@
+import pytest
+from unittest.mock import patch
+from app.utils.cache import ResponseCache
+from app.utils.ai_handler import AIHandler
+from app.utils.llm_backends import Completion
+
+@pytest.fixture
+def messages():
+    return [
+        {"role": "system", "content": "You are a script writer."},
+        {"role": "user", "content": "Content to transform"}
+    ]
+
+def test_make_key_is_stable(messages):
+    key = ResponseCache.make_key("gpt-4", {"temperature": 0.7, "max_tokens": 10}, messages)
+    same = ResponseCache.make_key("gpt-4", {"max_tokens": 10, "temperature": 0.7}, list(messages))
+    other = ResponseCache.make_key("gpt-4", {"temperature": 0.2, "max_tokens": 10}, messages)
+
+    assert key == same
+    assert key != other
+
+def test_memory_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "a" is now most recently used
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttl=10)
+    with patch("app.utils.cache.time.time", return_value=1000.0):
+        cache.set("a", "1")
+    with patch("app.utils.cache.time.time", return_value=1005.0):
+        assert cache.get("a") == "1"
+    with patch("app.utils.cache.time.time", return_value=1011.0):
+        assert cache.get("a") is None
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(disk_path=path).set("a", "1")
+
+    cache = ResponseCache(disk_path=path)
+    assert cache.get("a") == "1"
+    assert cache.stats()["disk_hits"] == 1
+    # Promoted into memory on the first disk hit
+    assert cache.get("a") == "1"
+    assert cache.stats()["memory_hits"] == 1
+
+def test_disk_tier_size_eviction(tmp_path):
+    cache = ResponseCache(max_entries=1, disk_path=str(tmp_path / "cache.db"), max_disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+
+    assert cache.stats()["disk_entries"] == 2
+    assert cache.get("a") is None
+    assert cache.get("b") == "B"
+
+@pytest.mark.asyncio
+async def test_ai_handler_repeat_request_hits_cache():
+    handler = AIHandler(cache=ResponseCache())
+    calls = []
+
+    async def fake_complete(**kwargs):
+        calls.append(kwargs)
+        return Completion("Cached script")
+
+    with patch.object(handler.backend, "complete", side_effect=fake_complete):
+        first = await handler.generate_script(content="Same source", template_name="documentary")
+        second = await handler.generate_script(content="Same source", template_name="documentary")
+
+    assert first == second == "Cached script"
+    assert len(calls) == 1
+    assert handler.cache.stats()["hits"] == 1
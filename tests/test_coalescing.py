@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from app.utils.coalescing import SingleFlight, content_sha256, request_key
+
+def test_request_key_covers_every_field():
+    digest = content_sha256("Source text")
+    assert request_key(digest, "documentary", "AI", None) == request_key(digest, "documentary", "AI", None)
+    assert request_key(digest, "documentary", "AI", None) != request_key(digest, "documentary", None, None)
+    assert request_key(digest, "documentary") != request_key(digest, "educational")
+    assert request_key(digest) != request_key(content_sha256("Other text"))
+    # None and an empty string are different requests
+    assert request_key(digest, None, None, "") != request_key(digest, None, None, None)
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"script": "Shared"}
+
+    results = await asyncio.gather(*(flight.do("key", generate, owner=f"task-{i}") for i in range(5)))
+
+    assert calls == 1
+    assert all(result == {"script": "Shared"} for result, _ in results)
+    assert [leader for _, leader in results] == [None] + ["task-0"] * 4
+    assert flight.stats() == {"leaders": 1, "followers": 4, "in_flight": 0}
+
+@pytest.mark.asyncio
+async def test_finished_calls_are_not_shared():
+    flight = SingleFlight()
+    calls = 0
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flight.do("key", generate) == (1, None)
+    assert await flight.do("key", generate) == (2, None)
+    assert await flight.do("other", generate) == (3, None)
+
+@pytest.mark.asyncio
+async def test_failures_are_shared():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("LLM unavailable")
+
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.leader_of("key") is None
+
+@pytest.mark.asyncio
+async def test_cancelled_follower_does_not_cancel_the_call():
+    flight = SingleFlight()
+    started = asyncio.Event()
+
+    async def generate():
+        started.set()
+        await asyncio.sleep(0.05)
+        return "done"
+
+    leader = asyncio.ensure_future(flight.do("key", generate, owner="leader"))
+    await started.wait()
+    follower = asyncio.ensure_future(flight.do("key", generate))
+    await asyncio.sleep(0)
+    follower.cancel()
+
+    assert await leader == ("done", None)
+    assert follower.cancelled()
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_fails_followers():
+    flight = SingleFlight()
+    started = asyncio.Event()
+
+    async def generate():
+        started.set()
+        await asyncio.sleep(10)
+
+    leader = asyncio.ensure_future(flight.do("key", generate))
+    await started.wait()
+    follower = asyncio.ensure_future(flight.do("key", generate))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    with pytest.raises(RuntimeError, match="cancelled"):
+        await follower
@@ -0,0 +1,78 @@
+import pytest
+from app.utils.coherence import CoherenceAnalyzer, scan_paragraph
+from app.utils.compliance import CompiledTemplate
+from app.utils.text_analysis import analyze_text
+
+TEMPLATE = CompiledTemplate('short', {
+    'structure': [
+        {'section': 'Opening', 'length_range': [1, 100]},
+        {'section': 'Finale', 'length_range': [1, 100]},
+    ]
+})
+
+SCRIPT = """Opening: Julius Caesar crossed the Rubicon. The Roman Senate panicked.
+
+Caesar's legions marched south while Pompey fled to Greece.
+
+The senators argued about grain prices, and furthermore they argued about grain again.
+
+Bread prices climbed every single week.
+
+## Finale
+
+In Greece, Pompey raised an army. Caesar followed him across the sea."""
+
+@pytest.fixture
+def analyzer():
+    return CoherenceAnalyzer(
+        {'max_context_distance': 2, 'min_proper_noun_repetition': 2, 'callback_frequency': 20},
+        max_sentence_length=12,
+        banned_transitions=['furthermore']
+    )
+
+def test_scan_splits_names_from_words():
+    terms = scan_paragraph("The Roman Senate met. Caesar's army waited near Rome, then marched.")
+    # "The" is dropped from the run; "Caesar" opens a sentence, so it is ambiguous
+    assert [(name, unsure) for name, _, _, unsure in terms.names] == [
+        ('Roman Senate', False), ('Caesar', True), ('Rome', False)
+    ]
+    assert [word for word, _, _ in terms.words] == ['waited', 'marched']
+    assert terms.word_count == 11
+
+def test_proper_nouns_aliases_and_headers(analyzer):
+    index = analyzer.index(analyze_text(SCRIPT), TEMPLATE.segment(SCRIPT))
+    # "Caesar" counts towards the only full name ending in it; headers are not mentions
+    assert index.proper_nouns == {
+        'Julius Caesar': 3, 'Rubicon': 1, 'Roman Senate': 1, 'Pompey': 2, 'Greece': 2
+    }
+    assert list(index.proper_nouns) == ['Julius Caesar', 'Rubicon', 'Roman Senate', 'Pompey', 'Greece']
+    assert list(index.key_terms) == ['argued', 'grain', 'prices']
+    mentions = index.mentions('Pompey')
+    assert [SCRIPT[m.start:m.start + 6] for m in mentions] == ['Pompey', 'Pompey']
+    assert [m.paragraph for m in mentions] == [1, 5]
+    # One mention per paragraph: the first, here a bare "Caesar"
+    assert [SCRIPT[m.start:m.start + 6] for m in index.mentions('Julius Caesar')] == ['Julius', 'Caesar', 'Caesar']
+    assert 'finale' not in index.paragraph_terms[4] and not index.paragraph_terms[4]
+
+def test_summary_flags(analyzer):
+    summary = analyzer.check(analyze_text(SCRIPT), TEMPLATE.segment(SCRIPT))
+    assert [entry['name'] for entry in summary['underused_proper_nouns']] == ['Rubicon', 'Roman Senate']
+
+    callbacks = summary['callbacks']
+    # Pompey, Greece and Caesar return four paragraphs after their last mention
+    assert sorted(mention['term'] for mention in callbacks['mentions']) == ['Greece', 'Julius Caesar', 'Pompey']
+    assert callbacks['count'] == 3
+    assert callbacks['expected'] == 2
+    assert callbacks['long_gaps'] == [{'start': 0, 'end': SCRIPT.index('Greece, Pompey'), 'words': 40}]
+
+    # The senate paragraph shares no word with the two before it; the bread one shares "prices"
+    assert [entry['paragraph'] for entry in summary['disconnected_paragraphs']] == [2]
+    assert [entry['words'] for entry in summary['long_sentences']] == [13]
+    start = SCRIPT.index('furthermore')
+    assert summary['banned_transitions'] == [{'phrase': 'furthermore', 'start': start, 'end': start + 11}]
+
+def test_without_template_or_text(analyzer):
+    summary = analyzer.check(analyze_text(""))
+    assert summary['proper_nouns'] == {} and summary['key_terms'] == {}
+    assert summary['callbacks']['count'] == 0 and summary['callbacks']['max_gap_words'] == 0
+    assert summary['disconnected_paragraphs'] == []
@@ -0,0 +1,66 @@
+import pytest
+from app.utils.compliance import CompiledTemplate
+from app.utils.text_processor import TextProcessor
+
+@pytest.fixture
+def template():
+    return CompiledTemplate("documentary", {
+        "name": "Documentary Style",
+        "structure": [
+            {"section": "Introduction", "length_range": [3, 10]},
+            {"section": "Main Content", "length_range": [5, 50]},
+            {"section": "Conclusion", "length_range": [2, 5]},
+        ]
+    })
+
+def test_segments_common_header_styles(template):
+    script = (
+        "## Introduction\n"
+        "Welcome to a short tour of machine learning.\n\n"
+        "**Main Content**\n"
+        "Models learn patterns from data. The introduction of GPUs sped this up.\n\n"
+        "Conclusion: Thanks for watching!"
+    )
+    spans = template.segment(script)
+
+    assert [span.name for span in spans] == ["Introduction", "Main Content", "Conclusion"]
+    assert [span.word_count for span in spans] == [8, 12, 3]
+    assert script[spans[2].start:spans[2].end].strip() == "Thanks for watching!"
+
+def test_check_reports_ranges_and_offsets(template):
+    script = "INTRODUCTION\nOne two three four.\n\nConclusion\nBye now."
+    compliance = template.check(script)
+
+    intro = compliance["Introduction"]
+    assert intro["present"] and intro["length_in_range"]
+    assert intro["actual_length"] == 4
+    start, end = intro["offsets"][0]
+    assert script[start:end].strip() == "One two three four."
+
+    assert compliance["Main Content"] == {
+        "present": False,
+        "length_in_range": False,
+        "actual_length": 0,
+        "expected_range": [5, 50],
+        "offsets": []
+    }
+    assert compliance["Conclusion"]["length_in_range"]
+
+def test_mentions_inside_paragraphs_are_not_headers(template):
+    script = "In this introduction we cover the main content and the conclusion."
+    assert template.segment(script) == []
+
+def test_scales_to_many_sections():
+    sections = [{"section": f"Part {i}", "length_range": [1, 100]} for i in range(200)]
+    template = CompiledTemplate("long", {"structure": sections})
+    script = "\n\n".join(f"Part {i}\nSome words for part {i}." for i in range(200))
+
+    compliance = template.check(script)
+    assert all(details["actual_length"] == 5 for details in compliance.values())
+    # "Part 1" must not swallow the "Part 10".."Part 199" headers
+    assert compliance["Part 1"]["offsets"] and len(compliance["Part 1"]["offsets"]) == 1
+
+def test_text_processor_uses_real_templates_schema():
+    processor = TextProcessor()
+    assert "documentary" in processor.templates
+    assert processor.get_template_sections("documentary") == ["Introduction", "Main Content", "Conclusion"]
@@ -0,0 +1,133 @@
+import os
+import pickle
+import shutil
+import pytest
+import yaml
+from app.utils.config import ConfigRegistry, ConfigError, FrozenDict, CONFIG_DIR, CONFIG_FILES, load_config
+from app.utils.text_processor import TextProcessor
+
+@pytest.fixture
+def config_dir(tmp_path):
+    for filename in CONFIG_FILES.values():
+        shutil.copy(os.path.join(CONFIG_DIR, filename), tmp_path / filename)
+    return tmp_path
+
+def _paths(directory):
+    return {name: str(directory / filename) for name, filename in CONFIG_FILES.items()}
+
+def _rewrite(path, change):
+    with open(path) as f:
+        data = yaml.safe_load(f)
+    change(data)
+    with open(path, 'w') as f:
+        yaml.safe_dump(data, f)
+    # Make sure the signature changes even on filesystems with coarse mtimes
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_loads_and_compiles_the_shipped_config():
+    config = load_config({name: os.path.join(CONFIG_DIR, filename) for name, filename in CONFIG_FILES.items()})
+    assert config.version == 1
+    assert set(config.compiled_templates) == set(config.templates)
+    assert config.compiled_templates['documentary'].target_duration == (180, 420)
+    assert config.llm.model == 'gpt-4-1106-preview'
+    assert config.llm.top_p == 0.95
+    assert 'in conclusion' in config.quality.banned_transitions
+    assert 'teleprompter' in config.export['templates']
+
+def test_config_is_frozen(config_dir):
+    config = ConfigRegistry(_paths(config_dir)).current
+    with pytest.raises(TypeError):
+        config.templates['documentary'] = {}
+    with pytest.raises(TypeError):
+        config.quality.validation.update(min_flesch_score=0)
+    assert isinstance(config.templates['documentary']['structure'], tuple)
+    assert pickle.loads(pickle.dumps(config.templates)) == config.templates
+    assert type(pickle.loads(pickle.dumps(config.templates))) is FrozenDict
+
+@pytest.mark.parametrize('filename, change, message', [
+    ('templates.yaml', lambda data: data['templates']['documentary']['structure'][0].update(length_range=[9, 1]),
+     'length_range'),
+    ('llm.yaml', lambda data: data['parameters'].update(temperature='warm'), 'temperature'),
+    ('llm.yaml', lambda data: data['parameters'].update(max_tokens=None), 'max_tokens'),
+    ('llm.yaml', lambda data: data['parameters'].update(context_tokens=None), 'context_tokens'),
+    ('quality_control.yaml', lambda data: data['validation']['style'].update(banned_transitions='so'),
+     'banned_transitions'),
+    ('prompts.yaml', lambda data: data['messages'].pop('draft'), 'draft'),
+    ('quality_control.yaml', lambda data: data['validation']['fidelity'].update(num_perm=48), 'num_perm'),
+])
+def test_invalid_config_is_rejected(config_dir, filename, change, message):
+    _rewrite(config_dir / filename, change)
+    with pytest.raises(ConfigError, match=message):
+        load_config(_paths(config_dir))
+
+def test_unparseable_yaml_is_a_config_error(config_dir):
+    (config_dir / 'llm.yaml').write_text("models: [unclosed\n")
+    with pytest.raises(ConfigError, match='llm.yaml'):
+        load_config(_paths(config_dir))
+
+def test_check_reloads_changed_files_and_notifies(config_dir):
+    registry = ConfigRegistry(_paths(config_dir), check_interval=0.001)
+    assert registry.current.version == 1
+    seen = []
+    registry.subscribe(seen.append)
+    assert registry.check() is False
+
+    _rewrite(config_dir / 'llm.yaml', lambda data: data['models'].update(default='gpt-4o'))
+    registry._next_check = 0
+    assert registry.check() is True
+    assert registry.current.version == 2
+    assert registry.current.llm.model == 'gpt-4o'
+    assert [config.version for config in seen] == [2]
+    assert registry.stats()['reloads'] == 1
+
+def test_bad_reload_keeps_the_previous_config(config_dir):
+    registry = ConfigRegistry(_paths(config_dir), check_interval=0.001)
+    before = registry.current
+    (config_dir / 'templates.yaml').write_text("templates: [not, a, mapping]\n")
+    assert registry.reload() is False
+    assert registry.current is before
+    stats = registry.stats()
+    assert stats['errors'] == 1 and 'templates' in stats['last_error']
+    # The broken files are not retried until they change again
+    registry._next_check = 0
+    assert registry.check() is False
+    assert registry.stats()['errors'] == 1
+
+def test_unexpected_load_error_keeps_the_previous_config(config_dir, monkeypatch):
+    registry = ConfigRegistry(_paths(config_dir), check_interval=0.001)
+    before = registry.current
+    _rewrite(config_dir / 'llm.yaml', lambda data: data['models'].update(default='gpt-4o'))
+    monkeypatch.setattr('app.utils.config._parse_llm', lambda data, path: int(None))
+    registry._next_check = 0
+    assert registry.check() is False
+    assert registry.current is before
+    registry._next_check = 0
+    assert registry.check() is False
+    assert registry.stats()['errors'] == 1
+
+def test_zero_interval_disables_checks(config_dir):
+    registry = ConfigRegistry(_paths(config_dir), check_interval=0)
+    registry.current
+    _rewrite(config_dir / 'llm.yaml', lambda data: data['models'].update(default='gpt-4o'))
+    assert registry.check() is False
+    assert registry.current.llm.model == 'gpt-4-1106-preview'
+
+def test_text_processor_follows_reloads(config_dir):
+    registry = ConfigRegistry(_paths(config_dir), check_interval=0.001)
+    processor = TextProcessor(config=registry)
+    assert 'short' not in processor.templates
+    matcher = processor.phrase_matcher
+
+    def add_template(data):
+        data['templates']['short'] = {'structure': [{'section': 'Only', 'length_range': [1, 100]}]}
+    _rewrite(config_dir / 'templates.yaml', add_template)
+    _rewrite(config_dir / 'quality_control.yaml', lambda data: data['validation']['style']['banned_transitions'].append('anyway'))
+    registry.reload()
+
+    assert processor.compiled_templates['short'].sections == [('Only', (1, 100))]
+    assert processor.phrase_matcher is not matcher
+    assert 'anyway' in processor.banned_transitions
+    result = processor.validate_script("Only: anyway this is short.", 'short')
+    assert result['template_compliance']['Only']['present']
+    assert result['engagement']['banned_transitions']
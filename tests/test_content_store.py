@@ -0,0 +1,49 @@
+import pytest
+from app.utils.content_store import ContentStore, UnknownContentError
+
+
+@pytest.fixture(params=["memory", "directory"])
+def store(request, tmp_path):
+    directory = str(tmp_path / "content") if request.param == "directory" else None
+    return ContentStore(directory=directory, max_items=2, spool_chars=8)
+
+
+def test_add_and_read(store):
+    info = store.add(["Hello, ", "world. ", "Ünïcode too."], filename="a.txt")
+    assert info["characters"] == len("Hello, world. Ünïcode too.")
+    assert info["filename"] == "a.txt"
+    assert info["preview"] == "Hello, world. Ünïcode too."
+    assert store.read(info["content_id"]) == "Hello, world. Ünïcode too."
+    assert store.info(info["content_id"])["sha256"] == info["sha256"]
+
+
+def test_unknown_and_invalid_ids(store):
+    with pytest.raises(UnknownContentError):
+        store.read("0" * 32)
+    with pytest.raises(UnknownContentError):
+        store.read("../../etc/passwd")
+
+
+def test_failed_write_is_discarded(store):
+    def pieces():
+        yield "partial"
+        raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+    with pytest.raises(UnicodeDecodeError):
+        store.add(pieces())
+    assert store.evict_expired() == 0
+
+
+def test_evicts_oldest_over_capacity(store):
+    first = store.add(["one"])["content_id"]
+    store.add(["two"])
+    store.add(["three"])
+    with pytest.raises(UnknownContentError):
+        store.read(first)
+
+
+def test_expired_content(tmp_path):
+    store = ContentStore(ttl=0)
+    content_id = store.add(["gone"])["content_id"]
+    with pytest.raises(UnknownContentError):
+        store.read(content_id)
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import pytest
+from app.utils.executors import InstrumentedExecutor
+
+
+def fail():
+    raise ValueError("boom")
+
+
+def test_run_returns_result_and_records_stats():
+    executor = InstrumentedExecutor('test', 'thread', max_workers=2)
+    try:
+        assert asyncio.run(executor.run(sum, [1, 2, 3])) == 6
+        stats = executor.stats()
+        assert stats['submitted'] == 1
+        assert stats['completed'] == 1
+        assert stats['in_flight'] == 0
+        assert stats['wait_seconds_total'] >= 0
+    finally:
+        executor.shutdown()
+
+
+def test_errors_propagate_and_are_counted():
+    executor = InstrumentedExecutor('test', 'thread', max_workers=1)
+    try:
+        with pytest.raises(ValueError, match="boom"):
+            executor.submit(fail).result()
+        assert executor.stats()['failed'] == 1
+    finally:
+        executor.shutdown()
+
+
+def test_queue_depth_and_wait_time():
+    executor = InstrumentedExecutor('test', 'thread', max_workers=1)
+    release = threading.Event()
+    try:
+        futures = [executor.submit(release.wait) for _ in range(3)]
+        stats = executor.stats()
+        assert stats['in_flight'] == 3
+        assert stats['queue_depth'] == 2
+
+        release.set()
+        for future in futures:
+            future.result()
+        stats = executor.stats()
+        assert stats['queue_depth'] == 0
+        assert stats['wait_seconds_max'] >= 0
+        assert stats['wait_seconds_p99'] == stats['wait_seconds_max']
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_process_executor():
+    executor = InstrumentedExecutor('test', 'process', max_workers=1)
+    try:
+        assert executor.submit(max, 3, 7).result() == 7
+        assert executor.stats()['kind'] == 'process'
+    finally:
+        executor.shutdown()
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        InstrumentedExecutor('test', 'fiber')
@@ -0,0 +1,140 @@
+import io
+import os
+import re
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+import pytest
+import yaml
+from app.utils.compliance import compile_templates
+from app.utils.export import CHUNK_SIZE, ScriptExporter, iter_blocks, iter_cues
+from app.utils.text_analysis import WORDS_PER_MINUTE
+from app.utils.config import CONFIG_DIR
+
+@pytest.fixture(scope="module")
+def exporter():
+    with open(os.path.join(CONFIG_DIR, "export.yaml")) as f:
+        return ScriptExporter(yaml.safe_load(f))
+
+@pytest.fixture(scope="module")
+def documentary():
+    with open(os.path.join(CONFIG_DIR, "templates.yaml")) as f:
+        return compile_templates(yaml.safe_load(f)['templates'])['documentary']
+
+SCRIPT = """Introduction: Welcome to the story of <AI> & its makers.
+
+Main Content
+It began in 1956. Researchers met at Dartmouth.
+They were optimistic about progress.
+
+Conclusion
+- The end is near."""
+
+def test_blocks_follow_template_headers(documentary):
+    blocks = list(iter_blocks(SCRIPT, documentary))
+    assert [(block.kind, block.text) for block in blocks] == [
+        ('heading', 'Introduction'),
+        ('paragraph', 'Welcome to the story of <AI> & its makers.'),
+        ('heading', 'Main Content'),
+        ('paragraph', 'It began in 1956. Researchers met at Dartmouth.\nThey were optimistic about progress.'),
+        ('heading', 'Conclusion'),
+        ('paragraph', '- The end is near.'),
+    ]
+    # Without a template only Markdown headings are headings
+    assert [block.kind for block in iter_blocks("## Intro\n\nText\n\n## Outro")] == ['heading', 'paragraph', 'heading']
+
+def test_html_escapes_script_text(exporter, documentary):
+    html, media_type = exporter.render(SCRIPT, 'html', documentary, title="A & B")
+    assert media_type == 'text/html'
+    assert '<title>A &amp; B</title>' in html
+    assert '<h2>Main Content</h2>' in html
+    assert '&lt;AI&gt; &amp; its makers' in html
+    assert '<AI>' not in html
+    assert 'Dartmouth.<br>They' in html
+
+def test_markdown_escapes_block_syntax(exporter, documentary):
+    md, _ = exporter.render(SCRIPT, 'md', documentary)
+    assert md.startswith('# Script\n')
+    assert '\n## Conclusion\n' in md
+    assert '\n\\- The end is near.' in md
+    assert '&lt;AI>' in md
+
+def test_teleprompter_wraps_one_sentence_per_line_group(exporter, documentary):
+    text, media_type = exporter.render(SCRIPT, 'teleprompter', documentary)
+    assert media_type == 'text/plain'
+    assert exporter.filename('teleprompter') == 'script.teleprompter.txt'
+    lines = text.split('\n')
+    assert '[ MAIN CONTENT ]' in lines
+    assert 'It began in 1956.' in lines
+    assert all(len(line) <= 32 for line in lines if not line.startswith('['))
+
+def test_cues_are_timed_at_reading_speed():
+    words = ' '.join(['word'] * 30) + '.'
+    cues = list(iter_cues(iter_blocks(f"## Heading\n\nShort one here.\n\n{words}"), words_per_minute=WORDS_PER_MINUTE))
+    # The 30-word sentence is cut into three even captions
+    assert [len(' '.join(cue.lines).split()) for cue in cues] == [3, 10, 10, 10]
+    assert cues[0].start == 0
+    assert all(a.end == b.start for a, b in zip(cues, cues[1:]))
+    # Captions shorter than a second are held for one
+    assert cues[-1].end == pytest.approx(1.0 + 30 * 60 / WORDS_PER_MINUTE)
+    assert all(len(cue.lines) <= 2 for cue in cues)
+
+def test_srt_and_vtt(exporter):
+    script = "First sentence here. " + "x " * 500 + "end."
+    srt, media_type = exporter.render(script, 'srt')
+    assert media_type == 'application/x-subrip'
+    assert srt.startswith('1\n00:00:00,000 --> 00:00:01,000\nFirst sentence here.\n\n2\n')
+    assert re.search(r'\n\d+:\d\d:\d\d,\d{3} --> 00:02:3\d,\d{3}\n', srt)
+
+    vtt, media_type = exporter.render("Is 1 < 2? Yes & no.", 'vtt')
+    assert media_type == 'text/vtt'
+    assert vtt.startswith('WEBVTT\n\n00:00:00.000 --> ')
+    assert 'Is 1 &lt; 2?' in vtt
+    assert 'Yes &amp; no.' in vtt
+
+def test_docx_is_a_word_package(exporter, documentary):
+    content, media_type = exporter.render(SCRIPT + "\x0b", 'docx', documentary)
+    assert media_type.endswith('wordprocessingml.document')
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        assert {'[Content_Types].xml', '_rels/.rels', 'word/document.xml', 'word/styles.xml'} <= set(archive.namelist())
+        document = ET.fromstring(archive.read('word/document.xml'))
+    ns = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+    texts = [node.text for node in document.iterfind('.//w:t', ns)]
+    assert 'Welcome to the story of <AI> & its makers.' in texts
+    styles = [node.get(f"{{{ns['w']}}}val") for node in document.iterfind('.//w:pStyle', ns)]
+    assert styles == ['Title', 'Heading1', 'Heading1', 'Heading1']
+
+def test_pdf_structure(exporter):
+    script = "\n\n".join(f"Paragraph {i} with (parens) and a backslash \\ in it." for i in range(400))
+    content, media_type = exporter.render(script, 'pdf', title="Long (script)")
+    assert media_type == 'application/pdf'
+    assert content.startswith(b'%PDF-1.4') and content.endswith(b'%%EOF\n')
+
+    # Every cross-reference entry points at its object
+    xref = int(content.rsplit(b'startxref\n', 1)[1].split(b'\n')[0])
+    lines = content[xref:].split(b'\n')
+    count = int(lines[1].split()[1])
+    for number in range(1, count):
+        offset = int(lines[2 + number][:10])
+        assert content[offset:].startswith(b'%d 0 obj' % number)
+
+    pages = int(re.search(rb'/Type /Pages /Kids \[[^\]]*\] /Count (\d+)', content).group(1))
+    assert pages > 1
+    streams = re.findall(rb'stream\n(.*?)\nendstream', content, re.S)
+    text = b''.join(zlib.decompress(stream) for stream in streams)
+    assert b'(Paragraph 399 with \\(parens\\) and a backslash \\\\ in it.) Tj' in text
+
+def test_stream_is_chunked_and_rejects_unknown_formats(exporter):
+    script = "A sentence of text. " * 20000
+    chunks = list(exporter.stream(script, 'txt'))
+    assert len(chunks) > 1 and max(len(chunk) for chunk in chunks) <= CHUNK_SIZE * 4
+    assert b''.join(chunks).decode() == script
+    assert len(list(exporter.stream(script, 'html'))) > 1
+    with pytest.raises(ValueError, match="Unsupported format type"):
+        exporter.stream(script, 'rtf')
+
+def test_formats_without_templates_are_not_offered():
+    exporter = ScriptExporter({'templates': {}})
+    assert exporter.formats == ['txt', 'pdf']
+    with pytest.raises(ValueError):
+        exporter.media_type('html')
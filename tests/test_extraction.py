@@ -0,0 +1,72 @@
+import io
+import zipfile
+import pytest
+from app.utils.content_store import ContentStore
+from app.utils.extraction import (
+    detect_format, extract_upload, iter_decoded, UploadTooLargeError, UnsupportedFormatError
+)
+
+
+@pytest.fixture
+def store():
+    return ContentStore()
+
+
+def test_detect_format():
+    assert detect_format("notes.md") == "text"
+    assert detect_format("page.HTML") == "html"
+    assert detect_format("report.docx") == "docx"
+    assert detect_format("transcript", "text/plain") == "text"
+    with pytest.raises(UnsupportedFormatError):
+        detect_format("slides.pdf", "application/pdf")
+
+
+def test_incremental_decoding_across_blocks():
+    data = "naïve café – 東京".encode("utf-8")
+    pieces = list(iter_decoded(io.BytesIO(data), block_size=3))
+    assert len(pieces) > 1
+    assert "".join(pieces) == "naïve café – 東京"
+
+
+def test_extract_utf8_with_bom(store):
+    data = b"\xef\xbb\xbfFirst line.\n\nSecond line."
+    info = extract_upload(io.BytesIO(data), "notes.txt", "text/plain", store)
+    assert info["encoding"] == "utf-8-sig"
+    assert store.read(info["content_id"]) == "First line.\n\nSecond line."
+
+
+def test_extract_falls_back_from_utf8(store):
+    data = "Café society and naïve readers. ".encode("cp1252") * 20
+    info = extract_upload(io.BytesIO(data), "notes.txt", "text/plain", store)
+    assert info["encoding"] != "utf-8"
+    assert store.read(info["content_id"]).startswith("Café society")
+
+
+def test_extract_html(store):
+    data = b"<html><head><style>p{}</style></head><body><h1>Title</h1><p>One &amp; two.</p></body></html>"
+    info = extract_upload(io.BytesIO(data), "page.html", "text/html", store)
+    text = store.read(info["content_id"])
+    assert "Title" in text and "One & two." in text
+    assert "p{}" not in text
+
+
+def test_extract_docx(store):
+    ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    document = (
+        f'<w:document xmlns:w="{ns}"><w:body>'
+        '<w:p><w:r><w:t>First paragraph.</w:t></w:r></w:p>'
+        '<w:p><w:r><w:t>Second</w:t></w:r><w:r><w:t xml:space="preserve"> paragraph.</w:t></w:r></w:p>'
+        '</w:body></w:document>'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", document)
+    buffer.seek(0)
+
+    info = extract_upload(buffer, "report.docx", None, store)
+    assert store.read(info["content_id"]) == "First paragraph.\n\nSecond paragraph.\n\n"
+
+
+def test_extract_enforces_size_limit(store):
+    with pytest.raises(UploadTooLargeError):
+        extract_upload(io.BytesIO(b"x" * 100), "big.txt", "text/plain", store, max_bytes=10)
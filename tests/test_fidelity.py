@@ -0,0 +1,74 @@
+import pytest
+from app.utils.fidelity import FidelityIndex, content_tokens, shingles, signature
+from app.utils.text_processor import TextProcessor
+
+CHUNKS = [
+    "Julius Caesar crossed the Rubicon river in 49 BC with a single legion, starting a civil war "
+    "against Pompey and the Roman Senate. The crossing was illegal under Roman law.",
+    "The printing press, developed by Johannes Gutenberg around 1440, used movable metal type. "
+    "It made books cheaper and spread literacy across Europe within decades.",
+    "Photosynthesis converts light energy into chemical energy stored in glucose. Chlorophyll "
+    "in the chloroplasts absorbs mostly blue and red light.",
+]
+
+SCRIPT = """When Caesar crossed the Rubicon river with a single legion, he started a civil war against Pompey.
+
+## Printing
+
+Gutenberg's printing press used movable metal type and made books cheaper across Europe.
+
+In 1969 Neil Armstrong walked on the Moon while millions watched."""
+
+@pytest.fixture
+def index():
+    return FidelityIndex(CHUNKS)
+
+def test_signatures_estimate_overlap():
+    words = [token[0] for token in content_tokens(" ".join(f"word{i}" for i in range(400)))]
+    full = shingles(words, 2)
+    half = shingles(words[:200], 2)
+    assert signature(full, 64) == signature(set(full), 64)
+    agreement = sum(a == b for a, b in zip(signature(full, 64), signature(half, 64))) / 64
+    # True Jaccard is about one half
+    assert 0.3 < agreement < 0.7
+    assert signature(set(), 64) is None
+
+def test_paragraphs_map_to_their_chunks(index):
+    result = index.check(SCRIPT)
+    # The heading is too short to shingle and is left out
+    caesar, printing, moon = result['paragraphs']
+    assert caesar['paragraph'] == 0 and printing['paragraph'] == 2
+    assert [match['chunk'] for match in caesar['matches']] == [0]
+    assert [match['chunk'] for match in printing['matches']] == [1]
+    match = printing['matches'][0]
+    assert CHUNKS[1][match['start']:match['end']].startswith('printing press')
+    assert 0.5 < match['score'] <= 1
+    assert caesar['novelty'] < 0.5 and caesar['unsupported_terms'] == []
+
+    assert moon['matches'] == [] and moon['novelty'] == 1
+    assert moon['unsupported_terms'] == ['Neil Armstrong', 'Moon', '1969']
+
+    assert result['chunks'] == 3
+    assert result['coverage'] == pytest.approx(2 / 3, abs=0.001)
+    assert result['uncovered_chunks'] == [2]
+    assert 0 < result['novelty'] < 1
+
+def test_queries_only_score_colliding_windows():
+    chunks = [" ".join(f"topic{chunk}x{i}" for i in range(200)) for chunk in range(50)]
+    index = FidelityIndex(chunks, {'window_words': 40})
+    assert index.stats()['windows'] == 50 * 9
+    query = " ".join(f"topic7x{i}" for i in range(100, 130))
+    result = index.query(query)
+    assert [match['chunk'] for match in result['matches']] == [7]
+    assert result['novelty'] == 0
+    # Lookup cost is set by the colliding windows, a handful out of hundreds
+    assert 0 < len(index._candidates(signature(shingles([t[0] for t in content_tokens(query)], 2), 64))) < 10
+
+def test_text_processor_reuses_indexes():
+    processor = TextProcessor()
+    source = "\n\n".join(CHUNKS)
+    first = processor.fidelity_index(source)
+    assert processor.fidelity_index(source) is first
+    assert processor.fidelity_index(source + " More.") is not first
+    result = processor.check_fidelity(SCRIPT, source)
+    assert result['paragraphs'][0]['matches']
@@ -0,0 +1,81 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.utils.ai_handler import AIHandler
+from app.utils.improvement import SectionImprover, failing_sections
+from app.utils.text_processor import TextProcessor
+
+TEMPLATES = {
+    'templates': {
+        'short': {
+            'name': 'Short',
+            'structure': [
+                {'section': 'Introduction', 'length_range': [5, 10]},
+                {'section': 'Main Content', 'length_range': [5, 40]},
+                {'section': 'Conclusion', 'length_range': [3, 8]}
+            ]
+        }
+    }
+}
+
+
+@pytest.fixture
+def text_processor(tmp_path):
+    import yaml
+    path = tmp_path / "templates.yaml"
+    path.write_text(yaml.safe_dump(TEMPLATES))
+    return TextProcessor(templates_path=str(path))
+
+
+def make_improver(text_processor, replies):
+    ai_handler = MagicMock(spec=AIHandler)
+    ai_handler.max_concurrency = 4
+    ai_handler.improve_section = AsyncMock(side_effect=replies)
+    return SectionImprover(ai_handler, text_processor, max_retries=3), ai_handler
+
+
+@pytest.mark.asyncio
+async def test_only_failing_sections_are_rewritten(text_processor):
+    main = "Main Content\nThe main part explains the idea in plain words for everyone.\n\n"
+    script = "Introduction\nHi.\n\n" + main + "Conclusion\nThat is all for today folks.\n"
+    validation = text_processor.validate_script(script, 'short')
+    assert failing_sections(validation) == ['Introduction']
+
+    improver, ai_handler = make_improver(text_processor, ["Introduction\nWelcome to a short tour of a big idea."])
+    improved, validation, rounds = await improver.improve(script, validation, 'short')
+
+    assert improved == "Introduction\nWelcome to a short tour of a big idea.\n\n" + main + "Conclusion\nThat is all for today folks.\n"
+    assert failing_sections(validation) == []
+    assert validation == text_processor.validate_script(improved, 'short')
+    assert len(rounds) == 1 and rounds[0]['sections'] == ['Introduction']
+    name, body, expected_range = ai_handler.improve_section.call_args[0][:3]
+    assert (name, body.strip(), expected_range) == ('Introduction', 'Hi.', (5, 10))
+
+
+@pytest.mark.asyncio
+async def test_missing_section_is_inserted_in_template_order(text_processor):
+    script = (
+        "Introduction\nWelcome to a short tour of a big idea.\n\n"
+        "Conclusion\nThat is all for today folks.\n"
+    )
+    document_id, validation, _ = text_processor.validate_incremental(script=script, template_name='short')
+    improver, _ = make_improver(text_processor, ["The main part explains the idea in plain words."])
+
+    improved, validation, rounds = await improver.improve(script, validation, 'short', document_id=document_id)
+
+    assert improved.index("Main Content\nThe main part") < improved.index("Conclusion")
+    assert failing_sections(validation) == []
+    # Only the inserted section's paragraphs were re-analyzed
+    assert rounds[0]['reanalyzed_paragraphs'] == 1
+
+
+@pytest.mark.asyncio
+async def test_rounds_are_bounded_by_max_retries(text_processor):
+    script = "Introduction\nHi.\n\nMain Content\nThe main part explains the idea in plain words.\n\nConclusion\nBye now folks.\n"
+    validation = text_processor.validate_script(script, 'short')
+    improver, ai_handler = make_improver(text_processor, ["Still short."] * 5)
+
+    improved, validation, rounds = await improver.improve(script, validation, 'short')
+
+    assert len(rounds) == 3
+    assert ai_handler.improve_section.await_count == 3
+    assert failing_sections(validation) == ['Introduction']
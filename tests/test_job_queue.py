@@ -0,0 +1,175 @@
+import time
+import pytest
+from unittest.mock import patch
+from app.utils.job_queue import JobQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), lease_seconds=60, max_attempts=2, retry_delay=10, ttl=60)
+    yield queue
+    queue.close()
+
+def test_enqueue_claim_complete(queue):
+    job_id = queue.enqueue({"content": "Source text", "template_name": "documentary"})
+    assert queue.get(job_id)["status"] == "queued"
+
+    job = queue.claim("worker-1")
+    assert job["job_id"] == job_id
+    assert job["payload"]["content"] == "Source text"
+    assert job["attempts"] == 1
+    assert queue.claim("worker-2") is None
+
+    assert queue.complete(job_id, "worker-1", {"script": "Final script", "timings": {"total": 1.5}})
+    task = queue.get(job_id)
+    assert task["status"] == "completed"
+    assert task["script"] == "Final script"
+    assert task["timings"] == {"total": 1.5}
+    assert task["attempts"] == 1
+    assert queue.get("missing") is None
+
+def test_jobs_are_claimed_oldest_first(queue):
+    first = queue.enqueue({"n": 1})
+    second = queue.enqueue({"n": 2})
+    assert queue.claim("worker-1")["job_id"] == first
+    assert queue.claim("worker-1")["job_id"] == second
+
+def test_expired_lease_is_reclaimed_and_old_owner_is_fenced(queue):
+    job_id = queue.enqueue({})
+    queue.claim("worker-1")
+
+    later = time.time() + 61
+    with patch("app.utils.job_queue.time.time", return_value=later):
+        assert queue.stats()["expired_leases"] == 1
+        job = queue.claim("worker-2")
+    assert job["job_id"] == job_id
+    assert job["attempts"] == 2
+
+    # The first worker lost the job and can no longer touch it
+    assert not queue.heartbeat(job_id, "worker-1")
+    assert not queue.complete(job_id, "worker-1", {"script": "stale"})
+    assert queue.fail(job_id, "worker-1", "stale") is None
+    assert queue.complete(job_id, "worker-2", {"script": "fresh"})
+    assert queue.get(job_id)["script"] == "fresh"
+
+def test_heartbeat_extends_lease(queue):
+    job_id = queue.enqueue({})
+    queue.claim("worker-1")
+    with patch("app.utils.job_queue.time.time", return_value=time.time() + 50):
+        assert queue.heartbeat(job_id, "worker-1")
+    with patch("app.utils.job_queue.time.time", return_value=time.time() + 61):
+        assert queue.claim("worker-2") is None
+
+def test_lease_expiry_on_last_attempt_fails_the_job(queue):
+    job_id = queue.enqueue({})
+    now = time.time()
+    queue.claim("worker-1")
+    with patch("app.utils.job_queue.time.time", return_value=now + 61):
+        queue.claim("worker-2")
+    with patch("app.utils.job_queue.time.time", return_value=now + 122):
+        assert queue.claim("worker-3") is None
+    task = queue.get(job_id)
+    assert task["status"] == "failed"
+    assert "lease expired after 2 attempts" in task["error"]
+
+def test_failed_attempts_retry_with_backoff(queue):
+    job_id = queue.enqueue({})
+    now = time.time()
+    queue.claim("worker-1")
+    assert queue.fail(job_id, "worker-1", "LLM unavailable") == "queued"
+    assert queue.get(job_id)["error"] == "LLM unavailable"
+    assert queue.claim("worker-1") is None
+
+    with patch("app.utils.job_queue.time.time", return_value=now + 11):
+        assert queue.claim("worker-1")["attempts"] == 2
+        assert queue.fail(job_id, "worker-1", "LLM unavailable", result={"timings": {"total": 2.0}}) == "failed"
+    task = queue.get(job_id)
+    assert task["status"] == "failed"
+    assert task["timings"] == {"total": 2.0}
+
+def test_permanent_failure_is_not_retried(queue):
+    job_id = queue.enqueue({})
+    queue.claim("worker-1")
+    assert queue.fail(job_id, "worker-1", "Content not found", retry=False) == "failed"
+
+def test_release_returns_job_without_using_an_attempt(queue):
+    job_id = queue.enqueue({})
+    queue.claim("worker-1")
+    assert queue.release(job_id, "worker-1")
+    job = queue.claim("worker-2")
+    assert job["job_id"] == job_id
+    assert job["attempts"] == 1
+
+def test_stats_and_eviction(queue):
+    done = queue.enqueue({})
+    queue.enqueue({})
+    queue.claim("worker-1")
+    queue.complete(done, "worker-1", {})
+
+    stats = queue.stats()
+    assert stats["completed"] == 1
+    assert stats["queued"] == 1
+    assert stats["ready"] == 1
+    assert stats["processing"] == 0
+
+    assert queue.evict_expired() == 0
+    with patch("app.utils.job_queue.time.time", return_value=time.time() + 61):
+        assert queue.evict_expired() == 1
+    assert queue.get(done) is None
+
+def test_enqueue_evicts_expired_jobs(queue):
+    done = queue.enqueue({})
+    queue.claim("worker-1")
+    queue.complete(done, "worker-1", {"script": "Old script"})
+    with patch("app.utils.job_queue.time.time", return_value=time.time() + 61):
+        waiting = queue.enqueue({})
+    assert queue.get(done) is None
+    assert queue.get(waiting)["status"] == "queued"
+
+def test_queue_is_shared_between_connections(queue):
+    other = JobQueue(queue.path)
+    job_id = other.enqueue({"content": "From the API"})
+    assert queue.claim("worker-1")["payload"] == {"content": "From the API"}
+    assert other.get(job_id)["status"] == "processing"
+    other.close()
+
+def test_identical_jobs_follow_the_unfinished_one(queue):
+    leader = queue.enqueue({"content": "Same"}, dedup_key="k")
+    follower = queue.enqueue({"content": "Same"}, dedup_key="k")
+    other = queue.enqueue({"content": "Different"}, dedup_key="other")
+
+    assert queue.get(follower)["coalesced_with"] == leader
+    assert "coalesced_with" not in queue.get(leader)
+    stats = queue.stats()
+    assert stats["queued"] == 2
+    assert stats["following"] == 1
+
+    # Only the leader and the unrelated job are handed to workers
+    assert {queue.claim("worker-1")["job_id"], queue.claim("worker-1")["job_id"]} == {leader, other}
+    assert queue.claim("worker-1") is None
+    assert queue.get(follower)["status"] == "processing"
+
+    queue.complete(leader, "worker-1", {"script": "Shared script"})
+    task = queue.get(follower)
+    assert task["task_id"] == follower
+    assert task["status"] == "completed"
+    assert task["script"] == "Shared script"
+
+    # Once the leader is finished, the same request runs again
+    again = queue.enqueue({"content": "Same"}, dedup_key="k")
+    assert "coalesced_with" not in queue.get(again)
+
+def test_followers_share_final_failure_but_not_retries(queue):
+    leader = queue.enqueue({}, dedup_key="k")
+    follower = queue.enqueue({}, dedup_key="k")
+    now = time.time()
+
+    queue.claim("worker-1")
+    assert queue.fail(leader, "worker-1", "LLM unavailable") == "queued"
+    assert queue.get(follower)["status"] == "queued"
+
+    with patch("app.utils.job_queue.time.time", return_value=now + 11):
+        queue.claim("worker-1")
+        queue.fail(leader, "worker-1", "LLM unavailable")
+    task = queue.get(follower)
+    assert task["status"] == "failed"
+    assert task["error"] == "LLM unavailable"
@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from app.utils.ai_handler import AIHandler
+from app.utils.cache import ResponseCache
+from app.utils.llm_backends import (
+    Completion, FakeBackend, LLMBackend, FakeBackendError, OpenAIBackend, create_backend, response_usage
+)
+from app.utils.scheduler import LLMScheduler, RateLimitError
+
+MESSAGES = [
+    {"role": "system", "content": "You are a script writer."},
+    {"role": "user", "content": (
+        "Organize the script into these sections, each starting with its name on its own line: "
+        "Introduction, Main Content, Conclusion.\n\nDrafts in source order:\n\n[Draft 1]\nText"
+    )}
+]
+
+
+class RecordingSleep:
+    def __init__(self):
+        self.delays = []
+
+    async def __call__(self, delay):
+        self.delays.append(delay)
+
+
+@pytest.mark.asyncio
+async def test_fake_backend_is_deterministic_and_follows_sections():
+    first = await FakeBackend(latency_mean=0, tokens_per_second=0, seed=7).complete("gpt-4", MESSAGES)
+    second = await FakeBackend(latency_mean=0, tokens_per_second=0, seed=7).complete("gpt-4", MESSAGES)
+
+    assert first == second
+    assert [line for line in first.text.split("\n") if line in ("Introduction", "Main Content", "Conclusion")] == [
+        "Introduction", "Main Content", "Conclusion"
+    ]
+    prompt_tokens, completion_tokens, cached = first.usage
+    assert prompt_tokens > 0 and completion_tokens > 0 and cached == 0
+
+
+@pytest.mark.asyncio
+async def test_fake_backend_latency_and_token_rate():
+    sleep = RecordingSleep()
+    backend = FakeBackend(latency='constant', latency_mean=0.25, tokens_per_second=100, sleep=sleep)
+    completion = await backend.complete("gpt-4", MESSAGES)
+
+    assert sleep.delays[0] == 0.25
+    assert sleep.delays[1] == pytest.approx(completion.usage[1] / 100)
+
+
+@pytest.mark.asyncio
+async def test_fake_backend_streams_the_same_text():
+    backend = FakeBackend(latency_mean=0, tokens_per_second=0)
+    stream = await backend.open_stream("gpt-4", MESSAGES)
+    streamed = "".join([token async for token in stream])
+    assert streamed == backend.reply(MESSAGES)
+
+
+@pytest.mark.asyncio
+async def test_fake_backend_error_injection():
+    backend = FakeBackend(latency_mean=0, tokens_per_second=0, rate_limit_rate=1.0)
+    with pytest.raises(RateLimitError):
+        await backend.complete("gpt-4", MESSAGES)
+
+    backend = FakeBackend(latency_mean=0, tokens_per_second=0, error_rate=1.0)
+    with pytest.raises(FakeBackendError):
+        await backend.complete("gpt-4", MESSAGES)
+
+
+def test_fake_backend_latency_distributions():
+    for latency in FakeBackend.LATENCIES:
+        backend = FakeBackend(latency=latency, latency_mean=0.5, seed=1)
+        delays = [backend._first_token_delay() for _ in range(2000)]
+        assert min(delays) >= 0
+        assert sum(delays) / len(delays) == pytest.approx(0.5, rel=0.15)
+    with pytest.raises(ValueError):
+        FakeBackend(latency='gaussian')
+
+
+@pytest.mark.asyncio
+async def test_ai_handler_runs_against_fake_backend():
+    backend = FakeBackend(latency_mean=0, tokens_per_second=0, error_rate=0.3, seed=3)
+    scheduler = LLMScheduler(base_delay=0, max_retries=10)
+    handler = AIHandler(cache=ResponseCache(), scheduler=scheduler, backend=backend)
+
+    chunks = [f"Source chunk {i} about the history of light." for i in range(5)]
+    script = await handler.generate_script_from_chunks(
+        chunks, template_sections=["Introduction", "Main Content", "Conclusion"]
+    )
+
+    assert script.startswith("Introduction\n")
+    assert backend.calls >= 6
+    assert handler.usage.stats()['totals']['draft']['calls'] == 5
+
+
+def test_openai_backend_creates_one_pooled_client(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    backend = OpenAIBackend(http2=False, max_connections=7)
+    client = backend._get_client()
+
+    assert backend._get_client() is client
+    assert client.max_retries == 0
+    assert backend._http_client._transport._pool._max_connections == 7
+    asyncio.run(backend.aclose())
+
+
+def test_create_backend(monkeypatch):
+    assert isinstance(create_backend({'provider': 'fake', 'fake': {'latency_mean': 0}}), FakeBackend)
+    monkeypatch.setenv("LLM_BACKEND", "openai")
+    assert isinstance(create_backend({'provider': 'fake'}), OpenAIBackend)
+    with pytest.raises(ValueError):
+        create_backend(provider='unknown')
+
+
+def test_incomplete_backend_fails_when_built():
+    class CompleteOnly(LLMBackend):
+        async def complete(self, model, messages, **params):
+            return Completion("text")
+
+    with pytest.raises(TypeError):
+        CompleteOnly()
+
+
+def test_response_usage():
+    response = SimpleNamespace(usage=SimpleNamespace(
+        prompt_tokens=120, completion_tokens=30,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=64)
+    ))
+    assert response_usage(response) == (120, 30, 64)
+    assert response_usage(SimpleNamespace()) is None
+    assert Completion("text").usage is None
@@ -0,0 +1,81 @@
+import pytest
+from app.utils.metrics import MetricsRegistry, StageTimer, gauge_family
+
+
+def test_counter_and_gauge_rendering():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests', 'Requests by outcome', ['outcome'])
+    in_progress = registry.gauge('in_progress', 'Tasks in progress')
+    requests.inc(outcome='ok')
+    requests.inc(2, outcome='ok')
+    requests.inc(outcome='error "quoted"')
+    in_progress.inc()
+    in_progress.inc()
+    in_progress.dec()
+
+    text = registry.render()
+    assert "# HELP requests Requests by outcome\n# TYPE requests counter\n" in text
+    assert 'requests_total{outcome="ok"} 3\n' in text
+    assert 'requests_total{outcome="error \\"quoted\\""} 1\n' in text
+    assert "# TYPE in_progress gauge\nin_progress 1\n" in text
+
+
+def test_counter_rejects_decrease_and_wrong_labels():
+    counter = MetricsRegistry().counter('calls', 'Calls', ['kind'])
+    with pytest.raises(ValueError):
+        counter.inc(-1, kind='draft')
+    with pytest.raises(ValueError):
+        counter.inc(stage='draft')
+
+
+def test_registering_twice_returns_the_same_metric():
+    registry = MetricsRegistry()
+    first = registry.histogram('latency', 'Latency', ['kind'])
+    assert registry.histogram('latency', 'Latency', ['kind']) is first
+    with pytest.raises(ValueError):
+        registry.counter('latency', 'Latency', ['kind'])
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Latency', ['kind'], buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, kind='draft')
+
+    text = registry.render()
+    assert 'latency_seconds_bucket{kind="draft",le="0.1"} 2\n' in text
+    assert 'latency_seconds_bucket{kind="draft",le="1"} 3\n' in text
+    assert 'latency_seconds_bucket{kind="draft",le="+Inf"} 4\n' in text
+    assert 'latency_seconds_sum{kind="draft"} 3.65\n' in text
+    assert 'latency_seconds_count{kind="draft"} 4\n' in text
+    assert latency.count(kind='draft') == 4
+
+
+def test_collectors_run_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = {'value': 1}
+    registry.register_collector(lambda: [
+        gauge_family('queue_depth', 'Queued calls', {(('executor', 'validation'),): depth['value']})
+    ])
+    assert 'queue_depth{executor="validation"} 1\n' in registry.render()
+    depth['value'] = 5
+    assert 'queue_depth{executor="validation"} 5\n' in registry.render()
+
+
+def test_stage_timer_accumulates_and_observes_failures():
+    registry = MetricsRegistry()
+    stages = registry.histogram('stage_seconds', 'Stages', ['stage'])
+    timer = StageTimer(stages)
+    with timer.stage('chunking'):
+        pass
+    with timer.stage('generation'):
+        pass
+    with pytest.raises(RuntimeError):
+        with timer.stage('generation'):
+            raise RuntimeError("LLM down")
+
+    timings = timer.timings()
+    assert list(timings) == ['chunking', 'generation', 'total']
+    assert timings['total'] >= timings['generation'] >= 0
+    assert stages.count(stage='generation') == 2
+    assert stages.count(stage='chunking') == 1
@@ -0,0 +1,80 @@
+import pytest
+from app.utils.compliance import CompiledTemplate
+from app.utils.pacing import PacingModel
+from app.utils.text_analysis import analyze_text
+
+TEMPLATE = CompiledTemplate('short', {
+    'target_duration': [5, 60],
+    'structure': [
+        {'section': 'Opening', 'length_range': [2, 10]},
+        {'section': 'Body', 'length_range': [5, 50]},
+    ]
+})
+
+PAUSES = {
+    'comma': 0.1, 'clause': 0.2, 'sentence': 0.3, 'question': 0.4,
+    'exclamation': 0.5, 'ellipsis': 0.6, 'paragraph': 1.0, 'section': 2.0,
+}
+
+@pytest.fixture
+def model():
+    return PacingModel({'words_per_minute': 60, 'pauses': PAUSES})
+
+def test_speech_and_punctuation_pauses(model):
+    timings = model.timeline(analyze_text("One two, three. Four five? Six seven eight!"))
+    assert [timing.words for timing in timings] == [3, 2, 3]
+    # One second per word at 60 wpm
+    assert [timing.speech for timing in timings] == [3, 2, 3]
+    assert [timing.pause for timing in timings] == pytest.approx([0.1 + 0.3, 0.4, 0.0])
+    assert [timing.start_time for timing in timings] == pytest.approx([0, 3.4, 5.8])
+
+def test_ellipsis_clause_and_paragraph_breaks(model):
+    timings = model.timeline(analyze_text("Wait for it... Then: silence.\n\nA new paragraph."))
+    assert [timing.pause for timing in timings] == pytest.approx([0.6, 0.2 + 0.3 + 1.0, 0.0])
+    assert timings[-1].end_time == pytest.approx(sum(t.speech + t.pause for t in timings))
+
+def test_sections_skip_headers_and_get_longer_breaks(model):
+    script = "Opening: Hello there, everyone.\n\nStill opening.\n\n## Body\nThe body has five words. And more."
+    spans = TEMPLATE.segment(script)
+    timings = model.timeline(analyze_text(script), spans)
+    # Header words and the colon after "Opening" are not narrated
+    assert [timing.words for timing in timings] == [3, 2, 5, 2]
+    assert [timing.pause for timing in timings] == pytest.approx([0.1 + 0.3 + 1.0, 0.3 + 2.0, 0.3, 0.0])
+
+    summary = model.summarize(timings, TEMPLATE, spans)
+    assert summary['target_duration'] == [5, 60]
+    assert summary['within_target'] is True
+    opening, body = summary['sections']
+    assert (opening['name'], opening['words'], opening['start_time']) == ('Opening', 5, 0)
+    assert opening['expected_duration'] == [2, 10]
+    assert body['start_time'] == pytest.approx(opening['duration'])
+    assert body['duration'] == pytest.approx(7.3)
+    assert 'sentences' not in summary
+
+def test_paragraph_totals_match_sentence_timing(model):
+    script = (
+        "Opening: Hello there, everyone. Welcome; sit down.\n\nStill opening... right?\n\n"
+        "## Body\nThe body has five words. And more!\n\nA closing line, at last."
+    )
+    spans = TEMPLATE.segment(script)
+    analysis = analyze_text(script)
+    by_sentence = model.timeline(analysis, spans)
+    by_paragraph = model.timeline(analysis, spans, sentences=False)
+    # Only the paragraph without a header that is not the last is timed whole
+    assert len(by_paragraph) == len(by_sentence) - 1
+    assert model.summarize(by_paragraph, TEMPLATE, spans) == model.summarize(by_sentence, TEMPLATE, spans)
+
+def test_summary_without_template(model):
+    timings = model.timeline(analyze_text("Just one sentence here."))
+    summary = model.summarize(timings, include_sentences=True)
+    assert summary['duration'] == 4
+    assert summary['effective_words_per_minute'] == 60
+    assert summary['target_duration'] is None and summary['within_target'] is None
+    assert 'sections' not in summary
+    assert summary['sentences'] == [{'start': 0, 'end': 23, 'words': 4, 'start_time': 0, 'end_time': 4, 'pause': 0}]
+
+def test_empty_script(model):
+    summary = model.summarize(model.timeline(analyze_text("")), TEMPLATE, [])
+    assert summary['duration'] == 0
+    assert summary['within_target'] is False
+    assert summary['sections'] == []
@@ -0,0 +1,75 @@
+import pytest
+from jinja2 import UndefinedError
+from app.utils.prompts import PromptBuilder, UsageLog, format_feedback
+
+CONFIG = {
+    'roles': {'draft': 'Draft a segment.', 'combine': 'Combine the drafts.'},
+    'messages': {
+        'directives': "{% if template_name %}Follow {{ template_name }}.\n{% endif %}",
+        'draft': "Return the narration.\n\n{{ chunk }}",
+        'combine': "Return the script.\n{% include 'directives' %}\n{{ drafts | join('|') }}"
+    }
+}
+
+THRESHOLDS = {
+    'readability': {'min_flesch_score': 65, 'max_sentence_length': 25},
+    'structure': {'min_word_count': 1500}
+}
+
+
+def test_system_messages_share_the_preamble():
+    builder = PromptBuilder(CONFIG, preamble="You are a scriptwriter.")
+    draft_system, _ = builder.build('draft', chunk="a")
+    combine_system, _ = builder.build('combine', drafts=["a"])
+    assert draft_system == "You are a scriptwriter.\n\nDraft a segment."
+    assert combine_system.startswith("You are a scriptwriter.\n\n")
+
+
+def test_user_messages_put_content_last():
+    builder = PromptBuilder(CONFIG)
+    _, first = builder.build('combine', drafts=["one", "two"], template_name="documentary")
+    _, second = builder.build('combine', drafts=["three"], template_name="documentary")
+    assert first == "Return the script.\nFollow documentary.\none|two"
+    assert first[:first.index("one")] == second[:second.index("three")]
+
+
+def test_missing_variables_fail_loudly():
+    builder = PromptBuilder(CONFIG)
+    with pytest.raises(UndefinedError):
+        builder.build('draft')
+
+
+def test_format_feedback_is_compact():
+    validation = {
+        'readability': {'flesch_score': 58.25, 'grade_level': 10.2, 'reading_time': 1.5},
+        'structure': {'word_count': 300, 'avg_sentence_length': 12.0, 'paragraph_count': 4},
+        'engagement': {'question_count': 1, 'quote_count': 0, 'transition_words': 2,
+                       'banned_transitions': {'in conclusion': 2}},
+        'template_compliance': {
+            'Introduction': {'present': True, 'length_in_range': True, 'actual_length': 70,
+                             'expected_range': [60, 100], 'offsets': [[0, 10]]},
+            'Conclusion': {'present': False, 'length_in_range': False, 'actual_length': 0,
+                           'expected_range': [30, 60], 'offsets': []}
+        }
+    }
+    assert format_feedback(validation, THRESHOLDS).split("\n") == [
+        "readability: flesch 58.25 (>=65)!, grade 10.2",
+        "structure: words 300 (>=1500)!, avg sentence 12.0 (<=25), paragraphs 4",
+        'engagement: questions 1, "in conclusion" x2!',
+        "template sections: Introduction 70 (60-100), Conclusion missing (30-60 words)!"
+    ]
+
+
+def test_usage_log_totals_and_recent_calls():
+    log = UsageLog(recent=2)
+    log.record('draft', 'gpt-4', prompt_tokens=100, completion_tokens=20, cached_prompt_tokens=64)
+    log.record('draft', 'gpt-4', prompt_tokens=100, completion_tokens=20, response_cached=True)
+    log.record('combine', 'gpt-4', prompt_tokens=300, completion_tokens=80, estimated=True)
+
+    stats = log.stats()
+    assert stats['totals']['draft'] == {
+        'calls': 2, 'response_cache_hits': 1, 'prompt_tokens': 100,
+        'completion_tokens': 20, 'cached_prompt_tokens': 64
+    }
+    assert [call['kind'] for call in stats['recent']] == ['draft', 'combine']
+
@@ -0,0 +1,142 @@
+import asyncio
+import pytest
+from app.utils.scheduler import LLMScheduler, RateLimitError, TokenBucket
+
+class FakeClient:
+    """Local stand-in for the provider: fails the first calls per model, records the rest."""
+
+    def __init__(self, failures=None, latency=0.0):
+        self.failures = dict(failures or {})
+        self.latency = latency
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def complete(self, model):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            self.calls.append(model)
+            if self.failures.get(model, 0) > 0:
+                self.failures[model] -= 1
+                raise RateLimitError("429 Too Many Requests")
+            return f"reply from {model}"
+        finally:
+            self.in_flight -= 1
+
+def make_scheduler(**kwargs):
+    defaults = dict(base_delay=0.001, max_delay=0.01)
+    defaults.update(kwargs)
+    return LLMScheduler(**defaults)
+
+@pytest.mark.asyncio
+async def test_concurrency_cap():
+    client = FakeClient(latency=0.01)
+    scheduler = make_scheduler(max_concurrency=3)
+
+    results = await asyncio.gather(*(scheduler.submit(client.complete, "gpt-4") for _ in range(10)))
+
+    assert len(results) == 10
+    assert client.peak == 3
+    assert scheduler.stats()["completed"] == 10
+
+@pytest.mark.asyncio
+async def test_retries_then_succeeds():
+    client = FakeClient(failures={"gpt-4": 2})
+    scheduler = make_scheduler(max_retries=3)
+
+    result = await scheduler.submit(client.complete, "gpt-4")
+
+    assert result == "reply from gpt-4"
+    assert client.calls == ["gpt-4"] * 3
+    assert scheduler.stats()["retries"] == 2
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries():
+    client = FakeClient(failures={"gpt-4": 10})
+    scheduler = make_scheduler(max_retries=2)
+
+    with pytest.raises(RateLimitError):
+        await scheduler.submit(client.complete, "gpt-4")
+    assert len(client.calls) == 3
+    assert scheduler.stats()["failed"] == 1
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_are_raised_immediately():
+    scheduler = make_scheduler()
+    calls = []
+
+    async def broken(model):
+        calls.append(model)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        await scheduler.submit(broken, "gpt-4")
+    assert calls == ["gpt-4"]
+
+@pytest.mark.asyncio
+async def test_rate_limit_falls_back_to_fallback_model():
+    client = FakeClient(failures={"gpt-4": 1})
+    scheduler = make_scheduler(fallback_model="gpt-3.5-turbo")
+
+    result = await scheduler.submit(client.complete, "gpt-4")
+
+    assert result == "reply from gpt-3.5-turbo"
+    assert scheduler.stats()["fallbacks"] == 1
+
+@pytest.mark.asyncio
+async def test_saturated_primary_routes_to_fallback():
+    client = FakeClient()
+    scheduler = make_scheduler(requests_per_minute=1, fallback_model="gpt-3.5-turbo", saturation_wait=1.0)
+
+    first = await scheduler.submit(client.complete, "gpt-4")
+    second = await scheduler.submit(client.complete, "gpt-4")
+
+    assert first == "reply from gpt-4"
+    assert second == "reply from gpt-3.5-turbo"
+
+@pytest.mark.asyncio
+async def test_priority_order_when_queued():
+    order = []
+    scheduler = make_scheduler(max_concurrency=1)
+    gate = asyncio.Event()
+
+    async def blocker(model):
+        await gate.wait()
+
+    def recorder(name):
+        async def call(model):
+            order.append(name)
+        return call
+
+    blocked = asyncio.create_task(scheduler.submit(blocker, "gpt-4"))
+    await asyncio.sleep(0)
+    low = asyncio.create_task(scheduler.submit(recorder("background"), "gpt-4", priority=1))
+    high = asyncio.create_task(scheduler.submit(recorder("interactive"), "gpt-4", priority=0))
+    await asyncio.sleep(0)
+    assert scheduler.stats()["queued"] == 2
+    gate.set()
+    await asyncio.gather(blocked, low, high)
+
+    assert order == ["interactive", "background"]
+
+def test_token_bucket_refill():
+    now = [0.0]
+    bucket = TokenBucket(60, clock=lambda: now[0])
+    bucket.consume(60)
+    assert bucket.wait_time(30) == pytest.approx(30.0)
+    now[0] = 10.0
+    assert bucket.wait_time(30) == pytest.approx(20.0)
+    # Requests larger than the bucket only wait for it to be full
+    assert bucket.wait_time(1000) == pytest.approx(50.0)
+
+def test_from_config():
+    scheduler = LLMScheduler.from_config(
+        {"models": {"fallback": "gpt-3.5-turbo-1106"}, "rate_limits": {"requests_per_minute": 10}},
+        {"error_handling": {"max_retries": 5, "backoff_factor": 2.0}}
+    )
+    assert scheduler.fallback_model == "gpt-3.5-turbo-1106"
+    assert scheduler.requests_per_minute == 10
+    assert scheduler.max_retries == 5
+    assert scheduler.backoff_factor == 2.0
@@ -0,0 +1,82 @@
+import pytest
+from unittest.mock import patch
+from app.utils.task_store import TaskStore, MemoryTaskStore, SQLiteTaskStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryTaskStore(ttl=60)
+    return SQLiteTaskStore(str(tmp_path / "tasks.db"), ttl=60)
+
+def test_create_get_update(store):
+    task_id = store.create(status="processing")
+    assert store.get(task_id)["status"] == "processing"
+
+    store.update(task_id, status="completed", script="Final script", validation={"ok": True})
+    task = store.get(task_id)
+    assert task["status"] == "completed"
+    assert task["script"] == "Final script"
+    assert task["validation"] == {"ok": True}
+    assert task_id in store
+    assert "missing" not in store
+
+def test_ids_are_unique(store):
+    ids = {store.create() for _ in range(200)}
+    assert len(ids) == 200
+
+def test_update_missing_task(store):
+    with pytest.raises(KeyError):
+        store.update("missing", status="failed")
+
+def test_list_by_status_and_age(store):
+    with patch("app.utils.task_store.time.time", return_value=1000.0):
+        old = store.create()
+    with patch("app.utils.task_store.time.time", return_value=1010.0):
+        new = store.create()
+        done = store.create()
+        store.update(done, status="completed")
+
+    processing = [task["task_id"] for task in store.list_by_status("processing")]
+    assert processing == [old, new]
+    stale = store.list_by_status("processing", older_than=1005.0)
+    assert [task["task_id"] for task in stale] == [old]
+    assert [task["task_id"] for task in store.list_by_status("completed")] == [done]
+
+def test_finished_tasks_expire(store):
+    with patch("app.utils.task_store.time.time", return_value=1000.0):
+        running = store.create()
+        finished = store.create()
+        store.update(finished, status="failed", error="boom")
+    with patch("app.utils.task_store.time.time", return_value=1100.0):
+        assert store.evict_expired() == 1
+
+    assert store.get(finished) is None
+    assert store.get(running) is not None
+
+def test_memory_store_is_bounded():
+    store = MemoryTaskStore(max_tasks=3, ttl=None)
+    finished = []
+    for _ in range(3):
+        task_id = store.create()
+        store.update(task_id, status="completed")
+        finished.append(task_id)
+    running = store.create()
+
+    assert store.get(finished[0]) is None
+    assert store.get(running) is not None
+    assert len(store.list_by_status("completed")) == 2
+
+def test_sqlite_store_shared_between_instances(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    task_id = SQLiteTaskStore(path).create()
+    SQLiteTaskStore(path).update(task_id, status="completed", script="done")
+
+    assert SQLiteTaskStore(path).get(task_id)["script"] == "done"
+
+def test_incomplete_store_fails_when_built():
+    class PartialStore(TaskStore):
+        def get(self, task_id):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStore()
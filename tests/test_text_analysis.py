@@ -0,0 +1,79 @@
+import pytest
+import textstat
+from app.utils.text_analysis import PhraseMatcher, ParagraphCache, analyze_text, apply_edits, paragraph_spans
+
+@pytest.fixture
+def sample_script():
+    return """
+    In recent years, artificial intelligence has transformed from science fiction
+    into everyday reality. From virtual assistants to autonomous vehicles,
+    AI technologies are reshaping how we live and work.
+
+    However, these advancements raise important questions about ethics and
+    responsibility. How do we ensure AI systems make fair decisions? What
+    safeguards should we put in place?
+    """
+
+def test_paragraph_spans_handle_whitespace_only_lines():
+    text = "First paragraph.\n   \nSecond paragraph.\n\n\n  Third.  "
+    spans = paragraph_spans(text)
+    assert [text[start:end] for start, end in spans] == [
+        "First paragraph.", "Second paragraph.", "Third."
+    ]
+
+def test_sentence_boundaries():
+    analysis = analyze_text('He said "it cost 3.5 million." Then it grew! Did it? (Yes, it did.)')
+    sentences = [analysis.text[start:end] for start, end, _, _ in analysis.sentences()]
+    assert sentences == [
+        'He said "it cost 3.5 million."', 'Then it grew!', 'Did it?', '(Yes, it did.)'
+    ]
+
+def test_metrics_match_textstat(sample_script):
+    analysis = analyze_text(sample_script)
+    assert analysis.word_count == textstat.lexicon_count(sample_script)
+    assert analysis.syllable_count == textstat.syllable_count(sample_script)
+    assert analysis.flesch_reading_ease() == pytest.approx(textstat.flesch_reading_ease(sample_script), abs=1)
+    assert analysis.coleman_liau_index() == pytest.approx(textstat.coleman_liau_index(sample_script), abs=1)
+
+def test_phrase_matcher_uses_word_boundaries():
+    matcher = PhraseMatcher(["however", "in conclusion", "moving on"])
+    counts = matcher.count("However, the howevers aside. In\n  conclusion we are MOVING ON. moving onward")
+    assert counts == {"however": 1, "in conclusion": 1, "moving on": 1}
+
+def test_phrase_matcher_prefers_longest_phrase():
+    matcher = PhraseMatcher(["on", "moving on"])
+    assert list(matcher.finditer("Moving on now")) == [("moving on", 0, 9)]
+
+def test_analysis_counts_engagement(sample_script):
+    matcher = PhraseMatcher(["however"])
+    analysis = analyze_text(sample_script + '\n\n"Quoted" line.', matcher)
+    assert analysis.paragraph_count == 3
+    assert analysis.question_count == 2
+    assert analysis.quote_count == 1
+    assert analysis.phrase_counts["however"] == 1
+
+def test_empty_text():
+    analysis = analyze_text("   ")
+    assert analysis.word_count == 0
+    assert analysis.paragraph_count == 0
+    assert analysis.sentence_count == 1
+
+def test_paragraph_cache_reuse(sample_script):
+    cache = ParagraphCache()
+    first = analyze_text(sample_script, cache=cache)
+    second = analyze_text(sample_script + "\n\nA new closing paragraph.", cache=cache)
+
+    assert first.analyzed_paragraphs == 2
+    assert second.analyzed_paragraphs == 1
+    assert second.word_count == first.word_count + 4
+    assert cache.hits == 2
+
+def test_paragraph_cache_is_bounded():
+    cache = ParagraphCache(max_entries=2)
+    analyze_text("One.\n\nTwo.\n\nThree.", cache=cache)
+    assert len(cache) == 2
+
+def test_apply_edits():
+    assert apply_edits("Hello brave world", [(12, 17, "planet"), (0, 5, "Goodbye")]) == "Goodbye brave planet"
+    with pytest.raises(ValueError):
+        apply_edits("Hello", [(0, 3, "a"), (2, 4, "b")])
@@ -1,6 +1,7 @@
 import pytest
 import os
 from pathlib import Path
+from app.utils.text_analysis import apply_edits
 from app.utils.text_processor import TextProcessor
 
 @pytest.fixture
@@ -49,6 +50,29 @@ def test_chunk_text(text_processor, sample_text):
     assert isinstance(chunks[0], str)
     assert sum(len(chunk.split()) for chunk in chunks) >= len(sample_text.split())
 
+def test_chunk_text_respects_token_budget(text_processor, sample_text):
+    long_text = sample_text * 20
+    spans = text_processor.chunk_spans(long_text, max_tokens=64)
+    chunks = text_processor.chunk_text(long_text, max_tokens=64)
+
+    assert len(spans) == len(chunks) > 1
+    for span, chunk in zip(spans, chunks):
+        assert span.text(long_text) == chunk
+        assert 0 < span.token_count
+    # Offsets are ordered and point into the original text
+    assert all(a.end <= b.start for a, b in zip(spans, spans[1:]))
+
+def test_chunk_text_overlap(text_processor, sample_text):
+    long_text = sample_text * 20
+    spans = text_processor.chunk_spans(long_text, max_tokens=64, overlap=16)
+
+    assert len(spans) > 1
+    assert any(b.start < a.end for a, b in zip(spans, spans[1:]))
+
+def test_chunk_text_invalid_overlap(text_processor, sample_text):
+    with pytest.raises(ValueError):
+        text_processor.chunk_text(sample_text, max_tokens=32, overlap=32)
+
 def test_validate_script_basic(text_processor, sample_script):
     validation = text_processor.validate_script(sample_script)
     
@@ -72,6 +96,78 @@ def test_validate_script_basic(text_processor, sample_script):
     assert 'quote_count' in validation['engagement']
     assert 'transition_words' in validation['engagement']
 
+def test_engagement_phrase_matching(text_processor):
+    script = "However, we kept going. The howevers piled up. In conclusion, furthermore is banned."
+    engagement = text_processor.validate_script(script)['engagement']
+
+    assert engagement['transition_words'] == 2
+    assert engagement['banned_transitions'] == {'in conclusion': 1, 'furthermore': 1}
+
+def test_validate_incremental_reuses_unchanged_paragraphs(text_processor, sample_script):
+    document_id, full, analyzed = text_processor.validate_incremental(script=sample_script)
+    assert analyzed == 5
+
+    insert_at = sample_script.index("decision-making systems.") + len("decision-making systems.")
+    edit = (insert_at, insert_at, " It also powers translation tools.")
+    same_id, updated, analyzed = text_processor.validate_incremental(
+        document_id=document_id, edits=[edit], coherence=True, pacing=True
+    )
+
+    assert same_id == document_id
+    assert analyzed == 1
+    edited = sample_script[:insert_at] + edit[2] + sample_script[insert_at:]
+    assert updated == text_processor.validate_script(edited)
+    assert updated['structure']['word_count'] == full['structure']['word_count'] + 5
+
+def test_validate_incremental_rescans_only_edited_paragraphs(text_processor, sample_script):
+    from app.utils.coherence import paragraph_mentions
+
+    document_id, _, _ = text_processor.validate_incremental(script=sample_script, coherence=True)
+    misses = paragraph_mentions.cache_info().misses
+    insert_at = sample_script.index("decision-making systems.")
+    edit = (insert_at, insert_at, "fast ")
+    _, updated, analyzed = text_processor.validate_incremental(
+        document_id=document_id, edits=[edit], coherence=True
+    )
+    # One paragraph is re-analyzed and rescanned for coherence terms; the rest come from caches
+    assert analyzed == 1
+    assert paragraph_mentions.cache_info().misses == misses + 1
+    assert updated['coherence'] == text_processor.validate_script(apply_edits(sample_script, [edit]))['coherence']
+
+def test_validate_incremental_skips_coherence_by_default(text_processor, sample_script):
+    from app.utils.coherence import paragraph_mentions
+
+    document_id, validation, _ = text_processor.validate_incremental(script=sample_script)
+    misses = paragraph_mentions.cache_info().misses
+    _, updated, _ = text_processor.validate_incremental(document_id=document_id, edits=[(0, 0, "Now ")])
+
+    assert 'coherence' not in validation
+    assert 'coherence' not in updated
+    assert paragraph_mentions.cache_info().misses == misses
+
+def test_validate_incremental_skips_pacing_by_default(text_processor, sample_script):
+    _, validation, _ = text_processor.validate_incremental(script=sample_script)
+    _, paced, _ = text_processor.validate_incremental(script=sample_script, pacing=True)
+
+    assert 'pacing' not in validation
+    assert paced['pacing'] == text_processor.validate_script(sample_script)['pacing']
+
+def test_validate_incremental_unknown_document(text_processor):
+    from app.utils.text_processor import UnknownDocumentError
+    with pytest.raises(UnknownDocumentError):
+        text_processor.validate_incremental(document_id="missing", edits=[(0, 0, "x")])
+
+def test_validate_many_matches_validate_script(text_processor, sample_script):
+    scripts = [sample_script, "A short one. Is it fine?", sample_script.upper(), None]
+    results = list(text_processor.validate_many(
+        scripts, template_name="documentary", max_workers=2, chunksize=2
+    ))
+
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+    for script, result in zip(scripts[:3], results):
+        assert result['validation'] == text_processor.validate_script(script, "documentary")
+    assert 'error' in results[3]
+
 def test_validate_script_with_template(text_processor, sample_script):
     validation = text_processor.validate_script(sample_script, template_name='documentary')
     
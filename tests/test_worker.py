@@ -0,0 +1,142 @@
+import asyncio
+import time
+import pytest
+from app.utils.content_store import UnknownContentError
+from app.utils.job_queue import JobQueue
+from app.worker import Worker
+
+class FakePipeline:
+    """Stands in for ScriptPipeline: fails a set number of times, optionally hangs."""
+
+    def __init__(self, failures=0, error=RuntimeError("LLM unavailable"), delay=0.0):
+        self.failures = failures
+        self.error = error
+        self.delay = delay
+        self.runs = 0
+        self.recorded = []
+
+    async def run(self, request, timer=None):
+        self.runs += 1
+        with timer.stage("generation"):
+            await asyncio.sleep(self.delay)
+            if self.runs <= self.failures:
+                raise self.error
+        return {"script": f"Script for {request['content']}", "timings": timer.timings()}
+
+    def record(self, status, timer):
+        self.recorded.append(status)
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), lease_seconds=30, max_attempts=3, retry_delay=0)
+    yield queue
+    queue.close()
+
+async def _run_until_idle(worker, queue, timeout=5.0):
+    stop = asyncio.Event()
+    running = asyncio.ensure_future(worker.run(stop))
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        stats = queue.stats()
+        if stats["queued"] == 0 and stats["processing"] == 0:
+            break
+        await asyncio.sleep(0.01)
+    stop.set()
+    await running
+
+@pytest.mark.asyncio
+async def test_worker_completes_jobs_concurrently(queue):
+    pipeline = FakePipeline(delay=0.05)
+    worker = Worker(queue, pipeline, concurrency=4, poll_interval=0.01)
+    job_ids = [queue.enqueue({"content": f"source {i}"}) for i in range(8)]
+
+    await _run_until_idle(worker, queue)
+
+    for i, job_id in enumerate(job_ids):
+        task = queue.get(job_id)
+        assert task["status"] == "completed"
+        assert task["script"] == f"Script for source {i}"
+        assert "generation" in task["timings"]
+    assert worker.stats["completed"] == 8
+    assert pipeline.recorded == ["completed"] * 8
+
+@pytest.mark.asyncio
+async def test_worker_retries_failed_attempts(queue):
+    pipeline = FakePipeline(failures=2)
+    worker = Worker(queue, pipeline, poll_interval=0.01)
+    job_id = queue.enqueue({"content": "flaky"})
+
+    await _run_until_idle(worker, queue)
+
+    task = queue.get(job_id)
+    assert task["status"] == "completed"
+    assert task["attempts"] == 3
+    assert worker.stats["retried"] == 2
+
+@pytest.mark.asyncio
+async def test_worker_does_not_retry_permanent_errors(queue):
+    pipeline = FakePipeline(failures=5, error=UnknownContentError("abc"))
+    worker = Worker(queue, pipeline, poll_interval=0.01)
+    job_id = queue.enqueue({"content_id": "abc"})
+
+    await _run_until_idle(worker, queue)
+
+    task = queue.get(job_id)
+    assert task["status"] == "failed"
+    assert task["attempts"] == 1
+    assert pipeline.recorded == ["failed"]
+
+@pytest.mark.asyncio
+async def test_worker_abandons_job_when_lease_is_lost(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), lease_seconds=0.06)
+    pipeline = FakePipeline(delay=10)
+    worker = Worker(queue, pipeline, worker_id="worker-1")
+    job_id = queue.enqueue({"content": "slow"})
+    job = queue.claim("worker-1")
+
+    # Another worker takes over before the first heartbeat
+    queue._db.execute("UPDATE jobs SET worker_id = 'worker-2' WHERE job_id = ?", (job_id,))
+    assert await asyncio.wait_for(worker.run_job(job), 2) is None
+    assert worker.stats["lost"] == 1
+    assert queue.get(job_id)["status"] == "processing"
+    queue.close()
+
+@pytest.mark.asyncio
+async def test_stopping_worker_releases_unfinished_jobs(queue):
+    pipeline = FakePipeline(delay=10)
+    worker = Worker(queue, pipeline, poll_interval=0.01, drain_timeout=0.05)
+    job_id = queue.enqueue({"content": "slow"})
+
+    stop = asyncio.Event()
+    running = asyncio.ensure_future(worker.run(stop))
+    while queue.stats()["processing"] == 0:
+        await asyncio.sleep(0.01)
+    stop.set()
+    await asyncio.wait_for(running, 2)
+
+    task = queue.get(job_id)
+    assert task["status"] == "queued"
+    assert task["attempts"] == 0
+    assert worker.stats["released"] == 1
+
+@pytest.mark.asyncio
+async def test_slow_queue_calls_do_not_block_the_loop(queue, monkeypatch):
+    # A write held up by another process's lock must not stall the event loop
+    claim = queue.claim
+    def contended_claim(worker_id):
+        time.sleep(0.2)
+        return claim(worker_id)
+    monkeypatch.setattr(queue, "claim", contended_claim)
+    worker = Worker(queue, FakePipeline(), concurrency=1, poll_interval=0.01)
+    stop = asyncio.Event()
+    running = asyncio.ensure_future(worker.run(stop))
+
+    loop = asyncio.get_running_loop()
+    longest = 0.0
+    for _ in range(10):
+        started = loop.time()
+        await asyncio.sleep(0.01)
+        longest = max(longest, loop.time() - started)
+    stop.set()
+    await running
+    assert longest < 0.1 and worker.stats["claimed"] == 0